@@ -49,4 +49,8 @@ export class EducationalInstitutionsService {
     getComment(id, classId, commentId) {
         return http.get(`${this.resourceEndpoint}/${id}/classes/${classId}/comments/${commentId}`);
     }
+
+    subscribeToClass(id, classId) {
+        return new EventSource(`${http.defaults.baseURL}/educationalInstitutions/${id}/classes/${classId}/events`);
+    }
 }
\ No newline at end of file
@@ -0,0 +1,29 @@
+import os
+
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+
+uri = os.getenv("MONGO_URI")
+
+if not uri:
+    raise ValueError("MONGO_URI is not set")
+
+client = AsyncIOMotorClient(uri)
+db = client.SEC
+
+grid_fs_bucket = AsyncIOMotorGridFSBucket(db, bucket_name="my-files")
+
+educational_institutions_collection = db.educational_institutions
+users_collection = db.users
+migrations_collection = db.migrations
+search_entries_collection = db.search_entries
+feed_events_collection = db.feed_events
+comment_buckets_collection = db.comment_buckets
+grid_fs_files_collection = db["my-files.files"]
+grid_fs_chunks_collection = db["my-files.chunks"]
+upload_sessions_collection = db.upload_sessions
+jobs_collection = db.jobs
+activity_events_collection = db.activity_events
+activity_hourly_collection = db.activity_hourly
+activity_daily_collection = db.activity_daily
+audit_log_collection = db.audit_log
+changes_collection = db.changes
@@ -0,0 +1,87 @@
+from pymongo import ASCENDING, DESCENDING, TEXT, GEOSPHERE
+from pymongo.errors import CollectionInvalid
+
+from Api.Config import settings
+from Api.Config.db import educational_institutions_collection, search_entries_collection, feed_events_collection, \
+    comment_buckets_collection, grid_fs_files_collection, grid_fs_chunks_collection, upload_sessions_collection, \
+    jobs_collection, activity_events_collection, activity_hourly_collection, activity_daily_collection, \
+    audit_log_collection, changes_collection, db
+from Api.Services.Geo import upgrade_locations
+
+
+async def ensure_indexes():
+    """
+    Create the indexes the routes rely on. `create_index` is a no-op when the index already exists.
+    """
+    # Lookups of nested elements are equality matches on these multikey indexes
+    await educational_institutions_collection.create_index([("classes._id", ASCENDING)])
+    await educational_institutions_collection.create_index([("classes.resources._id", ASCENDING)])
+    # Which resource holds a file: attaching uploads and the file garbage collector
+    await educational_institutions_collection.create_index([("classes.resources.file_ids", ASCENDING)])
+    # "My classes" of a teacher or a student, across institutions
+    await educational_institutions_collection.create_index([("classes.teacher_id", ASCENDING)])
+    await educational_institutions_collection.create_index([("classes.student_ids", ASCENDING)])
+    # Links created with the old uuid schema
+    await educational_institutions_collection.create_index([("classes.legacy_id", ASCENDING)], sparse=True)
+    await educational_institutions_collection.create_index([("classes.resources.legacy_id", ASCENDING)], sparse=True)
+
+    # Nearest-institution queries. Old locations are upgraded first, the index build rejects non-GeoJSON values
+    await upgrade_locations()
+    await educational_institutions_collection.create_index([("location", GEOSPHERE)])
+
+    # Full-text search: `institution_id` is the equality prefix so every search stays inside one institution
+    await search_entries_collection.create_index(
+        [("institution_id", ASCENDING), ("title", TEXT), ("description", TEXT), ("content", TEXT)],
+        weights={"title": 10, "description": 4, "content": 1},
+        default_language="spanish",
+        name="search_text",
+    )
+    await search_entries_collection.create_index([("institution_id", ASCENDING), ("class_id", ASCENDING)])
+
+    # Live feed events only need to outlive the change stream relay
+    await feed_events_collection.create_index(
+        [("created_at", ASCENDING)], expireAfterSeconds=settings.FEED_EVENTS_TTL_SECONDS
+    )
+
+    # Comment buckets: newest-first page reads per resource, and cleanup when a class or institution is deleted
+    await comment_buckets_collection.create_index([("resource_id", ASCENDING), ("first_id", DESCENDING)])
+    await comment_buckets_collection.create_index([("institution_id", ASCENDING), ("class_id", ASCENDING)])
+    # One bucket per number: concurrent appends cannot open two buckets for a resource
+    await comment_buckets_collection.create_index(
+        [("resource_id", ASCENDING), ("bucket", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"bucket": {"$exists": True}},
+    )
+
+    # Thumbnails are looked up by their original file
+    await grid_fs_files_collection.create_index([("metadata.thumbnail_of", ASCENDING)], sparse=True)
+
+    # Resumable uploads write chunks directly; GridFS normally creates this index on its first upload
+    await grid_fs_chunks_collection.create_index([("files_id", ASCENDING), ("n", ASCENDING)], unique=True)
+    await upload_sessions_collection.create_index([("expires_at", ASCENDING)])
+
+    # Job queue: claiming scans due queued jobs and expired locks; finished jobs expire
+    await jobs_collection.create_index([("status", ASCENDING), ("run_at", ASCENDING)])
+    await jobs_collection.create_index([("status", ASCENDING), ("locked_until", ASCENDING)])
+    await jobs_collection.create_index(
+        [("finished_at", ASCENDING)], expireAfterSeconds=settings.JOB_RETENTION_SECONDS
+    )
+
+    # Activity analytics: raw events are rolled up by time and expire; dashboards read the buckets
+    await activity_events_collection.create_index(
+        [("ts", ASCENDING)], expireAfterSeconds=settings.ACTIVITY_EVENTS_TTL_SECONDS
+    )
+    await activity_hourly_collection.create_index([("hour", DESCENDING)])  # Where the next rollup starts
+    for buckets, period in ((activity_hourly_collection, "hour"), (activity_daily_collection, "day")):
+        await buckets.create_index([("institution_id", ASCENDING), (period, ASCENDING)])
+        await buckets.create_index([("institution_id", ASCENDING), ("class_id", ASCENDING), (period, ASCENDING)])
+
+    # Delta sync: pages of one institution's changes in `seq` order; tombstones expire
+    await changes_collection.create_index([("institution_id", ASCENDING), ("seq", ASCENDING)])
+    await changes_collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0, sparse=True)
+
+    # Audit log: capped, so it never grows past AUDIT_CAPPED_BYTES (the oldest entries go first)
+    try:
+        await db.create_collection(audit_log_collection.name, capped=True, size=settings.AUDIT_CAPPED_BYTES)
+    except CollectionInvalid:
+        pass  # Already exists
@@ -0,0 +1,158 @@
+import os
+import tempfile
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Migraciones en segundo plano (ids anidados, comentarios a buckets)
+MIGRATIONS_ENABLED = env_bool("MIGRATIONS_ENABLED", True)
+MIGRATION_BATCH_SIZE = env_int("MIGRATION_BATCH_SIZE", 100)
+MIGRATION_PAUSE_SECONDS = env_float("MIGRATION_PAUSE_SECONDS", 0.5)
+
+# Feed en tiempo real (SSE / WebSocket)
+FEED_QUEUE_SIZE = env_int("FEED_QUEUE_SIZE", 256)
+FEED_HEARTBEAT_SECONDS = env_float("FEED_HEARTBEAT_SECONDS", 15)
+FEED_CHANGE_STREAMS = env_bool("FEED_CHANGE_STREAMS", True)
+FEED_EVENTS_TTL_SECONDS = env_int("FEED_EVENTS_TTL_SECONDS", 3600)
+
+# Comentarios guardados en buckets de tamaño fijo
+COMMENT_BUCKET_SIZE = env_int("COMMENT_BUCKET_SIZE", 200)
+
+# Contadores desnormalizados (clases, recursos, comentarios, archivos, bytes)
+STATS_RECONCILE_INTERVAL_SECONDS = env_float("STATS_RECONCILE_INTERVAL_SECONDS", 6 * 3600)
+STATS_RECONCILE_PAUSE_SECONDS = env_float("STATS_RECONCILE_PAUSE_SECONDS", 0.2)
+
+# Miniaturas de imágenes y vistas previas de PDF (pool de procesos). Las de PDF necesitan `pymupdf`,
+# opcional: no está en requirements.txt (la imagen Alpine no lo instala) y sin él los PDF no tienen vista previa
+THUMBNAILS_ENABLED = env_bool("THUMBNAILS_ENABLED", True)
+THUMBNAIL_SIZE = env_int("THUMBNAIL_SIZE", 320)
+THUMBNAIL_WORKERS = env_int("THUMBNAIL_WORKERS", 2)
+THUMBNAIL_MAX_SOURCE_BYTES = env_int("THUMBNAIL_MAX_SOURCE_BYTES", 50 * 1024 * 1024)
+
+# Compresión de respuestas (gzip / brotli) y de archivos comprimibles en GridFS
+COMPRESSION_ENABLED = env_bool("COMPRESSION_ENABLED", True)
+COMPRESSION_MIN_BYTES = env_int("COMPRESSION_MIN_BYTES", 1024)
+COMPRESSION_LEVEL = env_int("COMPRESSION_LEVEL", 6)
+STORAGE_COMPRESS_MIN_BYTES = env_int("STORAGE_COMPRESS_MIN_BYTES", 1024)
+STORAGE_COMPRESS_LEVEL = env_int("STORAGE_COMPRESS_LEVEL", 9)
+STORAGE_COMPRESS_MAX_RATIO = env_float("STORAGE_COMPRESS_MAX_RATIO", 0.9)
+
+# Subidas reanudables por partes
+UPLOAD_CHUNK_SIZE = env_int("UPLOAD_CHUNK_SIZE", 255 * 1024)  # Tamaño de chunk de GridFS
+UPLOAD_MAX_LENGTH = env_int("UPLOAD_MAX_LENGTH", 4 * 1024 * 1024 * 1024)
+UPLOAD_FLUSH_CHUNKS = env_int("UPLOAD_FLUSH_CHUNKS", 16)
+UPLOAD_SESSION_TTL_SECONDS = env_int("UPLOAD_SESSION_TTL_SECONDS", 24 * 3600)
+UPLOAD_SWEEP_INTERVAL_SECONDS = env_float("UPLOAD_SWEEP_INTERVAL_SECONDS", 15 * 60)
+
+# Cola de trabajos en MongoDB (procesamiento posterior a las subidas)
+JOBS_IN_APP = env_bool("JOBS_IN_APP", True)  # False si corren aparte con `python worker.py`
+JOB_WORKERS = env_int("JOB_WORKERS", 4)
+JOB_POLL_SECONDS = env_float("JOB_POLL_SECONDS", 2)
+JOB_VISIBILITY_SECONDS = env_float("JOB_VISIBILITY_SECONDS", 300)
+JOB_MAX_ATTEMPTS = env_int("JOB_MAX_ATTEMPTS", 5)
+JOB_BACKOFF_SECONDS = env_float("JOB_BACKOFF_SECONDS", 10)
+JOB_BACKOFF_MAX_SECONDS = env_float("JOB_BACKOFF_MAX_SECONDS", 3600)
+JOB_RETENTION_SECONDS = env_int("JOB_RETENTION_SECONDS", 7 * 24 * 3600)
+JOB_SHUTDOWN_GRACE_SECONDS = env_float("JOB_SHUTDOWN_GRACE_SECONDS", 10)
+CLAMD_ADDRESS = os.getenv("CLAMD_ADDRESS", "")  # "host:3310" o "unix:/run/clamav/clamd.ctl"; vacío = sin antivirus
+
+# Límites de peticiones por cliente y grupo de rutas (token bucket) y control de admisión
+RATE_LIMITS_ENABLED = env_bool("RATE_LIMITS_ENABLED", True)
+# Los clientes se distinguen por IP, y detrás de un NAT (la red de un colegio) todo el colegio comparte
+# el mismo bucket: los valores por defecto están pensados para eso (p. ej. varias aulas que inician sesión
+# a la vez al empezar la clase), no para una sola persona. Un despliegue con clientes en IPs propias puede
+# bajarlos. Detrás de un proxy propio que fije X-Forwarded-For, activar TRUST_FORWARDED_FOR.
+RATE_LIMITS = {
+    # grupo: (peticiones por segundo, ráfaga máxima)
+    "auth": (env_float("RATE_LIMIT_AUTH_PER_SECOND", 5), env_int("RATE_LIMIT_AUTH_BURST", 150)),
+    "uploads": (env_float("RATE_LIMIT_UPLOADS_PER_SECOND", 10), env_int("RATE_LIMIT_UPLOADS_BURST", 100)),
+    "lists": (env_float("RATE_LIMIT_LISTS_PER_SECOND", 20), env_int("RATE_LIMIT_LISTS_BURST", 300)),
+    "search": (env_float("RATE_LIMIT_SEARCH_PER_SECOND", 20), env_int("RATE_LIMIT_SEARCH_BURST", 150)),
+    "writes": (env_float("RATE_LIMIT_WRITES_PER_SECOND", 50), env_int("RATE_LIMIT_WRITES_BURST", 300)),
+    "default": (env_float("RATE_LIMIT_DEFAULT_PER_SECOND", 200), env_int("RATE_LIMIT_DEFAULT_BURST", 600)),
+}
+TRUST_FORWARDED_FOR = env_bool("TRUST_FORWARDED_FOR", False)  # Solo detrás de un proxy propio
+ADMISSION_MAX_CONCURRENT = env_int("ADMISSION_MAX_CONCURRENT", 16)  # Por grupo costoso (subidas, listados)
+ADMISSION_QUEUE_SECONDS = env_float("ADMISSION_QUEUE_SECONDS", 2)
+
+# Plazo por petición según el grupo de rutas: cada consulta a MongoDB lleva el tiempo restante (maxTimeMS)
+REQUEST_DEADLINES_ENABLED = env_bool("REQUEST_DEADLINES_ENABLED", True)
+REQUEST_DEADLINES = {
+    # grupo: segundos (0: sin plazo)
+    "feeds": 0,  # SSE: conexiones abiertas por diseño
+    "downloads": env_float("REQUEST_DEADLINE_DOWNLOADS_SECONDS", 300),
+    "uploads": env_float("REQUEST_DEADLINE_UPLOADS_SECONDS", 120),  # Desde que llega el cuerpo (cada parte, si es reanudable)
+    "reports": env_float("REQUEST_DEADLINE_REPORTS_SECONDS", 30),
+    "default": env_float("REQUEST_DEADLINE_DEFAULT_SECONDS", 10),
+}
+
+# Lecturas idénticas concurrentes comparten una sola consulta (single-flight)
+SINGLE_FLIGHT_ENABLED = env_bool("SINGLE_FLIGHT_ENABLED", True)
+SINGLE_FLIGHT_TIMEOUT_SECONDS = env_float("SINGLE_FLIGHT_TIMEOUT_SECONDS", 10)
+
+# Escrituras pequeñas y frecuentes agrupadas en un solo bulk_write (opcional)
+BATCH_WRITES_ENABLED = env_bool("BATCH_WRITES_ENABLED", False)
+BATCH_WRITE_DELAY_SECONDS = env_float("BATCH_WRITE_DELAY_SECONDS", 0.005)
+BATCH_WRITE_MAX_OPERATIONS = env_int("BATCH_WRITE_MAX_OPERATIONS", 500)
+
+# Recolección de archivos de GridFS que nada referencia (marcar y barrer)
+FILE_GC_INTERVAL_SECONDS = env_float("FILE_GC_INTERVAL_SECONDS", 0)  # 0: solo con `just gc-files`
+FILE_GC_GRACE_SECONDS = env_int("FILE_GC_GRACE_SECONDS", 24 * 3600)
+FILE_GC_BATCH_SIZE = env_int("FILE_GC_BATCH_SIZE", 200)
+FILE_GC_PAUSE_SECONDS = env_float("FILE_GC_PAUSE_SECONDS", 0.5)
+
+# Borrados en cascada (archivos de GridFS borrados por lotes en un trabajo)
+CASCADE_DELETE_BATCH_SIZE = env_int("CASCADE_DELETE_BATCH_SIZE", 500)
+
+# Servidor de producción (serve.py): procesos, cola de conexiones y keep-alive
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = env_int("SERVER_PORT", 8000)
+SERVER_WORKERS = env_int("SERVER_WORKERS", 0)  # 0: un proceso por CPU
+SERVER_BACKLOG = env_int("SERVER_BACKLOG", 2048)
+SERVER_KEEP_ALIVE_SECONDS = env_int("SERVER_KEEP_ALIVE_SECONDS", 65)  # Más que el timeout inactivo del balanceador
+SERVER_GRACEFUL_SHUTDOWN_SECONDS = env_int("SERVER_GRACEFUL_SHUTDOWN_SECONDS", 30)
+SERVER_ACCESS_LOG = env_bool("SERVER_ACCESS_LOG", False)
+
+# Lecturas que toleran datos algo atrasados (listados, búsquedas, estadísticas) van a secundarios
+REPORTING_READ_PREFERENCE = os.getenv("REPORTING_READ_PREFERENCE", "secondaryPreferred")
+REPORTING_MAX_STALENESS_SECONDS = env_int("REPORTING_MAX_STALENESS_SECONDS", 90)  # Mínimo aceptado por MongoDB: 90
+
+# Analítica de actividad: eventos crudos y acumulados por hora y por día
+ACTIVITY_ENABLED = env_bool("ACTIVITY_ENABLED", True)
+ACTIVITY_EVENTS_TTL_SECONDS = env_int("ACTIVITY_EVENTS_TTL_SECONDS", 3 * 24 * 3600)
+ACTIVITY_ROLLUP_INTERVAL_SECONDS = env_float("ACTIVITY_ROLLUP_INTERVAL_SECONDS", 60)
+ACTIVITY_ROLLUP_LAG_SECONDS = env_float("ACTIVITY_ROLLUP_LAG_SECONDS", 10)  # Margen para escrituras agrupadas en vuelo
+ANALYTICS_TIMEZONE = os.getenv("ANALYTICS_TIMEZONE", "America/Bogota")  # Límite de los días
+
+# Auditoría: búfer en memoria volcado por lotes a una colección capped
+AUDIT_ENABLED = env_bool("AUDIT_ENABLED", True)
+AUDIT_READS = env_bool("AUDIT_READS", False)  # También las lecturas (registro de accesos completo)
+AUDIT_BUFFER_SIZE = env_int("AUDIT_BUFFER_SIZE", 10_000)
+AUDIT_FLUSH_INTERVAL_SECONDS = env_float("AUDIT_FLUSH_INTERVAL_SECONDS", 1)
+AUDIT_FLUSH_BATCH_SIZE = env_int("AUDIT_FLUSH_BATCH_SIZE", 1000)
+AUDIT_CAPPED_BYTES = env_int("AUDIT_CAPPED_BYTES", 512 * 1024 * 1024)
+
+# Sincronización por deltas: registro de cambios por registro y lápidas de los borrados
+CHANGES_TOMBSTONE_TTL_SECONDS = env_int("CHANGES_TOMBSTONE_TTL_SECONDS", 30 * 24 * 3600)  # Marcas más viejas: descarga completa
+CHANGES_SETTLE_SECONDS = env_float("CHANGES_SETTLE_SECONDS", 2)  # Margen para escrituras de otros procesos en vuelo
+
+# Caché en disco local de los archivos de GridFS más descargados, compartida por los procesos del host
+FILE_CACHE_ENABLED = env_bool("FILE_CACHE_ENABLED", True)
+FILE_CACHE_DIR = os.getenv("FILE_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "sec-file-cache")
+FILE_CACHE_MAX_BYTES = env_int("FILE_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024)
+FILE_CACHE_MAX_FILE_BYTES = env_int("FILE_CACHE_MAX_FILE_BYTES", 256 * 1024 * 1024)  # Los más grandes no se guardan
@@ -0,0 +1,57 @@
+import time
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from Api.Services import Audit
+from Api.Services.RouteGroups import UNSAFE_METHODS
+
+
+class AuditMiddleware:
+    """
+    One audit entry per write request (and per read with `include_reads`): method, path,
+    status, duration, client. The entry is appended to the in-memory audit buffer once
+    the response has been sent; nothing is written to the database on the request path.
+    """
+
+    def __init__(self, app: ASGIApp, include_reads: bool = False, trust_forwarded_for: bool = False):
+        self.app = app
+        self.include_reads = include_reads
+        self.trust_forwarded_for = trust_forwarded_for
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not (self.include_reads or scope["method"] in UNSAFE_METHODS):
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        entry = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "client": self.client(scope, headers),
+            "user_agent": headers.get("user-agent"),
+        }
+        status = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        Audit.begin(entry)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            entry["status"] = status
+            entry["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            Audit.record(entry)
+
+    def client(self, scope: Scope, headers: Headers):
+        if self.trust_forwarded_for:
+            forwarded = headers.get("x-forwarded-for")
+            if forwarded:
+                return forwarded.split(",", 1)[0].strip()
+        client = scope.get("client")
+        return client[0] if client else None
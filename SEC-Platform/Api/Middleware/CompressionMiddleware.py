@@ -0,0 +1,99 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from Api.Services.Compression import Encoder, choose_encoding, is_compressible
+
+# Statuses without a body, or whose body must stay byte-for-byte what was asked for (206)
+UNCOMPRESSED_STATUSES = {204, 206, 304}
+
+
+class CompressionMiddleware:
+    """
+    Negotiated gzip / brotli compression of responses.
+
+    Only compressible content types at least `minimum_size` bytes long are compressed.
+    Responses that already carry a `Content-Encoding` (e.g. files stored pre-compressed)
+    and server-sent events are passed through untouched. Streamed responses are
+    compressed chunk by chunk and flushed after every chunk.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, level: int = 6):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponder(self, encoding, send).run(scope, receive)
+
+
+class _CompressedResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start_message: Message = {}
+        self.encoder = None
+        self.passthrough = False
+
+    async def run(self, scope: Scope, receive: Receive):
+        await self.middleware.app(scope, receive, self.on_send)
+
+    async def on_send(self, message: Message):
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.start_message = message
+            self.passthrough = (
+                message["status"] in UNCOMPRESSED_STATUSES
+                or "content-encoding" in headers
+                or not is_compressible(headers.get("content-type"))
+            )
+            if self.passthrough:
+                await self.send(message)
+            return
+
+        if message["type"] == "http.response.pathsend" and not self.passthrough:
+            # The server sends the file from disk itself: it goes out as it is
+            self.passthrough = True
+            await self.send(self.start_message)
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None:
+            if not more_body and len(body) < self.middleware.minimum_size:
+                # Small, complete body: not worth the headers and the CPU
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+
+            self.encoder = Encoder(self.encoding, self.middleware.level)
+            headers = MutableHeaders(scope=self.start_message)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                compressed = self.encoder.compress(body) + self.encoder.finish()
+                headers["Content-Length"] = str(len(compressed))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+            await self.send(self.start_message)
+
+        if more_body:
+            chunk = self.encoder.compress(body) + self.encoder.flush()
+        else:
+            chunk = self.encoder.compress(body) + self.encoder.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import logging
+from typing import Dict
+
+import pymongo
+from pymongo.errors import PyMongoError, ServerSelectionTimeoutError, WaitQueueTimeoutError
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from Api.Services import RouteGroups
+
+logger = logging.getLogger(__name__)
+
+# Route kinds (see RouteGroups) to deadline groups; anything else is "default".
+GROUPS: Dict[str, str] = {
+    "feed": "feeds",
+    "download": "downloads",
+    "upload": "uploads",
+    "list": "reports",
+    "search": "reports",
+    "report": "reports",
+}
+
+# Groups whose body the client streams for as long as its connection needs: no request
+# deadline here, their routes bound the MongoDB writes once the body has arrived
+# (`Deadlines.upload_writes`). Their timeouts are still answered with 503/504.
+BODY_GROUPS = {"uploads"}
+
+# Errors raised before MongoDB even ran the operation: no server or no pool connection in time
+OVERLOAD_ERRORS = (ServerSelectionTimeoutError, WaitQueueTimeoutError)
+
+
+def route_group(method: str, path: str) -> str:
+    return GROUPS.get(RouteGroups.classify(method, path), "default")
+
+
+class DeadlineMiddleware:
+    """
+    A deadline per route group for everything a request does. Every MongoDB call made while
+    it runs, GridFS reads included, gets the remaining time through `pymongo.timeout`: it is
+    sent to the server as `maxTimeMS` and also bounds server selection, pool checkout and
+    socket reads. A handler still running when the deadline passes is cancelled.
+
+    Missing the deadline before the response started is a 504; not getting a server or a
+    pool connection in time is a 503 with `Retry-After` (the database is overloaded). Once
+    the response started its status is already sent: a stream whose MongoDB reads run past
+    the deadline (a long GridFS download) is cut off. Files served from the local file cache
+    do not read MongoDB and are not cut. A group with a deadline of 0 has none, and upload
+    routes apply theirs only after receiving the body.
+    """
+
+    def __init__(self, app: ASGIApp, deadlines: Dict[str, float]):
+        self.app = app
+        self.deadlines = deadlines
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        group = route_group(scope["method"], scope["path"])
+        seconds = 0 if group in BODY_GROUPS else self.deadlines.get(group, self.deadlines["default"])
+        started = False
+        deadline = None
+
+        async def send_started(message: Message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                # From here on only the MongoDB reads of the body are bounded, not a slow client
+                if deadline is not None:
+                    deadline.reschedule(None)
+            await send(message)
+
+        try:
+            if seconds:
+                with pymongo.timeout(seconds):
+                    async with asyncio.timeout(seconds) as deadline:
+                        await self.app(scope, receive, send_started)
+            else:
+                await self.app(scope, receive, send_started)
+            return
+        except PyMongoError as error:
+            if not error.timeout:
+                raise
+            overloaded = isinstance(error, OVERLOAD_ERRORS)
+        except TimeoutError:
+            if deadline is None or not deadline.expired():
+                raise
+            overloaded = False
+
+        if started:
+            logger.warning("%s %s cut off after its deadline", scope["method"], scope["path"])
+            return
+        if overloaded:
+            await self.reject(send, 503, "Database busy, try again shortly", retry_after=1)
+        else:
+            await self.reject(send, 504, "The request took too long")
+
+    @staticmethod
+    async def reject(send: Send, status: int, detail: str, retry_after: int = 0):
+        body = json.dumps({"detail": detail}).encode()
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ]
+        if retry_after:
+            headers.append((b"retry-after", str(retry_after).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,145 @@
+import asyncio
+import json
+import math
+import time
+from typing import Dict, Set, Tuple
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from Api.Services import RouteGroups
+
+# Route kinds (see RouteGroups) to rate-limit groups; anything else is "writes" for unsafe
+# methods and "default" for reads.
+GROUPS: Dict[str, str] = {
+    "auth": "auth",
+    "upload": "uploads",
+    "upload-session": "uploads",
+    "list": "lists",
+    "search": "search",
+}
+
+
+def route_group(method: str, path: str) -> str:
+    group = GROUPS.get(RouteGroups.classify(method, path))
+    if group is not None:
+        return group
+    return "writes" if method in RouteGroups.UNSAFE_METHODS else "default"
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: int, now: float):
+        self.tokens = float(burst)
+        self.updated = now
+
+    def take(self, rate: float, burst: int, now: float) -> float:
+        """
+        Take one token. Returns 0 on success, otherwise the seconds until a token is available.
+        """
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / rate
+
+
+class RateLimitMiddleware:
+    """
+    Token-bucket rate limits per client and route group, plus admission control for
+    the expensive groups (uploads, full lists): at most `max_concurrent` requests of each
+    of those groups run at once, the next ones wait up to `queue_seconds` for a slot and
+    then get a 429. Each group has its own slots, so uploads held open by slow clients
+    never make list reads wait, and the other way round.
+
+    State is per process: with N workers a client gets up to N times the configured rate.
+    Clients are told apart by IP address: everyone behind one NAT (a whole school network)
+    shares one bucket per group, unless `trust_forwarded_for` is on behind a proxy that
+    sets `X-Forwarded-For`.
+    """
+
+    def __init__(
+            self,
+            app: ASGIApp,
+            limits: Dict[str, Tuple[float, int]],
+            expensive_groups: Set[str] = frozenset({"uploads", "lists"}),
+            max_concurrent: int = 16,
+            queue_seconds: float = 2,
+            trust_forwarded_for: bool = False,
+            max_buckets: int = 100_000,
+    ):
+        self.app = app
+        self.limits = limits
+        self.expensive_groups = expensive_groups
+        self.queue_seconds = queue_seconds
+        self.trust_forwarded_for = trust_forwarded_for
+        self.max_buckets = max_buckets
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._slots = {group: asyncio.Semaphore(max_concurrent) for group in expensive_groups}
+
+    def client_id(self, scope: Scope) -> str:
+        if self.trust_forwarded_for:
+            forwarded = Headers(scope=scope).get("x-forwarded-for")
+            if forwarded:
+                return forwarded.split(",", 1)[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    def check(self, client: str, group: str) -> float:
+        rate, burst = self.limits.get(group) or self.limits["default"]
+        now = time.monotonic()
+        key = (client, group)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_buckets:
+                self._prune(now)
+            bucket = self._buckets[key] = TokenBucket(burst, now)
+        return bucket.take(rate, burst, now)
+
+    def _prune(self, now: float):
+        # Buckets idle long enough to be full again hold no information
+        for key, bucket in list(self._buckets.items()):
+            rate, burst = self.limits.get(key[1]) or self.limits["default"]
+            if bucket.tokens + (now - bucket.updated) * rate >= burst:
+                del self._buckets[key]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        group = route_group(scope["method"], scope["path"])
+        retry_after = self.check(self.client_id(scope), group)
+        if retry_after:
+            await self.reject(send, retry_after, "Too many requests")
+            return
+
+        if group not in self.expensive_groups:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await asyncio.wait_for(self._slots[group].acquire(), self.queue_seconds)
+        except asyncio.TimeoutError:
+            await self.reject(send, 1, "Server busy, try again shortly")
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._slots[group].release()
+
+    @staticmethod
+    async def reject(send: Send, retry_after: float, detail: str):
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import ConfigDict, BaseModel, Field
+from pydantic.functional_validators import BeforeValidator
+
+from typing_extensions import Annotated
+
+from bson import ObjectId
+
+# Represents an ObjectId field in the database.
+# It will be represented as a `str` on the model so that it can be serialized to JSON.
+PyObjectId = Annotated[str, BeforeValidator(str)]
+
+class ActivityBucketModel(BaseModel):
+    """
+    Actividad de una clase en una hora o un día.
+    """
+    class_id: Optional[PyObjectId] = None
+    period: datetime = Field(...)
+    uploads: int = 0
+    comments: int = 0
+    resources: int = 0
+    active_users: int = 0
+
+    model_config = ConfigDict(
+        arbitrary_types_allowed=True,
+        json_encoders={ObjectId: str},
+    )
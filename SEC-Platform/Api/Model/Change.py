@@ -0,0 +1,49 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import ConfigDict, BaseModel, Field
+from pydantic.functional_validators import BeforeValidator
+
+from typing_extensions import Annotated
+
+from bson import ObjectId
+
+# Represents an ObjectId field in the database.
+# It will be represented as a `str` on the model so that it can be serialized to JSON.
+PyObjectId = Annotated[str, BeforeValidator(str)]
+
+class ChangeModel(BaseModel):
+    """
+    Un registro creado, modificado o borrado después de la marca de agua del cliente.
+
+    `entity` es `institution`, `class`, `resource` o `comment`. Los borrados (`deleted`) no
+    traen `data`; borrar una institución o una clase borra también todo lo que contiene.
+    """
+    entity: str = Field(..., enum=["institution", "class", "resource", "comment"])
+    id: PyObjectId = Field(...)
+    institution_id: PyObjectId = Field(...)
+    class_id: Optional[PyObjectId] = None
+    resource_id: Optional[PyObjectId] = None
+    deleted: bool = False
+    version: Optional[int] = None
+    updated_at: Optional[datetime] = None
+    data: Optional[dict] = None
+
+    model_config = ConfigDict(
+        arbitrary_types_allowed=True,
+        json_encoders={ObjectId: str},
+    )
+
+class ChangesPageModel(BaseModel):
+    """
+    Una página de cambios. `next` es la marca de agua para pedir la siguiente página o,
+    sin `has_more`, para la próxima sincronización.
+    """
+    changes: List[ChangeModel] = Field(default_factory=list)
+    next: str = Field(...)
+    has_more: bool = False
+
+    model_config = ConfigDict(
+        arbitrary_types_allowed=True,
+        json_encoders={ObjectId: str},
+    )
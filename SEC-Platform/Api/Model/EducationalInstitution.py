@@ -1,7 +1,7 @@
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Literal
 
-from pydantic import ConfigDict, BaseModel, Field, EmailStr
+from pydantic import ConfigDict, BaseModel, Field, EmailStr, field_validator
 from pydantic.functional_validators import BeforeValidator
 
 from typing_extensions import Annotated
@@ -14,7 +14,17 @@ from Api.Model.Resource import ResourceModel
 # It will be represented as a `str` on the model so that it can be serialized to JSON.
 PyObjectId = Annotated[str, BeforeValidator(str)]
 
+def validate_lng_lat(coordinates: List[float]) -> List[float]:
+    lng, lat = coordinates
+    if not -180 <= lng <= 180 or not -90 <= lat <= 90:
+        raise ValueError("coordinates must be [longitude, latitude]")
+    return coordinates
+
 class CoordinatesModel(BaseModel):
+    """
+    A GeoJSON Point, stored as is so it can be indexed with `2dsphere`.
+    """
+    type: Literal["Point"] = "Point"
     department: Optional[str] = None
     coordinates: List[float] = Field(..., min_items=2, max_items=2)
 
@@ -23,6 +33,11 @@ class CoordinatesModel(BaseModel):
         json_encoders={ObjectId: str},
     )
 
+    @field_validator("coordinates")
+    @classmethod
+    def check_coordinates(cls, coordinates: List[float]) -> List[float]:
+        return validate_lng_lat(coordinates)
+
 class EducationalInstitutionModel(BaseModel):
     id: Optional[PyObjectId] = Field(alias="_id", default=None)
     name: str = Field(...)
@@ -45,6 +60,41 @@ class EducationalInstitutionModel(BaseModel):
         },
     )
 
+class NearbyEducationalInstitutionModel(EducationalInstitutionModel):
+    distance: Optional[float] = None  # Meters from the queried point
+
+class PolygonQueryModel(BaseModel):
+    """
+    A closed ring of [longitude, latitude] pairs, optionally with a point to sort the results by distance.
+    """
+    coordinates: List[List[float]] = Field(..., min_length=4)
+    near: Optional[List[float]] = Field(None, min_length=2, max_length=2)
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "coordinates": [[-77.1, -12.2], [-76.9, -12.2], [-76.9, -11.9], [-77.1, -11.9], [-77.1, -12.2]],
+                "near": [-77.03, -12.04]
+            }
+        },
+    )
+
+    @field_validator("coordinates")
+    @classmethod
+    def check_ring(cls, coordinates: List[List[float]]) -> List[List[float]]:
+        for point in coordinates:
+            if len(point) != 2:
+                raise ValueError("every point must be [longitude, latitude]")
+            validate_lng_lat(point)
+        if coordinates[0] != coordinates[-1]:
+            raise ValueError("the polygon ring must be closed (first point equal to the last one)")
+        return coordinates
+
+    @field_validator("near")
+    @classmethod
+    def check_near(cls, near: Optional[List[float]]) -> Optional[List[float]]:
+        return validate_lng_lat(near) if near is not None else None
+
 class UpdateEducationalInstitutionModel(BaseModel):
     name: Optional[str] = None
     address: Optional[str] = None
@@ -102,4 +152,37 @@ class UpdateClassModel(BaseModel):
                 "student_ids": ["507f1f77bcf86cd799439015", "507f1f77bcf86cd799439016"]
             }
         },
-    )
\ No newline at end of file
+    )
+
+class ClassStatsModel(BaseModel):
+    resources: int = 0
+    comments: int = 0
+    files: int = 0
+    bytes: int = 0
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "resources": 12,
+                "comments": 87,
+                "files": 30,
+                "bytes": 52428800
+            }
+        },
+    )
+
+
+class InstitutionStatsModel(ClassStatsModel):
+    classes: int = 0
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "classes": 4,
+                "resources": 12,
+                "comments": 87,
+                "files": 30,
+                "bytes": 52428800
+            }
+        },
+    )
@@ -0,0 +1,20 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class EventModel(BaseModel):
+    """
+    Something that happened in an institution, emitted by the write routes.
+
+    `type` is `<entity>.<action>`, e.g. `comment.created` or `resource.created`.
+    `data` is the affected record as returned by the API (ids as `str`).
+    """
+    type: str = Field(...)
+    institution_id: str = Field(...)
+    class_id: Optional[str] = None
+    resource_id: Optional[str] = None
+    actor_id: Optional[str] = None
+    data: dict = Field(default_factory=dict)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,34 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import ConfigDict, BaseModel, Field
+from pydantic.functional_validators import BeforeValidator
+
+from typing_extensions import Annotated
+
+from bson import ObjectId
+
+# Represents an ObjectId field in the database.
+# It will be represented as a `str` on the model so that it can be serialized to JSON.
+PyObjectId = Annotated[str, BeforeValidator(str)]
+
+class JobModel(BaseModel):
+    """
+    Estado de un trabajo en segundo plano (p. ej. un borrado en cascada).
+    """
+    id: PyObjectId = Field(alias="_id")
+    type: str = Field(...)
+    status: str = Field(..., enum=["queued", "running", "done", "failed"])
+    attempts: int = 0
+    progress: Optional[dict] = None
+    result: Optional[dict] = None
+    last_error: Optional[str] = None
+    created_at: datetime = Field(...)
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        json_encoders={ObjectId: str},
+    )
@@ -37,6 +37,7 @@ class FileModel(BaseModel):
 class ResourceModel(BaseModel):
     id: Optional[str] = Field(alias="_id", default=None)
     title: str = Field(...)
+    description: Optional[str] = None
     type: str = Field(..., enum=["document", "video", "image"])
     file_ids: Optional[List[str]] = None  # Lista de IDs de archivos en GridFS
     created_at: Optional[datetime] = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,35 @@
+from typing import Optional, List
+
+from pydantic import ConfigDict, BaseModel, Field
+from pydantic.functional_validators import BeforeValidator
+
+from typing_extensions import Annotated
+
+from bson import ObjectId
+
+# Represents an ObjectId field in the database.
+# It will be represented as a `str` on the model so that it can be serialized to JSON.
+PyObjectId = Annotated[str, BeforeValidator(str)]
+
+class SearchResultModel(BaseModel):
+    id: PyObjectId = Field(alias="_id")
+    kind: str = Field(..., enum=["resource", "comment"])
+    institution_id: PyObjectId = Field(...)
+    class_id: PyObjectId = Field(...)
+    resource_id: Optional[PyObjectId] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    content: Optional[str] = None
+    score: float = Field(...)
+
+    model_config = ConfigDict(
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        json_encoders={ObjectId: str},
+    )
+
+class SearchResultsModel(BaseModel):
+    results: List[SearchResultModel]
+    page: int
+    page_size: int
+    has_more: bool
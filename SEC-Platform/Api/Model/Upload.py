@@ -0,0 +1,47 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import ConfigDict, BaseModel, Field
+from pydantic.functional_validators import BeforeValidator
+
+from typing_extensions import Annotated
+
+from bson import ObjectId
+
+# Represents an ObjectId field in the database.
+# It will be represented as a `str` on the model so that it can be serialized to JSON.
+PyObjectId = Annotated[str, BeforeValidator(str)]
+
+class CreateUploadSessionModel(BaseModel):
+    filename: str = Field(..., min_length=1, max_length=255)
+    content_type: Optional[str] = None
+    length: int = Field(..., gt=0)
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "filename": "clase-01.mp4",
+                "content_type": "video/mp4",
+                "length": 1073741824
+            }
+        },
+    )
+
+class UploadSessionModel(BaseModel):
+    id: PyObjectId = Field(alias="_id")
+    institution_id: PyObjectId = Field(...)
+    class_id: PyObjectId = Field(...)
+    resource_id: PyObjectId = Field(...)
+    filename: str = Field(...)
+    content_type: Optional[str] = None
+    length: int = Field(...)
+    chunk_size: int = Field(...)
+    received: int = Field(...)
+    status: str = Field(..., enum=["open", "finalizing", "done"])
+    expires_at: datetime = Field(...)
+
+    model_config = ConfigDict(
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        json_encoders={ObjectId: str},
+    )
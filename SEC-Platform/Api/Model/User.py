@@ -85,6 +85,24 @@ class UpdateUserModel(BaseModel):
     )
 
 
+class UserClassModel(BaseModel):
+    """
+    Una clase en la que el usuario enseña (`role` = `teacher`) o estudia (`student`), con su institución.
+    """
+    id: PyObjectId = Field(alias="_id")
+    name: str = Field(...)
+    teacher_id: Optional[PyObjectId] = None
+    role: str = Field(..., enum=["teacher", "student"])
+    institution_id: PyObjectId = Field(...)
+    institution_name: str = Field(...)
+
+    model_config = ConfigDict(
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        json_encoders={ObjectId: str},
+    )
+
+
 class UserCollectionModel(BaseModel):
     """
     Un contenedor que contiene una lista de instancias de `UserModel`.
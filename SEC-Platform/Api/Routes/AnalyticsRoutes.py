@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from Api.Model.Analytics import ActivityBucketModel
+from Api.Routes.EducationalInstitutionRoutes import canonical_class_id
+from Api.Services import Analytics, Reads
+
+analyticsRoutes = APIRouter()
+
+# Longest range one request may cover, per granularity
+MAX_RANGE = {"hour": timedelta(days=31), "day": timedelta(days=400)}
+
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Dates without an offset are taken as UTC, like MongoDB does
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+@analyticsRoutes.get(
+    "/educationalInstitutions/{institution_id}/activity",
+    response_description="Uploads, comments, new resources and active users per class and period",
+    response_model=List[ActivityBucketModel],
+    dependencies=[Depends(Reads.reporting)],
+    tags=["analytics"],
+)
+async def get_activity(
+        institution_id: str,
+        granularity: str = Query("day", enum=["hour", "day"]),
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        class_id: Optional[str] = None,
+):
+    """
+    Activity of an educational institution, one entry per class and period, oldest first.
+
+    Defaults to the last 30 days. Only the precomputed hourly or daily buckets are read,
+    so the answer time does not depend on how much data the institution has. The last
+    `ACTIVITY_ROLLUP_INTERVAL_SECONDS` of activity may not be counted yet.
+    """
+    end = as_utc(end) or datetime.now(timezone.utc)
+    start = as_utc(start) or end - timedelta(days=30)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if end - start > MAX_RANGE[granularity]:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_RANGE[granularity].days} days per request")
+
+    if class_id is not None:
+        class_id = await canonical_class_id(institution_id, class_id)
+    buckets = await Analytics.activity(institution_id, granularity, start, end, class_id)
+    return [ActivityBucketModel(**bucket) for bucket in buckets]
@@ -1,16 +1,66 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import FastAPI, Body, HTTPException, status, APIRouter
+from fastapi import FastAPI, Body, Depends, HTTPException, status, APIRouter, Query, Header
 from fastapi.responses import Response
 from bson import ObjectId
 from pymongo import ReturnDocument
 
 from Api.Config.db import educational_institutions_collection
 from Api.Model.EducationalInstitution import EducationalInstitutionModel, UpdateEducationalInstitutionModel, ClassModel, \
-    UpdateClassModel
+    UpdateClassModel, NearbyEducationalInstitutionModel, PolygonQueryModel, InstitutionStatsModel, ClassStatsModel
+from Api.Model.Job import JobModel
+from Api.Services.Ids import class_match, array_filter, id_condition, to_object_id, stringify_ids
+from Api.Services import Search, Geo, Stats, SingleFlight, Cascade, Jobs, Reads, Audit, Events, Changes, \
+    Preconditions, Fields
 
 educationalInstitutionRoutes = APIRouter()
 
+# Reads and conditional writes of `delete_class` before giving up on a class whose counters keep changing
+DELETE_CLASS_ATTEMPTS = 5
+
+FIELDS_DESCRIPTION = "Comma-separated fields to return, e.g. `id,name`. Defaults to all of them."
+
+# Fields returned when `fields` is not given. Nested arrays are never read unless selected
+INSTITUTION_FIELDS = ("id", "name", "address", "location")
+CLASS_FIELDS = ("id", "name", "teacher_id", "student_ids")
+
+
+async def find_class(institution_id: str, class_id: str):
+    """
+    Fetch only the requested class, using the `classes._id` index and a positional projection.
+    """
+    institution = await educational_institutions_collection.find_one(
+        {"_id": ObjectId(institution_id), **class_match(class_id)},
+        {"classes.$": 1}
+    )
+    if institution is not None:
+        return institution["classes"][0]
+
+    if await educational_institutions_collection.find_one({"_id": ObjectId(institution_id)}, {"_id": 1}) is None:
+        raise HTTPException(status_code=404, detail=f"Institution {institution_id} not found")
+    raise HTTPException(status_code=404, detail=f"Class {class_id} not found in institution {institution_id}")
+
+
+async def shared_class(institution_id: str, class_id: str):
+    """
+    Same as `find_class`, but concurrent identical reads share one query. Only for read routes.
+    """
+    return await SingleFlight.coalesce(
+        SingleFlight.query_key("class", institution_id, class_id),
+        lambda: find_class(institution_id, class_id)
+    )
+
+
+async def canonical_class_id(institution_id: str, class_id: str) -> ObjectId:
+    """
+    Resolve a class id that may still be a legacy uuid to the class's ObjectId `_id`.
+    """
+    object_id = to_object_id(class_id)
+    if object_id is not None:
+        return object_id
+    return (await find_class(institution_id, class_id))["_id"]
+
+
 @educationalInstitutionRoutes.post(
     "/educationalInstitutions/",
     response_description="Add new educational institution",
@@ -27,16 +77,19 @@ async def create_educational_institution(
 
     A unique `id` will be created and provided in the response.
     """
-    new_institution = await educational_institutions_collection.insert_one(
-        institution.model_dump(by_alias=True, exclude={"id"})
-    )
-    created_institution = await educational_institutions_collection.find_one(
-        {"_id": new_institution.inserted_id}
-    )
+    async with Reads.causal_session() as session:
+        new_institution = await educational_institutions_collection.insert_one(
+            Changes.stamp(institution.model_dump(by_alias=True, exclude={"id"})), session=session
+        )
+        created_institution = await Reads.primary(educational_institutions_collection).find_one(
+            {"_id": new_institution.inserted_id}, session=session
+        )
 
     if created_institution is None:
         raise HTTPException(status_code=404, detail="Institution not found after creation")
 
+    await Events.emit("institution.created", created_institution["_id"], data=created_institution)
+    Audit.annotate(entity="institution", entity_id=str(created_institution["_id"]))
     return EducationalInstitutionModel(
         id=str(created_institution["_id"]),
         name=created_institution["name"],
@@ -50,15 +103,21 @@ async def create_educational_institution(
     response_description="List all educational institutions",
     response_model=List[EducationalInstitutionModel],
     response_model_by_alias=False,
+    dependencies=[Depends(Reads.reporting)],
     tags=["educationalInstitutions"],
 )
-async def list_educational_institutions():
+async def list_educational_institutions(fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)):
     """
     List all educational institutions in the database.
 
     The response is unpaginated and limited to 1000 results.
     """
-    institutions = await educational_institutions_collection.find().to_list(1000)
+    selected = Fields.parse(fields, EducationalInstitutionModel)
+    institutions = await Reads.reader(educational_institutions_collection) \
+        .find({}, Fields.projection(selected or INSTITUTION_FIELDS)) \
+        .to_list(1000)
+    if selected is not None:
+        return Fields.response(EducationalInstitutionModel, selected, institutions)
     return [
         EducationalInstitutionModel(
             id=str(inst["_id"]),
@@ -69,6 +128,86 @@ async def list_educational_institutions():
         for inst in institutions
     ]
 
+def to_nearby_models(institutions: List[dict]) -> List[NearbyEducationalInstitutionModel]:
+    return [
+        NearbyEducationalInstitutionModel(
+            id=str(inst["_id"]),
+            name=inst["name"],
+            address=inst["address"],
+            location=inst.get("location"),
+            distance=inst.get("distance")
+        )
+        for inst in institutions
+    ]
+
+# The geo routes are declared before "/educationalInstitutions/{id}" so that "near" is not taken as an id.
+@educationalInstitutionRoutes.get(
+    "/educationalInstitutions/near",
+    response_description="List the educational institutions nearest to a point",
+    response_model=List[NearbyEducationalInstitutionModel],
+    response_model_by_alias=False,
+    dependencies=[Depends(Reads.reporting)],
+    tags=["educationalInstitutions"],
+)
+async def near_educational_institutions(
+        lng: float = Query(..., ge=-180, le=180),
+        lat: float = Query(..., ge=-90, le=90),
+        max_distance: Optional[float] = Query(None, gt=0, description="Meters"),
+        page: int = Query(1, ge=1),
+        page_size: int = Query(20, ge=1, le=100),
+):
+    """
+    List educational institutions sorted by distance from (`lng`, `lat`), nearest first.
+
+    `distance` is given in meters.
+    """
+    institutions = await Geo.near(lng, lat, max_distance, skip=(page - 1) * page_size, limit=page_size)
+    return to_nearby_models(institutions)
+
+@educationalInstitutionRoutes.get(
+    "/educationalInstitutions/within-radius",
+    response_description="List the educational institutions within a radius of a point",
+    response_model=List[NearbyEducationalInstitutionModel],
+    response_model_by_alias=False,
+    dependencies=[Depends(Reads.reporting)],
+    tags=["educationalInstitutions"],
+)
+async def educational_institutions_within_radius(
+        lng: float = Query(..., ge=-180, le=180),
+        lat: float = Query(..., ge=-90, le=90),
+        radius: float = Query(..., gt=0, description="Meters"),
+        page: int = Query(1, ge=1),
+        page_size: int = Query(20, ge=1, le=100),
+):
+    """
+    List educational institutions at most `radius` meters away from (`lng`, `lat`), nearest first.
+    """
+    institutions = await Geo.near(lng, lat, radius, skip=(page - 1) * page_size, limit=page_size)
+    return to_nearby_models(institutions)
+
+@educationalInstitutionRoutes.post(
+    "/educationalInstitutions/within-polygon",
+    response_description="List the educational institutions inside a polygon",
+    response_model=List[NearbyEducationalInstitutionModel],
+    response_model_by_alias=False,
+    dependencies=[Depends(Reads.reporting)],
+    tags=["educationalInstitutions"],
+)
+async def educational_institutions_within_polygon(
+        polygon: PolygonQueryModel = Body(...),
+        page: int = Query(1, ge=1),
+        page_size: int = Query(20, ge=1, le=100),
+):
+    """
+    List educational institutions located inside the polygon.
+
+    When `near` is provided the results are sorted by distance from that point.
+    """
+    institutions = await Geo.within_polygon(
+        polygon.coordinates, polygon.near, skip=(page - 1) * page_size, limit=page_size
+    )
+    return to_nearby_models(institutions)
+
 @educationalInstitutionRoutes.get(
     "/educationalInstitutions/{id}",
     response_description="Get a single educational institution",
@@ -76,15 +215,32 @@ async def list_educational_institutions():
     response_model_by_alias=False,
     tags=["educationalInstitutions"],
 )
-async def show_educational_institution(id: str):
+async def show_educational_institution(
+        id: str,
+        response: Response,
+        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+):
     """
     Get the record for a specific educational institution, looked up by `id`.
+
+    The `ETag` is the institution's version; send it back in `If-Match` when updating it.
     """
-    institution = await educational_institutions_collection.find_one({"_id": ObjectId(id)})
+    selected = Fields.parse(fields, EducationalInstitutionModel)
+    institution = await educational_institutions_collection.find_one(
+        {"_id": ObjectId(id)}, {**Fields.projection(selected or INSTITUTION_FIELDS), "version": 1}
+    )
 
     if institution is None:
         raise HTTPException(status_code=404, detail=f"Institution {id} not found")
 
+    etag = Preconditions.etag(institution)
+    if selected is not None:
+        selected_response = Fields.response(EducationalInstitutionModel, selected, institution)
+        selected_response.headers["ETag"] = etag
+        return selected_response
+
+    response.headers["ETag"] = etag
+
     return EducationalInstitutionModel(
         id=str(institution["_id"]),
         name=institution["name"],
@@ -92,6 +248,25 @@ async def show_educational_institution(id: str):
         location=institution.get("location")
     )
 
+@educationalInstitutionRoutes.get(
+    "/educationalInstitutions/{id}/stats",
+    response_description="Get the counters of an educational institution",
+    response_model=InstitutionStatsModel,
+    dependencies=[Depends(Reads.reporting)],
+    tags=["educationalInstitutions"],
+)
+async def get_educational_institution_stats(id: str):
+    """
+    Get the number of classes, resources, comments and files of an educational institution,
+    and the bytes stored in its files.
+
+    Only the maintained counters are read; nothing is counted on request.
+    """
+    stats = await Stats.institution_stats(id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail=f"Institution {id} not found")
+    return InstitutionStatsModel(**stats)
+
 @educationalInstitutionRoutes.put(
     "/educationalInstitutions/{id}",
     response_description="Update an educational institution",
@@ -100,62 +275,83 @@ async def show_educational_institution(id: str):
     tags=["educationalInstitutions"],
 )
 async def update_educational_institution(
-        id: str, institution: UpdateEducationalInstitutionModel = Body(...)
+        id: str,
+        response: Response,
+        institution: UpdateEducationalInstitutionModel = Body(...),
+        if_match: Optional[str] = Header(None),
 ):
     """
     Update individual fields of an existing educational institution record.
 
     Only the provided fields will be updated.
     Any missing or `null` fields will be ignored.
+
+    With `If-Match`, the update only happens if the institution is still at that version
+    (its `ETag`); otherwise nothing is written and the answer is 412 with the current `ETag`.
     """
     update_data = {
         k: v for k, v in institution.model_dump(exclude_unset=True).items() if v is not None
     }
+    condition = {"_id": ObjectId(id), **Preconditions.version_condition(Preconditions.expected_versions(if_match))}
 
     if len(update_data) >= 1:
         updated_institution = await educational_institutions_collection.find_one_and_update(
-            {"_id": ObjectId(id)},
-            {"$set": update_data},
+            condition,
+            Changes.stamped({"$set": update_data}),
             return_document=ReturnDocument.AFTER,
         )
-        if updated_institution is not None:
-            return EducationalInstitutionModel(
-                id=str(updated_institution["_id"]),
-                name=updated_institution["name"],
-                address=updated_institution["address"],
-                location=updated_institution.get("location")
-            )
-        else:
-            raise HTTPException(status_code=404, detail=f"Institution {id} not found")
+    else:
+        # The update is empty, but we should still return the matching document
+        updated_institution = await educational_institutions_collection.find_one(condition)
 
-    # The update is empty, but we should still return the matching document:
-    existing_institution = await educational_institutions_collection.find_one({"_id": ObjectId(id)})
-    if existing_institution is not None:
-        return EducationalInstitutionModel(
-            id=str(existing_institution["_id"]),
-            name=existing_institution["name"],
-            address=existing_institution["address"],
-            location=existing_institution.get("location")
-        )
+    if updated_institution is None:
+        current = await educational_institutions_collection.find_one({"_id": ObjectId(id)}, {"version": 1})
+        if current is None:
+            raise HTTPException(status_code=404, detail=f"Institution {id} not found")
+        raise Preconditions.precondition_failed(current)
 
-    raise HTTPException(status_code=404, detail=f"Institution {id} not found")
+    if len(update_data) >= 1:
+        await Events.emit("institution.updated", id, data=update_data)
+    response.headers["ETag"] = Preconditions.etag(updated_institution)
+    return EducationalInstitutionModel(
+        id=str(updated_institution["_id"]),
+        name=updated_institution["name"],
+        address=updated_institution["address"],
+        location=updated_institution.get("location")
+    )
 
 @educationalInstitutionRoutes.delete(
     "/educationalInstitutions/{id}",
-    response_description="Delete an educational institution",
-    status_code=status.HTTP_204_NO_CONTENT,
+    response_description="Delete an educational institution; its files are removed in the background",
+    response_model=JobModel,
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model_by_alias=False,
+    responses={status.HTTP_204_NO_CONTENT: {"description": "Deleted, with nothing left to remove"}},
     tags=["educationalInstitutions"],
 )
-async def delete_educational_institution(id: str):
+async def delete_educational_institution(id: str, response: Response):
     """
     Remove a single educational institution record from the database.
+
+    The institution is gone as soon as this returns. Without comments or files the answer
+    is 204, as before. Otherwise they are deleted by a background job and the answer is 202
+    with that job; follow its progress at the `Location` returned.
     """
-    delete_result = await educational_institutions_collection.delete_one({"_id": ObjectId(id)})
+    # El documento borrado trae, en la misma llamada, los ids de todos sus archivos
+    deleted = await educational_institutions_collection.find_one_and_delete(
+        {"_id": ObjectId(id)}, projection={"classes.resources.file_ids": 1}
+    )
+    if deleted is None:
+        raise HTTPException(status_code=404, detail=f"Institution {id} not found")
 
-    if delete_result.deleted_count == 1:
+    await Search.remove_institution(id)
+    await Events.emit("institution.deleted", deleted["_id"])
+    file_ids = Cascade.file_ids_of(deleted)
+    if not await Cascade.needed(deleted["_id"], file_ids=file_ids):
         return Response(status_code=status.HTTP_204_NO_CONTENT)
-
-    raise HTTPException(status_code=404, detail=f"Institution {id} not found")
+    job_id = await Cascade.enqueue(deleted["_id"], file_ids=file_ids)
+    response.headers["Location"] = f"/api/v1/jobs/{job_id}"
+    return JobModel(**stringify_ids(await Jobs.get_job(job_id)))
 
 
 @educationalInstitutionRoutes.get(
@@ -165,16 +361,24 @@ async def delete_educational_institution(id: str):
     response_model_by_alias=False,
     tags=["educationalInstitutions"],
 )
-async def get_classes(institution_id: str):
+async def get_classes(institution_id: str, fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION)):
     """
     Get all classes for a specific educational institution.
+
+    `resources` is only returned when selected in `fields`.
     """
-    institution = await educational_institutions_collection.find_one({"_id": ObjectId(institution_id)})
+    selected = Fields.parse(fields, ClassModel)
+    institution = await educational_institutions_collection.find_one(
+        {"_id": ObjectId(institution_id)},
+        Fields.projection(selected or CLASS_FIELDS, prefix="classes.")
+    )
 
     if institution is None:
         raise HTTPException(status_code=404, detail=f"Institution {institution_id} not found")
 
     classes = institution.get("classes", [])
+    if selected is not None:
+        return Fields.response(ClassModel, selected, classes)
 
     # Convertir los datos a modelos ClassModel
     return [
@@ -195,27 +399,39 @@ async def get_classes(institution_id: str):
     response_model_by_alias=False,
     tags=["educationalInstitutions"],
 )
-async def get_class(institution_id: str, class_id: str):
+async def get_class(institution_id: str, class_id: str, response: Response):
     """
     Get a specific class of a specific educational institution.
-    """
-    institution = await educational_institutions_collection.find_one({"_id": ObjectId(institution_id)})
-
-    if institution is None:
-        raise HTTPException(status_code=404, detail=f"Institution {institution_id} not found")
 
-    classes = institution.get("classes", [])
+    The `ETag` is the class's version; send it back in `If-Match` when updating it.
+    """
+    cls = await shared_class(institution_id, class_id)
+    response.headers["ETag"] = Preconditions.etag(cls)
+
+    return ClassModel(
+        id=str(cls.get("_id")),
+        name=cls["name"],
+        teacher_id=str(cls["teacher_id"]),
+        student_ids=[str(sid) for sid in cls.get("student_ids", [])]
+    )
 
-    for cls in classes:
-        if str(cls.get("_id")) == class_id:
-            return ClassModel(
-                id=str(cls.get("_id")),
-                name=cls["name"],
-                teacher_id=str(cls["teacher_id"]),
-                student_ids=[str(sid) for sid in cls.get("student_ids", [])]
-            )
 
-    raise HTTPException(status_code=404, detail=f"Class {class_id} not found in institution {institution_id}")
+@educationalInstitutionRoutes.get(
+    "/educationalInstitutions/{institution_id}/classes/{class_id}/stats",
+    response_description="Get the counters of a class",
+    response_model=ClassStatsModel,
+    dependencies=[Depends(Reads.reporting)],
+    tags=["educationalInstitutions"],
+)
+async def get_class_stats(institution_id: str, class_id: str):
+    """
+    Get the number of resources, comments and files of a class, and the bytes stored in its files.
+    """
+    class_object_id = await canonical_class_id(institution_id, class_id)
+    stats = await Stats.class_stats(institution_id, class_object_id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail=f"Class {class_id} not found in institution {institution_id}")
+    return ClassStatsModel(**stats)
 
 
 @educationalInstitutionRoutes.post(
@@ -239,16 +455,19 @@ async def create_class(institution_id: str, class_data: ClassModel = Body(...)):
     class_dict["_id"] = class_id
     class_dict["teacher_id"] = ObjectId(class_dict["teacher_id"])
     class_dict["student_ids"] = [ObjectId(sid) for sid in class_dict.get("student_ids", [])]
+    Changes.stamp(class_dict)
 
     # Agregar la nueva clase al arreglo 'classes'
     result = await educational_institutions_collection.update_one(
         {"_id": ObjectId(institution_id)},
-        {"$push": {"classes": class_dict}}
+        {"$push": {"classes": class_dict}, "$inc": Stats.inc(classes=1)}
     )
 
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail=f"Institution {institution_id} not found")
 
+    await Events.emit("class.created", institution_id, class_id, data=class_dict)
+    Audit.annotate(entity="class", entity_id=str(class_id), institution_id=institution_id)
     return class_data
 
 
@@ -260,10 +479,17 @@ async def create_class(institution_id: str, class_data: ClassModel = Body(...)):
     tags=["educationalInstitutions"],
 )
 async def update_class(
-        institution_id: str, class_id: str, class_data: UpdateClassModel = Body(...)
+        institution_id: str,
+        class_id: str,
+        response: Response,
+        class_data: UpdateClassModel = Body(...),
+        if_match: Optional[str] = Header(None),
 ):
     """
     Update a class of a specific educational institution.
+
+    With `If-Match`, the update only happens if the class is still at that version (its
+    `ETag`); otherwise nothing is written and the answer is 412 with the current `ETag`.
     """
     update_data = {
         k: v for k, v in class_data.model_dump(exclude_unset=True).items() if v is not None
@@ -278,58 +504,89 @@ async def update_class(
     if "student_ids" in update_data:
         update_data["student_ids"] = [ObjectId(sid) for sid in update_data["student_ids"]]
 
-    # Actualizar la clase utilizando arrayFilters
-    result = await educational_institutions_collection.update_one(
+    # La versión esperada va en el filtro: comprobar y escribir es una sola operación atómica.
+    # La proyección devuelve solo la clase actualizada, sin una segunda lectura
+    updated = await educational_institutions_collection.find_one_and_update(
         {
             "_id": ObjectId(institution_id),
-            "classes._id": ObjectId(class_id)
+            "classes": {"$elemMatch": {
+                **id_condition(class_id),
+                **Preconditions.version_condition(Preconditions.expected_versions(if_match)),
+            }},
         },
-        {
+        Changes.stamped({
             "$set": {
                 **{f"classes.$[elem].{key}": value for key, value in update_data.items()}
             }
-        },
-        array_filters=[{"elem._id": ObjectId(class_id)}]
+        }, "classes.$[elem]"),
+        array_filters=[array_filter("elem", class_id)],
+        projection={"classes": {"$elemMatch": id_condition(class_id)}},
+        return_document=ReturnDocument.AFTER,
     )
 
-    if result.modified_count == 0:
-        raise HTTPException(status_code=404, detail=f"Class {class_id} not found in institution {institution_id}")
-
-    # Devolver la clase actualizada
-    institution = await educational_institutions_collection.find_one({"_id": ObjectId(institution_id)})
+    if updated is None:
+        # 404 si la clase no existe; si existe, otra petición la modificó antes
+        raise Preconditions.precondition_failed(await find_class(institution_id, class_id))
 
-    if institution is None:
-        raise HTTPException(status_code=404, detail=f"Institution {institution_id} not found")
+    cls = updated["classes"][0]
+    await Events.emit("class.updated", institution_id, cls["_id"], data=update_data)
 
-    classes = institution.get("classes", [])
-    for cls in classes:
-        if str(cls.get("_id")) == class_id:
-            return ClassModel(
-                id=str(cls.get("_id")),
-                name=cls["name"],
-                teacher_id=str(cls["teacher_id"]),
-                student_ids=[str(sid) for sid in cls.get("student_ids", [])]
-            )
-
-    raise HTTPException(status_code=404, detail=f"Class {class_id} not found after update")
+    response.headers["ETag"] = Preconditions.etag(cls)
+    return ClassModel(
+        id=str(cls.get("_id")),
+        name=cls["name"],
+        teacher_id=str(cls["teacher_id"]),
+        student_ids=[str(sid) for sid in cls.get("student_ids", [])]
+    )
 
 
 @educationalInstitutionRoutes.delete(
     "/educationalInstitutions/{institution_id}/classes/{class_id}",
-    response_description="Delete a class from an educational institution",
-    status_code=status.HTTP_204_NO_CONTENT,
+    response_description="Delete a class from an educational institution; its files are removed in the background",
+    response_model=JobModel,
+    status_code=status.HTTP_202_ACCEPTED,
+    response_model_by_alias=False,
+    responses={status.HTTP_204_NO_CONTENT: {"description": "Deleted, with nothing left to remove"}},
     tags=["educationalInstitutions"],
 )
-async def delete_class(institution_id: str, class_id: str):
+async def delete_class(institution_id: str, class_id: str, response: Response):
     """
     Delete a class from a specific educational institution.
-    """
-    result = await educational_institutions_collection.update_one(
-        {"_id": ObjectId(institution_id)},
-        {"$pull": {"classes": {"_id": ObjectId(class_id)}}}
-    )
 
-    if result.modified_count == 0:
-        raise HTTPException(status_code=404, detail=f"Class {class_id} not found in institution {institution_id}")
-
-    return Response(status_code=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+    The class is gone as soon as this returns. Without comments or files the answer is
+    204, as before. Otherwise they are deleted by a background job and the answer is 202
+    with that job; follow its progress at the `Location` returned.
+    """
+    class_object_id = await canonical_class_id(institution_id, class_id)
+    for _ in range(DELETE_CLASS_ATTEMPTS):
+        institution = await educational_institutions_collection.find_one(
+            {"_id": ObjectId(institution_id), **class_match(class_object_id)},
+            {"classes.$": 1},
+        )
+        if institution is None:
+            raise HTTPException(status_code=404, detail=f"Class {class_id} not found in institution {institution_id}")
+
+        # Una sola escritura quita la clase y resta sus contadores, con la condición de que
+        # estos sigan siendo los leídos: si otra escritura los cambió entre medio, se vuelve a leer
+        class_stats = institution["classes"][0].get("stats")
+        decrements = {name: -(class_stats or {}).get(name, 0) for name in Stats.CLASS_COUNTERS}
+        removed = await educational_institutions_collection.update_one(
+            {
+                "_id": ObjectId(institution_id),
+                "classes": {"$elemMatch": {**id_condition(class_object_id), "stats": class_stats}},
+            },
+            {"$pull": {"classes": id_condition(class_object_id)}, "$inc": Stats.inc(classes=-1, **decrements)},
+        )
+        if removed.modified_count:
+            break
+    else:
+        raise HTTPException(status_code=409, detail=f"Class {class_id} kept changing; try again")
+
+    await Search.remove_class(institution_id, class_object_id)
+    await Events.emit("class.deleted", institution_id, class_object_id)
+    file_ids = Cascade.file_ids_of(institution)
+    if not await Cascade.needed(institution_id, class_object_id, file_ids):
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    job_id = await Cascade.enqueue(institution_id, class_object_id, file_ids)
+    response.headers["Location"] = f"/api/v1/jobs/{job_id}"
+    return JobModel(**stringify_ids(await Jobs.get_job(job_id)))
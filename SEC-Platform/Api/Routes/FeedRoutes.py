@@ -0,0 +1,107 @@
+import asyncio
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Request, WebSocket, status
+from fastapi.responses import StreamingResponse
+
+from Api.Config import settings
+from Api.Routes.EducationalInstitutionRoutes import canonical_class_id
+from Api.Routes.ResourceRoutes import shared_resource
+from Api.Services.Broker import broker, class_topic, resource_topic, Subscription
+
+feedRoutes = APIRouter()
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # Evita que un proxy (nginx) acumule los eventos
+}
+
+
+async def sse_stream(request: Request, subscription: Subscription):
+    with subscription:
+        yield "retry: 3000\n\n"
+        while True:
+            message = await subscription.get(timeout=settings.FEED_HEARTBEAT_SECONDS)
+            if await request.is_disconnected():
+                break
+            if message is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"data: {message}\n\n"
+
+
+async def serve_websocket(websocket: WebSocket, topics: List[str]):
+    await websocket.accept()
+    with broker.subscribe(topics) as subscription:
+        receive = asyncio.ensure_future(websocket.receive())
+        try:
+            while True:
+                get = asyncio.ensure_future(subscription.get(timeout=settings.FEED_HEARTBEAT_SECONDS))
+                done, _ = await asyncio.wait({get, receive}, return_when=asyncio.FIRST_COMPLETED)
+                if receive in done:
+                    get.cancel()
+                    if receive.result()["type"] == "websocket.disconnect":
+                        return
+                    # Los mensajes del cliente se ignoran; el canal es solo de salida
+                    receive = asyncio.ensure_future(websocket.receive())
+                    continue
+                message = get.result()
+                await websocket.send_text(message if message is not None else '{"type": "ping"}')
+        finally:
+            receive.cancel()
+
+
+@feedRoutes.get(
+    "/educationalInstitutions/{institution_id}/classes/{class_id}/events",
+    response_description="Server-sent events for new resources and comments of a class",
+    tags=["feed"],
+)
+async def class_events(request: Request, institution_id: str, class_id: str):
+    """
+    Canal SSE con los recursos y comentarios nuevos de una clase.
+
+    Cada evento es un JSON con `type` (`resource.created`, `comment.created`) y `data`.
+    """
+    class_object_id = await canonical_class_id(institution_id, class_id)
+    subscription = broker.subscribe([class_topic(class_object_id)])
+    return StreamingResponse(sse_stream(request, subscription), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@feedRoutes.get(
+    "/educationalInstitutions/{institution_id}/classes/{class_id}/resources/{resource_id}/events",
+    response_description="Server-sent events for new comments of a resource",
+    tags=["feed"],
+)
+async def resource_events(request: Request, institution_id: str, class_id: str, resource_id: str):
+    """
+    Canal SSE con los comentarios nuevos de un recurso.
+    """
+    resource = await shared_resource(institution_id, class_id, resource_id)
+    subscription = broker.subscribe([resource_topic(resource["_id"])])
+    return StreamingResponse(sse_stream(request, subscription), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@feedRoutes.websocket("/educationalInstitutions/{institution_id}/classes/{class_id}/ws")
+async def class_websocket(websocket: WebSocket, institution_id: str, class_id: str):
+    """
+    Igual que el canal SSE de la clase, sobre WebSocket.
+    """
+    try:
+        class_object_id = await canonical_class_id(institution_id, class_id)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await serve_websocket(websocket, [class_topic(class_object_id)])
+
+
+@feedRoutes.websocket("/educationalInstitutions/{institution_id}/classes/{class_id}/resources/{resource_id}/ws")
+async def resource_websocket(websocket: WebSocket, institution_id: str, class_id: str, resource_id: str):
+    """
+    Igual que el canal SSE del recurso, sobre WebSocket.
+    """
+    try:
+        resource = await shared_resource(institution_id, class_id, resource_id)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await serve_websocket(websocket, [resource_topic(resource["_id"])])
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, HTTPException
+
+from Api.Model.Job import JobModel
+from Api.Services import Jobs
+from Api.Services.Ids import stringify_ids, to_object_id
+
+jobRoutes = APIRouter()
+
+
+@jobRoutes.get(
+    "/jobs/{job_id}",
+    response_description="Status and progress of a background job",
+    response_model=JobModel,
+    response_model_by_alias=False,
+    tags=["jobs"],
+)
+async def get_job(job_id: str):
+    """
+    Consultar el estado de un trabajo en segundo plano, p. ej. el borrado en cascada de una
+    institución o una clase: `status` (`queued`, `running`, `done`, `failed`), `progress`
+    mientras corre y `result` cuando termina.
+    """
+    job = await Jobs.get_job(to_object_id(job_id)) if to_object_id(job_id) is not None else None
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return JobModel(**stringify_ids(job))
@@ -1,14 +1,64 @@
 from typing import List, Optional
 
-from fastapi import FastAPI, Body, HTTPException, status, APIRouter, UploadFile, File, Form
+from fastapi import FastAPI, Body, HTTPException, status, APIRouter, UploadFile, File, Form, Query, Request
 from fastapi.responses import Response, FileResponse
 from bson import ObjectId
 from Api.Model.Resource import ResourceModel, CommentModel, FileModel
 
 from Api.Config.db import educational_institutions_collection, db, grid_fs_bucket
+from Api.Routes.EducationalInstitutionRoutes import find_class, canonical_class_id
+from Api.Services.Ids import class_match, array_filter, find_by_id, to_object_id
+from Api.Services import Search, Events, Comments, Stats, Thumbnails, Storage, PostUpload, SingleFlight, Changes, \
+    Deadlines
 
 resourcesRoutes = APIRouter()
 
+
+async def find_resource(institution_id: str, class_id: str, resource_id: str):
+    """
+    Obtener solo el recurso pedido, usando los índices de `classes._id` y `classes.resources._id`.
+    """
+    institution = await educational_institutions_collection.find_one(
+        {"_id": ObjectId(institution_id), **class_match(class_id, resource_id)},
+        {"classes.$": 1}  # Solo devolver la clase que coincide
+    )
+    if institution is not None:
+        resource = find_by_id(institution["classes"][0].get("resources", []), resource_id)
+        if resource is not None:
+            return resource
+
+    # Distinguir entre institución, clase o recurso inexistente
+    await find_class(institution_id, class_id)
+    raise HTTPException(status_code=404, detail=f"Resource {resource_id} not found")
+
+
+async def shared_resource(institution_id: str, class_id: str, resource_id: str):
+    """
+    Igual que `find_resource`, pero las lecturas idénticas concurrentes comparten una sola consulta.
+    Solo para rutas de lectura.
+    """
+    return await SingleFlight.coalesce(
+        SingleFlight.query_key("resource", institution_id, class_id, resource_id),
+        lambda: find_resource(institution_id, class_id, resource_id)
+    )
+
+
+async def existing_resource_id(institution_id: str, class_id: str, resource_id: str) -> ObjectId:
+    """
+    Verificar que el recurso existe sin leer la clase, y devolver su `_id` ObjectId.
+    """
+    object_id = to_object_id(resource_id)
+    if object_id is not None:
+        exists = await educational_institutions_collection.find_one(
+            {"_id": ObjectId(institution_id), **class_match(class_id, resource_id)},
+            {"_id": 1}
+        )
+        if exists is not None:
+            return object_id
+    # uuid heredado o recurso inexistente (en cuyo caso find_resource responde 404)
+    return (await find_resource(institution_id, class_id, resource_id))["_id"]
+
+
 @resourcesRoutes.post(
     "/educationalInstitutions/{institution_id}/classes/{class_id}/resources",
     response_description="Add a resource to a class",
@@ -29,21 +79,27 @@ async def create_resource(
     resource.id = str(resource_id)
     resource_data = resource.model_dump(by_alias=True, exclude_unset=True)
     resource_data["_id"] = resource_id
+    Changes.stamp(resource_data)
 
     # Agregar el nuevo recurso al arreglo 'resources' de la clase
     result = await educational_institutions_collection.update_one(
         {
             "_id": ObjectId(institution_id),
-            "classes._id": ObjectId(class_id)
+            **class_match(class_id)
         },
         {
-            "$push": {"classes.$.resources": resource_data}
+            "$push": {"classes.$.resources": resource_data},
+            "$inc": Stats.inc("classes.$", resources=1)
         }
     )
 
-    if result.modified_count == 0:
+    if result.matched_count == 0:
         raise HTTPException(status_code=404, detail=f"Class {class_id} not found in institution {institution_id}")
 
+    class_object_id = await canonical_class_id(institution_id, class_id)
+    await Search.index_resource(institution_id, class_object_id, resource_data)
+    await Events.emit("resource.created", institution_id, class_object_id, resource_id, data=resource_data)
+
     return resource
 
 
@@ -62,55 +118,53 @@ async def upload_files(
     """
     Subir archivos a un recurso específico en una clase.
     """
+    # Los archivos ya llegaron: el plazo de la subida cubre solo las escrituras en MongoDB
+    with Deadlines.upload_writes():
+        return await store_files(institution_id, class_id, resource_id, files)
+
+
+async def store_files(institution_id: str, class_id: str, resource_id: str, files: List[UploadFile]):
     # Verificar que el recurso existe
-    institution = await educational_institutions_collection.find_one({"_id": ObjectId(institution_id)})
-    if not institution:
-        raise HTTPException(status_code=404, detail=f"Institution {institution_id} not found")
-
-    resource_found = False
-    for cls in institution.get("classes", []):
-        if str(cls.get("_id")) == class_id:
-            for res in cls.get("resources", []):
-                if str(res.get("_id")) == resource_id:
-                    resource_found = True
-                    file_ids = res.get("file_ids", [])
-                    break
-            break
-
-    if not resource_found:
-        raise HTTPException(status_code=404, detail=f"Resource {resource_id} not found in class {class_id}")
+    await find_resource(institution_id, class_id, resource_id)
 
     # Subir archivos a GridFS y obtener sus IDs
     uploaded_file_ids = []
+    uploaded_content_types = []
+    uploaded_bytes = 0
     for file in files:
         contents = await file.read()
-        grid_in = grid_fs_bucket.open_upload_stream(
-            file.filename,
-            metadata={"contentType": file.content_type}
-        )
-        await grid_in.write(contents)
-        await grid_in.close()
-        uploaded_file_ids.append(grid_in._id)
+        # Los archivos comprimibles (texto, CSV, HTML, SVG...) se guardan ya comprimidos
+        file_id, stored_bytes = await Storage.store_upload(file.filename, file.content_type, contents)
+        uploaded_bytes += stored_bytes
+        uploaded_file_ids.append(file_id)
+        uploaded_content_types.append(file.content_type)
 
     # Actualizar el recurso con los IDs de los archivos
     result = await educational_institutions_collection.update_one(
         {
             "_id": ObjectId(institution_id),
-            "classes._id": ObjectId(class_id),
-            "classes.resources._id": ObjectId(resource_id)
-        },
-        {
-            "$push": {"classes.$[class].resources.$[res].file_ids": {"$each": uploaded_file_ids}}
+            **class_match(class_id, resource_id)
         },
+        Changes.stamped({
+            "$push": {"classes.$[class].resources.$[res].file_ids": {"$each": uploaded_file_ids}},
+            "$inc": Stats.inc("classes.$[class]", files=len(uploaded_file_ids), bytes=uploaded_bytes)
+        }, "classes.$[class].resources.$[res]"),
         array_filters=[
-            {"class._id": ObjectId(class_id)},
-            {"res._id": ObjectId(resource_id)}
+            array_filter("class", class_id),
+            array_filter("res", resource_id)
         ]
     )
 
     if result.modified_count == 0:
         raise HTTPException(status_code=500, detail="Failed to update resource with file IDs")
 
+    # Hash, análisis y miniaturas se hacen en la cola de trabajos; la respuesta no los espera
+    await PostUpload.enqueue(zip(uploaded_file_ids, uploaded_content_types))
+    await Events.emit(
+        "file.uploaded", institution_id, await canonical_class_id(institution_id, class_id), resource_id,
+        data={"file_ids": uploaded_file_ids, "count": len(uploaded_file_ids), "bytes": uploaded_bytes}
+    )
+
     return {"file_ids": [str(file_id) for file_id in uploaded_file_ids]}
 
 
@@ -125,28 +179,7 @@ async def get_resource(institution_id: str, class_id: str, resource_id: str):
     """
     Obtener un recurso específico de una clase en una institución educativa.
     """
-    institution = await educational_institutions_collection.find_one(
-        {
-            "_id": ObjectId(institution_id),
-            "classes._id": ObjectId(class_id),
-            "classes.resources._id": ObjectId(resource_id)
-        },
-        {
-            "classes.$": 1  # Solo devolver la clase que coincide
-        }
-    )
-
-    if not institution or "classes" not in institution:
-        raise HTTPException(status_code=404, detail=f"Resource {resource_id} not found")
-
-    resource = None
-    for res in institution["classes"][0]["resources"]:
-        if str(res.get("_id")) == resource_id:
-            resource = res
-            break
-
-    if resource is None:
-        raise HTTPException(status_code=404, detail=f"Resource {resource_id} not found")
+    resource = await shared_resource(institution_id, class_id, resource_id)
 
     return ResourceModel(
         id=str(resource["_id"]),
@@ -165,28 +198,7 @@ async def get_files(institution_id: str, class_id: str, resource_id: str):
     """
     Obtener todos los archivos asociados a un recurso.
     """
-    institution = await educational_institutions_collection.find_one(
-        {
-            "_id": ObjectId(institution_id),
-            "classes._id": ObjectId(class_id),
-            "classes.resources._id": ObjectId(resource_id)
-        },
-        {
-            "classes.$": 1  # Solo devolver la clase que coincide
-        }
-    )
-
-    if not institution or "classes" not in institution:
-        raise HTTPException(status_code=404, detail=f"Resource {resource_id} not found")
-
-    resource = None
-    for res in institution["classes"][0]["resources"]:
-        if str(res.get("_id")) == resource_id:
-            resource = res
-            break
-
-    if resource is None:
-        raise HTTPException(status_code=404, detail=f"Resource {resource_id} not found")
+    resource = await shared_resource(institution_id, class_id, resource_id)
 
     file_ids = resource.get("file_ids", [])
     files_info = []
@@ -209,6 +221,7 @@ async def get_files(institution_id: str, class_id: str, resource_id: str):
     tags=["educationalInstitutions"],
 )
 async def download_resource_file(
+        request: Request,
         institution_id: str,
         class_id: str,
         resource_id: str,
@@ -224,57 +237,88 @@ async def download_resource_file(
         raise HTTPException(status_code=400, detail="Invalid file ID format")
 
     # Verify that the file belongs to the resource
-    institution = await educational_institutions_collection.find_one(
-        {
-            "_id": ObjectId(institution_id),
-            "classes._id": ObjectId(class_id),
-            "classes.resources._id": ObjectId(resource_id)
-        },
-        {
-            "classes.$": 1  # Only return the matching class
-        }
-    )
-
-    if not institution or "classes" not in institution:
-        raise HTTPException(status_code=404, detail=f"Resource {resource_id} not found")
-
-    resource = None
-    for res in institution["classes"][0]["resources"]:
-        if str(res.get("_id")) == resource_id:
-            resource = res
-            break
-
-    if resource is None:
-        raise HTTPException(status_code=404, detail=f"Resource {resource_id} not found")
+    resource = await shared_resource(institution_id, class_id, resource_id)
 
     # Ensure 'file_id' is associated with the resource
     resource_file_ids = [ObjectId(f_id) for f_id in resource.get("file_ids", []) if ObjectId.is_valid(f_id)]
     if file_id_obj not in resource_file_ids:
         raise HTTPException(status_code=404, detail="File not found for this resource")
 
-    # Find the file using the cursor
-    grid_out_cursor = grid_fs_bucket.find({"_id": file_id_obj})
-    try:
-        grid_out = await grid_out_cursor.next()
-    except StopAsyncIteration:
-        raise HTTPException(status_code=404, detail="File not found in GridFS")
+    # Set 'Content-Disposition' to 'inline' to display in the browser
+    return await Storage.open_file_response(
+        file_id_obj,
+        request.headers.get("accept-encoding"),
+        disposition="inline",
+        range_header=request.headers.get("range"),
+        if_range=request.headers.get("if-range"),
+    )
 
-    # Read the content
-    content = grid_out.read()
-    content_type = grid_out.metadata.get("contentType", 'application/octet-stream') if grid_out.metadata else 'application/octet-stream'
-    filename = grid_out.filename
 
-    # Close the grid_out if it is not None
-    if grid_out:
+@resourcesRoutes.get(
+    "/educationalInstitutions/{institution_id}/classes/{class_id}/resources/{resource_id}/files/{file_id}/thumbnail",
+    response_description="Get the thumbnail of an image or the preview of a PDF file",
+    tags=["educationalInstitutions"],
+)
+async def get_file_thumbnail(
+        request: Request,
+        institution_id: str,
+        class_id: str,
+        resource_id: str,
+        file_id: str
+):
+    """
+    Obtener la miniatura JPEG de una imagen o la vista previa de la primera página de un PDF.
+
+    Si la miniatura todavía no existe se genera en el momento. Responde 404 para archivos sin vista previa.
+    """
+    file_id_obj = to_object_id(file_id)
+    if file_id_obj is None:
+        raise HTTPException(status_code=400, detail="Invalid file ID format")
+
+    resource = await shared_resource(institution_id, class_id, resource_id)
+    if file_id_obj not in [to_object_id(f_id) for f_id in resource.get("file_ids", [])]:
+        raise HTTPException(status_code=404, detail="File not found for this resource")
+    # Lo mismo que la descarga: nada de archivos borrados o bloqueados por el antivirus
+    await Storage.find_servable(file_id_obj)
+
+    thumbnail = await Thumbnails.find_thumbnail(file_id_obj) or await Thumbnails.generate(file_id_obj)
+    if thumbnail is None:
+        raise HTTPException(status_code=404, detail="No preview available for this file")
+
+    # El archivo original no cambia, así que su miniatura tampoco: el navegador puede guardarla
+    headers = {
+        "ETag": f'"{thumbnail["_id"]}"',
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    grid_out = await grid_fs_bucket.open_download_stream(thumbnail["_id"])
+    try:
+        content = await grid_out.read()
+    finally:
         await grid_out.close()
+    return Response(content, media_type=Thumbnails.THUMBNAIL_CONTENT_TYPE, headers=headers)
 
-    # Set 'Content-Disposition' to 'inline' to display in the browser
-    return Response(
-        content,
-        media_type=content_type,
-        headers={"Content-Disposition": f'inline; filename="{filename}"'}
-    )
 
+async def read_comments(institution_id: str, class_id: str, resource_id: str, limit: Optional[int], before: Optional[str]):
+    """
+    Comentarios de un recurso, de los buckets y (mientras dura la migración) del propio recurso.
+    """
+    embedded = []
+    if Comments.embedded_comments_migrated():
+        resource_object_id = await existing_resource_id(institution_id, class_id, resource_id)
+    else:
+        # Mientras dura la migración, algunos comentarios siguen dentro del recurso
+        resource = await find_resource(institution_id, class_id, resource_id)
+        resource_object_id = resource["_id"]
+        before_id = to_object_id(before)
+        embedded = [c for c in resource.get("comments", []) if before_id is None or c["_id"] < before_id]
+
+    comments = embedded + await Comments.list_comments(resource_object_id, limit, before)
+    if limit is not None:
+        comments = comments[-limit:]
+    return comments
 
 
 @resourcesRoutes.get(
@@ -284,31 +328,34 @@ async def download_resource_file(
     response_model_by_alias=False,
     tags=["educationalInstitutions"],
 )
-async def get_comments(institution_id: str, class_id: str, resource_id: str):
+async def get_comments(
+        institution_id: str,
+        class_id: str,
+        resource_id: str,
+        limit: Optional[int] = Query(None, ge=1, le=500),
+        before: Optional[str] = None,
+):
     """
-    Obtener todos los comentarios de un recurso específico en una clase.
+    Obtener los comentarios de un recurso específico en una clase, en orden cronológico.
+
+    Sin parámetros se devuelven todos. Con `limit` se devuelven solo los `limit` más recientes
+    (anteriores al comentario `before`, si se indica), lo que normalmente lee un único bucket.
     """
-    institution = await educational_institutions_collection.find_one({"_id": ObjectId(institution_id)})
-
-    if not institution:
-        raise HTTPException(status_code=404, detail=f"Institution {institution_id} not found")
-
-    for cls in institution.get("classes", []):
-        if str(cls.get("_id")) == class_id:
-            for res in cls.get("resources", []):
-                if str(res.get("_id")) == resource_id:
-                    comments = res.get("comments", [])
-                    # Convertir los comentarios a modelos
-                    return [
-                        CommentModel(
-                            id=str(comment.get("_id")),
-                            user_id=str(comment["user_id"]),
-                            content=comment["content"],
-                            created_at=comment.get("created_at")
-                        ) for comment in comments
-                    ]
-            raise HTTPException(status_code=404, detail=f"Resource {resource_id} not found")
-    raise HTTPException(status_code=404, detail=f"Class {class_id} not found")
+    # Los estudiantes que abren el mismo recurso a la vez comparten una sola lectura
+    comments = await SingleFlight.coalesce(
+        SingleFlight.query_key("comments", institution_id, class_id, resource_id, limit, before),
+        lambda: read_comments(institution_id, class_id, resource_id, limit, before)
+    )
+
+    # Convertir los comentarios a modelos
+    return [
+        CommentModel(
+            id=str(comment.get("_id")),
+            user_id=str(comment["user_id"]),
+            content=comment["content"],
+            created_at=comment.get("created_at")
+        ) for comment in comments
+    ]
 
 
 @resourcesRoutes.post(
@@ -336,25 +383,21 @@ async def create_comment(
     # Convertir 'id' y 'user_id' a ObjectId para almacenamiento
     comment_dict["_id"] = comment_id
     comment_dict["user_id"] = ObjectId(comment_dict["user_id"])
+    comment_dict["created_at"] = comment_data.created_at
+    Changes.stamp(comment_dict)
 
-    # Agregar el nuevo comentario al arreglo 'comments' del recurso
-    result = await educational_institutions_collection.update_one(
-        {
-            "_id": ObjectId(institution_id),
-            "classes._id": ObjectId(class_id),
-            "classes.resources._id": ObjectId(resource_id)
-        },
-        {
-            "$push": {"classes.$[class].resources.$[res].comments": comment_dict}
-        },
-        array_filters=[
-            {"class._id": ObjectId(class_id)},
-            {"res._id": ObjectId(resource_id)}
-        ]
-    )
+    resource_object_id = await existing_resource_id(institution_id, class_id, resource_id)
+    class_object_id = await canonical_class_id(institution_id, class_id)
 
-    if result.modified_count == 0:
-        raise HTTPException(status_code=404, detail=f"Resource {resource_id} not found")
+    # Agregar el comentario al bucket abierto del recurso, sin tocar el documento de la institución
+    await Comments.append_comment(institution_id, class_object_id, resource_object_id, comment_dict)
+    await Stats.add_comment(institution_id, class_object_id)
+
+    await Search.index_comment(institution_id, class_object_id, resource_object_id, comment_dict)
+    await Events.emit(
+        "comment.created", institution_id, class_object_id, resource_object_id,
+        data=comment_dict, actor_id=comment_dict["user_id"]
+    )
 
     return comment_data
 
@@ -0,0 +1,37 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+
+from Api.Model.Search import SearchResultModel, SearchResultsModel
+from Api.Services import Search, Reads
+
+searchRoutes = APIRouter()
+
+@searchRoutes.get(
+    "/educationalInstitutions/{institution_id}/search",
+    response_description="Search resources and comments of an educational institution",
+    response_model=SearchResultsModel,
+    response_model_by_alias=False,
+    dependencies=[Depends(Reads.reporting)],
+    tags=["search"],
+)
+async def search(
+        institution_id: str,
+        q: str = Query(..., min_length=1, max_length=200),
+        class_id: Optional[str] = None,
+        type: Optional[str] = Query(None, enum=["resource", "comment"]),
+        page: int = Query(1, ge=1),
+        page_size: int = Query(20, ge=1, le=100),
+):
+    """
+    Full-text search over resource titles, descriptions and comment contents.
+
+    Results are ranked by relevance and can be restricted to a single class or to one kind of item.
+    """
+    entries, has_more = await Search.search(institution_id, q, class_id, type, page, page_size)
+    return SearchResultsModel(
+        results=[SearchResultModel(**entry) for entry in entries],
+        page=page,
+        page_size=page_size,
+        has_more=has_more,
+    )
@@ -0,0 +1,44 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, status
+
+from Api.Model.Change import ChangeModel, ChangesPageModel
+from Api.Services import Changes
+
+syncRoutes = APIRouter()
+
+
+@syncRoutes.get(
+    "/educationalInstitutions/{institution_id}/changes",
+    response_description="Records created, updated or deleted after a watermark",
+    response_model=ChangesPageModel,
+    tags=["sync"],
+)
+async def get_changes(
+        institution_id: str,
+        since: Optional[str] = Query(None, description="`next` of the previous page or sync"),
+        limit: int = Query(100, ge=1, le=1000),
+):
+    """
+    Institution, classes, resources and comments changed since the watermark `since`,
+    oldest change first, each record once with its current state, `version` and `updated_at`.
+    Deleted records come as tombstones (`deleted: true`).
+
+    Without `since` every record of the institution is returned. Keep requesting with
+    `since=next` while `has_more` is true; store the last `next` for the next sync.
+    A watermark older than the tombstone retention is answered with 410: download the
+    institution again and start over without `since`.
+    """
+    try:
+        watermark = Changes.parse_watermark(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid watermark")
+    if watermark is not None and Changes.expired(watermark):
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Watermark expired, a full sync is needed")
+
+    changes, next_watermark, has_more = await Changes.changes_since(institution_id, watermark, limit)
+    return ChangesPageModel(
+        changes=[ChangeModel(**change) for change in changes],
+        next=str(next_watermark),
+        has_more=has_more,
+    )
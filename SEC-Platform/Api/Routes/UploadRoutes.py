@@ -0,0 +1,129 @@
+from fastapi import APIRouter, Body, Header, HTTPException, Request, status
+from fastapi.responses import Response
+
+from Api.Model.Upload import CreateUploadSessionModel, UploadSessionModel
+from Api.Routes.EducationalInstitutionRoutes import canonical_class_id
+from Api.Routes.ResourceRoutes import find_resource
+from Api.Services import Events, PostUpload, Uploads
+
+uploadRoutes = APIRouter()
+
+
+@uploadRoutes.post(
+    "/educationalInstitutions/{institution_id}/classes/{class_id}/resources/{resource_id}/uploads",
+    response_description="Start a resumable upload to a resource",
+    response_model=UploadSessionModel,
+    status_code=status.HTTP_201_CREATED,
+    response_model_by_alias=False,
+    tags=["uploads"],
+)
+async def create_upload(
+        response: Response,
+        institution_id: str,
+        class_id: str,
+        resource_id: str,
+        upload: CreateUploadSessionModel = Body(...)
+):
+    """
+    Crear una sesión de subida reanudable para un archivo grande.
+
+    El archivo se envía después con `PUT /uploads/{id}` en una o varias partes, y se adjunta al
+    recurso con `POST /uploads/{id}/finalize`. Todas las partes menos la última deben medir un
+    múltiplo de `chunk_size`.
+    """
+    resource = await find_resource(institution_id, class_id, resource_id)
+    class_object_id = await canonical_class_id(institution_id, class_id)
+    session = await Uploads.create_session(
+        institution_id, class_object_id, resource["_id"], upload.filename, upload.content_type, upload.length
+    )
+    response.headers["Location"] = f"/api/v1/uploads/{session['_id']}"
+    return UploadSessionModel(**session)
+
+
+@uploadRoutes.head(
+    "/uploads/{session_id}",
+    response_description="Offset from which to resume the upload",
+    tags=["uploads"],
+)
+async def upload_offset(session_id: str):
+    """
+    Consultar cuántos bytes de la subida ya están guardados (`Upload-Offset`).
+    """
+    session = await Uploads.get_session(session_id)
+    return Response(headers={
+        "Upload-Offset": str(session["received"]),
+        "Upload-Length": str(session["length"]),
+        "Cache-Control": "no-store",
+    })
+
+
+@uploadRoutes.get(
+    "/uploads/{session_id}",
+    response_description="Get a resumable upload session",
+    response_model=UploadSessionModel,
+    response_model_by_alias=False,
+    tags=["uploads"],
+)
+async def get_upload(session_id: str):
+    """
+    Obtener el estado de una sesión de subida.
+    """
+    return UploadSessionModel(**await Uploads.get_session(session_id))
+
+
+@uploadRoutes.put(
+    "/uploads/{session_id}",
+    response_description="Upload a part of the file",
+    status_code=status.HTTP_204_NO_CONTENT,
+    tags=["uploads"],
+)
+async def upload_part(request: Request, session_id: str, upload_offset: int = Header(..., ge=0)):
+    """
+    Enviar una parte del archivo a partir del byte `Upload-Offset`.
+
+    El cuerpo de la petición son los bytes de la parte. Si el offset no coincide con lo ya
+    recibido se responde 409 con el offset correcto en `Upload-Offset`.
+    """
+    received = await Uploads.write_chunks(session_id, upload_offset, request.stream())
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers={"Upload-Offset": str(received)})
+
+
+@uploadRoutes.post(
+    "/uploads/{session_id}/finalize",
+    response_description="Attach the uploaded file to its resource",
+    status_code=status.HTTP_201_CREATED,
+    tags=["uploads"],
+)
+async def finalize_upload(session_id: str):
+    """
+    Terminar la subida: el archivo se crea en GridFS y se adjunta al recurso en una sola escritura.
+    """
+    session = await Uploads.get_session(session_id)
+    if session["status"] == "done":
+        # A retry: the file was already attached, counted and queued for processing
+        return {"file_id": str(session["_id"])}
+    file_id, finished = await Uploads.finalize(session_id)
+    if finished:
+        await PostUpload.enqueue([(file_id, session["content_type"])])
+        await Events.emit(
+            "file.uploaded", session["institution_id"], session["class_id"], session["resource_id"],
+            data={"file_ids": [file_id], "count": 1, "bytes": session["length"]}
+        )
+    return {"file_id": str(file_id)}
+
+
+@uploadRoutes.delete(
+    "/uploads/{session_id}",
+    response_description="Cancel a resumable upload",
+    status_code=status.HTTP_204_NO_CONTENT,
+    tags=["uploads"],
+)
+async def cancel_upload(session_id: str):
+    """
+    Cancelar una subida sin terminar y borrar las partes ya recibidas.
+    """
+    session = await Uploads.get_session(session_id)
+    if session["status"] != "open":
+        raise HTTPException(status_code=409, detail="Upload session is already finalized")
+    await Uploads.abort(session)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
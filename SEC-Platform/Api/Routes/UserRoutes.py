@@ -1,12 +1,13 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import FastAPI, Body, HTTPException, status, APIRouter
+from fastapi import FastAPI, Body, Depends, HTTPException, status, APIRouter, Header, Query
 from fastapi.responses import Response
 from bson import ObjectId
 from pymongo import ReturnDocument
 
 from Api.Config.db import users_collection
-from Api.Model.User import UserModel, UserCollectionModel, UpdateUserModel
+from Api.Model.User import UserModel, UserCollectionModel, UpdateUserModel, UserClassModel
+from Api.Services import Audit, Reads, Preconditions, Memberships
 
 userRoutes = APIRouter()
 
@@ -32,12 +33,14 @@ async def create_user(user: UserModel = Body(...)):
     # Hashear la contraseña antes de guardar
     user.password = hash_password(user.password)
 
-    new_user = await users_collection.insert_one(
-        user.model_dump(by_alias=True, exclude=["id"])
-    )
-    created_user = await users_collection.find_one(
-        {"_id": new_user.inserted_id}
-    )
+    async with Reads.causal_session() as session:
+        new_user = await users_collection.insert_one(
+            {**user.model_dump(by_alias=True, exclude=["id"]), "version": 1}, session=session
+        )
+        created_user = await Reads.primary(users_collection).find_one(
+            {"_id": new_user.inserted_id}, session=session
+        )
+    Audit.annotate(entity="user", entity_id=str(new_user.inserted_id))
     return created_user
 
 # Obtener todos los usuarios
@@ -46,6 +49,7 @@ async def create_user(user: UserModel = Body(...)):
     response_description="List all users",
     response_model=List[UserModel],
     response_model_by_alias=False,
+    dependencies=[Depends(Reads.reporting)],
     tags=["users"],
 )
 async def list_users():
@@ -53,7 +57,7 @@ async def list_users():
     Listar todos los datos de usuarios sin su contrasena
     """
     users = []
-    async for user in users_collection.find():
+    async for user in Reads.reader(users_collection).find():
         users.append(user)
     return users
 
@@ -65,15 +69,45 @@ async def list_users():
     response_model_by_alias=False,
     tags=["users"],
 )
-async def show_user(id: str):
+async def show_user(id: str, response: Response):
     """
     Obtener el registro de un usuario específico, buscado por `id`.
+
+    El `ETag` es la versión del usuario; se envía de vuelta en `If-Match` al actualizarlo.
     """
     if (user := await users_collection.find_one({"_id": ObjectId(id)})) is not None:
+        response.headers["ETag"] = Preconditions.etag(user)
         return user
 
     raise HTTPException(status_code=404, detail=f"User {id} not found")
 
+# Clases de un usuario, en todas las instituciones
+@userRoutes.get(
+    "/users/{id}/classes",
+    response_description="List the classes a user teaches or attends",
+    response_model=List[UserClassModel],
+    response_model_by_alias=False,
+    tags=["users"],
+)
+async def list_user_classes(
+        id: str,
+        role: Optional[str] = Query(None, enum=["teacher", "student"]),
+        page: int = Query(1, ge=1),
+        page_size: int = Query(20, ge=1, le=100),
+):
+    """
+    Listar las clases en las que el usuario es profesor o estudiante (solo `role`, si se indica),
+    en todas las instituciones, con el nombre de cada institución.
+
+    Ordenadas por institución y por nombre de clase. Las consultas usan los índices de
+    `classes.teacher_id` y `classes.student_ids`: no se recorren las clases de cada institución.
+    """
+    if await users_collection.find_one({"_id": ObjectId(id)}, {"_id": 1}) is None:
+        raise HTTPException(status_code=404, detail=f"User {id} not found")
+
+    classes = await Memberships.user_classes(id, role, skip=(page - 1) * page_size, limit=page_size)
+    return [UserClassModel(**cls) for cls in classes]
+
 # Actualizar un usuario
 @userRoutes.put(
     "/users/{id}",
@@ -82,34 +116,47 @@ async def show_user(id: str):
     response_model_by_alias=False,
     tags=["users"],
 )
-async def update_user(id: str, user: UpdateUserModel = Body(...)):
+async def update_user(
+        id: str,
+        response: Response,
+        user: UpdateUserModel = Body(...),
+        if_match: Optional[str] = Header(None),
+):
     """
     Actualizar campos individuales de un registro de usuario existente.
 
     Solo se actualizarán los campos proporcionados.
     Cualquier campo faltante o `null` será ignorado.
+
+    Con `If-Match` solo se actualiza si el usuario sigue en esa versión (su `ETag`); si no,
+    no se escribe nada y se responde 412 con el `ETag` actual.
     """
     update_data = {k: v for k, v in user.dict(exclude_unset=True).items() if v is not None}
 
     if "password" in update_data:
         update_data["password"] = hash_password(update_data["password"])
 
+    # La versión esperada va en el filtro: comprobar y escribir es una sola operación atómica
+    condition = {"_id": ObjectId(id), **Preconditions.version_condition(Preconditions.expected_versions(if_match))}
+
     if len(update_data) >= 1:
         updated_user = await users_collection.find_one_and_update(
-            {"_id": ObjectId(id)},
-            {"$set": update_data},
+            condition,
+            {"$set": update_data, "$inc": {"version": 1}},
             return_document=ReturnDocument.AFTER,
         )
-        if updated_user is not None:
-            return updated_user
-        else:
-            raise HTTPException(status_code=404, detail=f"User {id} not found")
+    else:
+        # La actualización está vacía, pero aún debemos devolver el documento coincidente
+        updated_user = await users_collection.find_one(condition)
 
-    # La actualización está vacía, pero aún debemos devolver el documento coincidente
-    if (existing_user := await users_collection.find_one({"_id": ObjectId(id)})) is not None:
-        return existing_user
+    if updated_user is None:
+        current = await users_collection.find_one({"_id": ObjectId(id)}, {"version": 1})
+        if current is None:
+            raise HTTPException(status_code=404, detail=f"User {id} not found")
+        raise Preconditions.precondition_failed(current)
 
-    raise HTTPException(status_code=404, detail=f"User {id} not found")
+    response.headers["ETag"] = Preconditions.etag(updated_user)
+    return updated_user
 
 # Eliminar un usuario
 @userRoutes.delete(
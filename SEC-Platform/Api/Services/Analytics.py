@@ -0,0 +1,134 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from pymongo import InsertOne
+
+from Api.Config import settings
+from Api.Config.db import activity_events_collection, activity_hourly_collection, activity_daily_collection
+from Api.Model.Event import EventModel
+from Api.Services import BatchWriter, Events, Reads
+from Api.Services.Ids import to_object_id
+
+logger = logging.getLogger(__name__)
+
+# Activity analytics without scanning `educational_institutions`:
+#
+#   activity_events: {ts, institution_id, class_id, counter, n, actor_id}   raw, expire after a few days
+#   activity_hourly: {_id: {institution_id, class_id, hour}, institution_id, class_id, hour,
+#                     uploads, comments, resources, active_users, actors}
+#   activity_daily:  same, per `day` (ANALYTICS_TIMEZONE)
+#
+# A listener turns write events into raw activity events. The rollup then recomputes the
+# hourly buckets from the last bucket written onwards and the days those hours belong to,
+# and writes them with `$merge` (`whenMatched: replace`). Recomputing whole buckets instead
+# of adding deltas makes a rollup that is interrupted or runs twice harmless.
+
+COUNTERS = {"resource.created": "resources", "comment.created": "comments", "file.uploaded": "uploads"}
+ACTIVITY_FIELDS = ("uploads", "comments", "resources")
+
+
+@Events.add_listener
+async def record_activity(event: EventModel):
+    counter = COUNTERS.get(event.type)
+    if counter is None or event.class_id is None or not settings.ACTIVITY_ENABLED:
+        return
+    activity = {
+        "ts": event.created_at,
+        "institution_id": to_object_id(event.institution_id),
+        "class_id": to_object_id(event.class_id),
+        "counter": counter,
+        "n": event.data.get("count", 1),
+    }
+    if event.actor_id is not None:
+        activity["actor_id"] = to_object_id(event.actor_id) or event.actor_id
+    await BatchWriter.submit(activity_events_collection, InsertOne(activity))
+
+
+def _bucket_fields(period: str) -> dict:
+    return {
+        "institution_id": "$_id.institution_id",
+        "class_id": "$_id.class_id",
+        period: f"$_id.{period}",
+        **{field: 1 for field in ACTIVITY_FIELDS},
+        "actors": 1,
+        "active_users": {"$size": "$actors"},
+    }
+
+
+async def _rollup_start() -> Optional[datetime]:
+    latest = await activity_hourly_collection.find_one({}, {"hour": 1}, sort=[("hour", -1)])
+    if latest is not None:
+        return latest["hour"]
+    first = await activity_events_collection.find_one({}, {"ts": 1}, sort=[("ts", 1)])
+    if first is None:
+        return None
+    return first["ts"].replace(minute=0, second=0, microsecond=0)
+
+
+async def rollup():
+    since = await _rollup_start()
+    if since is None:
+        return
+    # Events still sitting in a write batch are not lost: their hour is recomputed next time
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.ACTIVITY_ROLLUP_LAG_SECONDS)
+
+    await activity_events_collection.aggregate([
+        {"$match": {"ts": {"$gte": since, "$lt": cutoff}}},
+        {"$group": {
+            "_id": {
+                "institution_id": "$institution_id",
+                "class_id": "$class_id",
+                "hour": {"$dateTrunc": {"date": "$ts", "unit": "hour"}},
+            },
+            **{field: {"$sum": {"$cond": [{"$eq": ["$counter", field]}, "$n", 0]}} for field in ACTIVITY_FIELDS},
+            "actors": {"$addToSet": "$actor_id"},
+        }},
+        {"$set": {"actors": {"$setDifference": ["$actors", [None]]}}},
+        {"$project": _bucket_fields("hour")},
+        {"$merge": {"into": activity_hourly_collection.name, "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]).to_list(None)
+
+    # A day starts less than 24 hours before `since`; days that start earlier are only
+    # partly covered by the hours read here and are left as they are
+    first_day = since - timedelta(days=1)
+    await activity_hourly_collection.aggregate([
+        {"$match": {"hour": {"$gte": first_day}}},
+        {"$group": {
+            "_id": {
+                "institution_id": "$institution_id",
+                "class_id": "$class_id",
+                "day": {"$dateTrunc": {"date": "$hour", "unit": "day", "timezone": settings.ANALYTICS_TIMEZONE}},
+            },
+            **{field: {"$sum": f"${field}"} for field in ACTIVITY_FIELDS},
+            "actors": {"$push": "$actors"},
+        }},
+        {"$match": {"_id.day": {"$gte": first_day}}},
+        {"$set": {"actors": {"$reduce": {"input": "$actors", "initialValue": [], "in": {"$setUnion": ["$$value", "$$this"]}}}}},
+        {"$project": _bucket_fields("day")},
+        {"$merge": {"into": activity_daily_collection.name, "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]).to_list(None)
+
+
+async def run_periodic_rollup():
+    if not settings.ACTIVITY_ENABLED or settings.ACTIVITY_ROLLUP_INTERVAL_SECONDS <= 0:
+        return
+    while True:
+        try:
+            await rollup()
+        except Exception:
+            logger.exception("Activity rollup failed")
+        await asyncio.sleep(settings.ACTIVITY_ROLLUP_INTERVAL_SECONDS)
+
+
+async def activity(institution_id, period: str, start: datetime, end: datetime, class_id=None) -> List[dict]:
+    """
+    Activity buckets of an institution (or one class) for `period` "hour" or "day", oldest first.
+    """
+    buckets = activity_hourly_collection if period == "hour" else activity_daily_collection
+    query = {"institution_id": to_object_id(institution_id), period: {"$gte": start, "$lt": end}}
+    if class_id is not None:
+        query["class_id"] = to_object_id(class_id)
+    cursor = Reads.reader(buckets).find(query, {"actors": 0}).sort([(period, 1), ("class_id", 1)])
+    return [{**bucket, "period": bucket[period]} async for bucket in cursor]
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Deque, Optional
+
+from Api.Config import settings
+from Api.Config.db import audit_log_collection
+from Api.Model.Event import EventModel
+from Api.Services import Events
+
+logger = logging.getLogger(__name__)
+
+# Audit trail of who created, updated or deleted what, kept in the capped `audit_log`
+# collection (oldest entries are overwritten once AUDIT_CAPPED_BYTES are used):
+#
+#   {ts, method, path, status, duration_ms, client, user_agent,
+#    event, actor_id, institution_id, class_id, resource_id, entity, entity_id}
+#
+# AuditMiddleware builds one entry per write request; routes and the event listener below
+# add what only they know (the id of a created document, the actor) with `annotate`.
+# The request path only appends to an in-memory ring buffer; a background task writes
+# the buffer with `insert_many` every AUDIT_FLUSH_INTERVAL_SECONDS or as soon as
+# AUDIT_FLUSH_BATCH_SIZE entries are waiting. When the database cannot keep up, the
+# buffer keeps the newest AUDIT_BUFFER_SIZE entries and counts the ones it drops.
+
+_current: ContextVar[Optional[dict]] = ContextVar("audit_entry", default=None)
+
+
+class AuditBuffer:
+    def __init__(self, size: int, batch_size: int):
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._entries: Deque[dict] = deque(maxlen=size)
+        self._ready = asyncio.Event()
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def append(self, entry: dict):
+        if len(self._entries) == self._entries.maxlen:
+            self.dropped += 1  # The oldest entry is overwritten
+        self._entries.append(entry)
+        if len(self._entries) >= self.batch_size:
+            self._ready.set()
+
+    async def wait(self, timeout: float):
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._ready.clear()
+
+    async def flush(self):
+        async with self._lock:
+            while self._entries:
+                batch = [self._entries.popleft() for _ in range(min(self.batch_size, len(self._entries)))]
+                try:
+                    await audit_log_collection.insert_many(batch, ordered=False)
+                except Exception:
+                    # Back to the front, as far as there is room; what does not fit is dropped
+                    room = self._entries.maxlen - len(self._entries)
+                    self.dropped += max(0, len(batch) - room)
+                    self._entries.extendleft(reversed(batch[-room:] if room else []))
+                    raise
+
+
+buffer = AuditBuffer(settings.AUDIT_BUFFER_SIZE, settings.AUDIT_FLUSH_BATCH_SIZE)
+
+
+def begin(entry: dict):
+    """
+    Make `entry` the audit entry of the current request, so `annotate` can complete it.
+    """
+    _current.set(entry)
+
+
+def annotate(**fields):
+    """
+    Add fields to the audit entry of the current request (no-op outside an audited request).
+    """
+    entry = _current.get()
+    if entry is not None:
+        entry.update({name: value for name, value in fields.items() if value is not None})
+
+
+def record(entry: dict):
+    entry.setdefault("ts", datetime.now(timezone.utc))
+    buffer.append(entry)
+
+
+@Events.add_listener
+async def annotate_with_event(event: EventModel):
+    annotate(
+        event=event.type,
+        actor_id=event.actor_id,
+        institution_id=event.institution_id,
+        class_id=event.class_id,
+        resource_id=event.resource_id,
+    )
+
+
+async def flush():
+    dropped = buffer.dropped
+    try:
+        await buffer.flush()
+    except Exception:
+        logger.exception("Could not write the audit log (%s entries waiting)", len(buffer))
+    if buffer.dropped > dropped:
+        logger.warning("Audit buffer full: %s entries dropped (%s in total)", buffer.dropped - dropped, buffer.dropped)
+
+
+async def run_periodic_flush():
+    if not settings.AUDIT_ENABLED:
+        return
+    while True:
+        await buffer.wait(settings.AUDIT_FLUSH_INTERVAL_SECONDS)
+        await flush()
@@ -0,0 +1,151 @@
+import asyncio
+import contextvars
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+
+from Api.Config import settings
+
+logger = logging.getLogger(__name__)
+
+# Micro-batching of small, hot writes (comment appends, counters, search entries, feed
+# events). Instead of one round trip per write, writes to the same collection that arrive
+# within BATCH_WRITE_DELAY_SECONDS of each other are sent as one ordered `bulk_write`.
+# While a batch is on the wire, new writes queue up behind it and form the next batch, so
+# under load batches grow on their own and the delay only matters when traffic is light.
+#
+# Acknowledgement: `submit` returns only once the bulk write containing the operation was
+# acknowledged by the server with the collection's write concern, so a write reported as
+# done to the client is exactly as durable as an unbatched one. What batching adds is up
+# to BATCH_WRITE_DELAY_SECONDS of latency per write. A caller that is cancelled while
+# waiting does not withdraw its operation: it may still be written.
+#
+# Batches are ordered, so writes to the same collection are applied in submission order.
+# When one operation fails, only its caller gets the error; the operations after it,
+# which an ordered bulk write skips, go into the next batch.
+
+
+class BatchWriter:
+    def __init__(self, collection, max_delay: float, max_batch: int):
+        self.collection = collection
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes = set()
+
+    async def submit(self, operation) -> Any:
+        """
+        Queue a pymongo write operation (`InsertOne`, `UpdateOne`, `ReplaceOne`...) and wait
+        until it is written. Returns the inserted or upserted `_id`, if any.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((operation, future))
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._start_flush)
+        return await future
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # A batch holds the writes of many requests: run it outside the context (and the
+        # MongoDB deadline) of the request that happened to fill it
+        task = asyncio.create_task(self.flush(), context=contextvars.Context())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def flush(self):
+        # One batch on the wire at a time per collection; this keeps the submission order
+        async with self._lock:
+            while self._pending:
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                retry = await self._write(batch)
+                self._pending[:0] = retry
+
+    async def _write(self, batch: List[Tuple[Any, asyncio.Future]]) -> List[Tuple[Any, asyncio.Future]]:
+        operations = [operation for operation, _ in batch]
+        try:
+            result = await self.collection.bulk_write(operations, ordered=True)
+        except BulkWriteError as error:
+            failed = error.details["writeErrors"][0]
+            index = failed["index"]
+            upserted = {item["index"]: item["_id"] for item in error.details.get("upserted", [])}
+            for position, (operation, future) in enumerate(batch[:index]):
+                _resolve(future, _written_id(operation, upserted.get(position)))
+            _reject(batch[index][1], error)
+            return batch[index + 1:]
+        except Exception as error:
+            for _, future in batch:
+                _reject(future, error)
+            return []
+
+        upserted = result.upserted_ids or {}
+        for position, (operation, future) in enumerate(batch):
+            _resolve(future, _written_id(operation, upserted.get(position)))
+        return []
+
+
+def _written_id(operation, upserted_id):
+    if isinstance(operation, InsertOne):
+        return operation._doc.get("_id")
+    return upserted_id
+
+
+def _resolve(future: asyncio.Future, value):
+    if not future.done():
+        future.set_result(value)
+
+
+def _reject(future: asyncio.Future, error: Exception):
+    if not future.done():
+        future.set_exception(error)
+
+
+_writers: Dict[str, BatchWriter] = {}
+
+
+def writer_for(collection) -> BatchWriter:
+    writer = _writers.get(collection.full_name)
+    if writer is None:
+        writer = _writers[collection.full_name] = BatchWriter(
+            collection, settings.BATCH_WRITE_DELAY_SECONDS, settings.BATCH_WRITE_MAX_OPERATIONS
+        )
+    return writer
+
+
+async def submit(collection, operation) -> Any:
+    """
+    Write `operation` to `collection`, batched with concurrent writes when BATCH_WRITES_ENABLED.
+    """
+    if not settings.BATCH_WRITES_ENABLED:
+        result = await collection.bulk_write([operation])
+        return _written_id(operation, (result.upserted_ids or {}).get(0))
+    return await writer_for(collection).submit(operation)
+
+
+async def flush(*collections):
+    """
+    Write what is still queued for `collections`, waiting for a batch already on the wire.
+    """
+    for collection in collections:
+        writer = _writers.get(collection.full_name)
+        if writer is not None:
+            await writer.flush()
+
+
+async def flush_all():
+    """
+    Write everything still queued; called on shutdown.
+    """
+    for writer in list(_writers.values()):
+        try:
+            await writer.flush()
+        except Exception:
+            logger.exception("Could not flush batched writes to %s", writer.collection.full_name)
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Set
+
+from pymongo import InsertOne
+from pymongo.errors import OperationFailure, PyMongoError
+
+from Api.Config import settings
+from Api.Config.db import feed_events_collection
+from Api.Model.Event import EventModel
+from Api.Services import BatchWriter, Events
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    A subscriber's bounded queue of already serialized messages.
+
+    A slow subscriber loses its oldest messages instead of slowing down the publisher
+    or making the process buffer without limit.
+    """
+
+    def __init__(self, broker: "Broker", topics: Iterable[str], queue_size: int):
+        self.broker = broker
+        self.topics = set(topics)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def put(self, message: str):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Next message, or None if nothing arrived within `timeout` seconds.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Broker:
+    """
+    In-process pub/sub for the live feed.
+
+    Without a replica set, events are fanned out directly to the subscribers of this process.
+    When MongoDB change streams are available, events are inserted into `feed_events`
+    and every worker process fans out what its change stream delivers, so subscribers
+    connected to any worker receive events written by any other.
+    """
+
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._topics: Dict[str, Set[Subscription]] = {}
+        self._relay: Optional[asyncio.Task] = None
+        self.change_streams = False
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        subscription = Subscription(self, topics, self.queue_size)
+        for topic in subscription.topics:
+            self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        for topic in subscription.topics:
+            subscribers = self._topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._topics[topic]
+
+    def subscriber_count(self, topic: str) -> int:
+        return len(self._topics.get(topic, ()))
+
+    def fan_out(self, topics: Iterable[str], message: str):
+        # A subscriber to several of the topics gets the message once
+        delivered = set()
+        for topic in topics:
+            for subscription in self._topics.get(topic, ()):
+                if subscription not in delivered:
+                    delivered.add(subscription)
+                    subscription.put(message)
+
+    async def publish(self, topics: Iterable[str], message: str):
+        topics = list(topics)
+        if self.change_streams:
+            await BatchWriter.submit(feed_events_collection, InsertOne(
+                {"topics": topics, "message": message, "created_at": datetime.now(timezone.utc)}
+            ))
+        else:
+            self.fan_out(topics, message)
+
+    async def start(self):
+        if not settings.FEED_CHANGE_STREAMS:
+            return
+        stream = feed_events_collection.watch([{"$match": {"operationType": "insert"}}])
+        try:
+            # Opening the stream fails right away on a standalone server, which has no change streams
+            change = await stream.try_next()
+        except OperationFailure:
+            logger.info("Change streams not available, the live feed fans out in-process only")
+            return
+        except PyMongoError:
+            logger.exception("Could not open the feed change stream, the live feed fans out in-process only")
+            return
+
+        if change is not None:
+            self.fan_out(change["fullDocument"]["topics"], change["fullDocument"]["message"])
+        self.change_streams = True
+        self._relay = asyncio.create_task(self._run_relay(stream))
+
+    async def _run_relay(self, stream):
+        delay = 1
+        while True:
+            try:
+                async with stream:
+                    async for change in stream:
+                        document = change["fullDocument"]
+                        self.fan_out(document["topics"], document["message"])
+                        delay = 1
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError:
+                logger.exception("Feed change stream interrupted, reopening in %s s", delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+            # Resume after the last delivered event so nothing is lost while reconnecting
+            stream = feed_events_collection.watch(
+                [{"$match": {"operationType": "insert"}}],
+                resume_after=stream.resume_token,
+            )
+
+    async def stop(self):
+        if self._relay is not None:
+            self._relay.cancel()
+            self._relay = None
+        self.change_streams = False
+
+
+broker = Broker(queue_size=settings.FEED_QUEUE_SIZE)
+
+
+def class_topic(class_id) -> str:
+    return f"class:{class_id}"
+
+
+def resource_topic(resource_id) -> str:
+    return f"resource:{resource_id}"
+
+
+@Events.add_listener
+async def publish_to_feed(event: EventModel):
+    if event.class_id is None:
+        return
+    topics = [class_topic(event.class_id)]
+    if event.resource_id is not None:
+        topics.append(resource_topic(event.resource_id))
+    # Serialized once here, not once per subscriber
+    await broker.publish(topics, event.model_dump_json())
@@ -0,0 +1,75 @@
+import logging
+from typing import List, Optional
+
+from bson import ObjectId
+
+from Api.Config import settings
+from Api.Services import Comments, FileCollector, Jobs, Storage
+from Api.Services.Ids import to_object_id
+
+logger = logging.getLogger(__name__)
+
+# Cascading deletes. The route removes the institution or class document itself, which
+# is one write, and gets the ids of its files from the same call (the deleted document,
+# projected down to `classes.resources.file_ids`). Everything hanging off the document
+# (comment buckets, GridFS files and chunks, thumbnails) is then removed by a
+# `cascade.delete` job, so deleting a large school does not hold the request.
+#
+# When nothing hangs off the deleted document (no files, no comment buckets) no job is
+# queued and the route answers 204 as it always did.
+#
+# Files are deleted in batches of CASCADE_DELETE_BATCH_SIZE with `delete_many` + `$in`,
+# and the job reports its progress after each batch. A file that is still attached to
+# another resource is kept. Every step is idempotent, so a retried job simply resumes.
+
+
+def file_ids_of(document: Optional[dict]) -> List[ObjectId]:
+    """
+    Ids of the files of every resource in an institution document, or the `classes` subset of one.
+    """
+    file_ids = {}
+    for class_ in (document or {}).get("classes", []):
+        for resource in class_.get("resources", []):
+            for file_id in resource.get("file_ids") or []:
+                file_id = to_object_id(file_id)
+                if file_id is not None:
+                    file_ids[file_id] = None
+    return list(file_ids)
+
+
+async def needed(institution_id, class_id=None, file_ids: List[ObjectId] = ()) -> bool:
+    """
+    Whether anything is left for a `cascade.delete` job to remove.
+    """
+    return bool(file_ids) or await Comments.any_stored(institution_id, class_id)
+
+
+async def enqueue(institution_id, class_id=None, file_ids: List[ObjectId] = ()) -> ObjectId:
+    job_id = await Jobs.enqueue("cascade.delete", {
+        "institution_id": to_object_id(institution_id),
+        "class_id": to_object_id(class_id),
+        "file_ids": list(file_ids),
+    })
+    Jobs.wake_pool()
+    return job_id
+
+
+@Jobs.handler("cascade.delete")
+async def cascade_delete(job: dict) -> dict:
+    payload = job["payload"]
+    if payload.get("class_id") is not None:
+        await Comments.remove_class(payload["institution_id"], payload["class_id"])
+    else:
+        await Comments.remove_institution(payload["institution_id"])
+
+    file_ids = payload["file_ids"]
+    batch_size = settings.CASCADE_DELETE_BATCH_SIZE
+    deleted = kept = 0
+    for start in range(0, len(file_ids), batch_size):
+        batch = file_ids[start:start + batch_size]
+        referenced = await FileCollector.still_referenced(batch)
+        kept += len(referenced)
+        deleted += await Storage.delete_files([file_id for file_id in batch if file_id not in referenced])
+        await Jobs.report_progress(job, {"files": len(file_ids), "processed": start + len(batch)})
+
+    return {"files": len(file_ids), "deleted": deleted, "kept": kept}
@@ -0,0 +1,293 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from Api.Config import settings
+from Api.Config.db import changes_collection, educational_institutions_collection, comment_buckets_collection
+from Api.Model.Event import EventModel
+from Api.Services import Events
+from Api.Services.Ids import class_match, find_by_id, to_object_id, stringify_ids
+
+# Delta sync: `changes` keeps one entry per institution, class, resource and comment that
+# was created, updated or deleted, keyed by `<entity>:<id>`:
+#
+#   {_id, entity, record_id, institution_id, class_id, resource_id, seq, deleted, expires_at}
+#
+# Every write moves the entry's `seq` (a new ObjectId) forward, so a client that synced up to
+# watermark W asks for `seq > W` and gets each changed record once, however often it changed.
+# The records themselves carry `version` (incremented by every write) and `updated_at`.
+#
+# A deletion leaves a tombstone (`deleted: true`) that expires after CHANGES_TOMBSTONE_TTL_SECONDS;
+# a client whose watermark is older must download everything again. Deleting an institution
+# or a class drops the entries of everything inside it, its tombstone covers them.
+#
+# `seq` is generated by the application, so entries from two workers can land slightly out of
+# order. Entries younger than CHANGES_SETTLE_SECONDS are not served yet, which keeps a
+# watermark from jumping over a write that was still in flight.
+
+# Event type -> (entity, deleted)
+TRACKED = {
+    "institution.created": ("institution", False),
+    "institution.updated": ("institution", False),
+    "institution.deleted": ("institution", True),
+    "class.created": ("class", False),
+    "class.updated": ("class", False),
+    "class.deleted": ("class", True),
+    "resource.created": ("resource", False),
+    "file.uploaded": ("resource", False),
+    "comment.created": ("comment", False),
+}
+
+# Nested arrays of each record and the entity of their elements
+CHILDREN = {"classes": "class", "resources": "resource", "comments": "comment"}
+
+# Fields that are not part of a record as the client stores it
+HIDDEN_FIELDS = ("_id", "classes", "resources", "comments", "stats", "version", "updated_at")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def stamp(record: dict, now: Optional[datetime] = None) -> dict:
+    """
+    Give a new record, and the records nested in it, version 1 and `updated_at`, in place.
+
+    Nested elements without an ObjectId `_id` are left for the startup migrations.
+    """
+    now = now or _now()
+    record["version"] = 1
+    record["updated_at"] = now
+    for key in CHILDREN:
+        for child in record.get(key) or []:
+            if isinstance(child, dict) and isinstance(child.get("_id"), ObjectId):
+                stamp(child, now)
+    return record
+
+
+def stamped(update: dict, path: Optional[str] = None) -> dict:
+    """
+    Add to `update` the next `version` and a new `updated_at` of the record at `path`
+    (e.g. `classes.$[elem]`; the institution itself when None).
+    """
+    prefix = f"{path}." if path else ""
+    return {
+        **update,
+        "$set": {**update.get("$set", {}), f"{prefix}updated_at": _now()},
+        "$inc": {**update.get("$inc", {}), f"{prefix}version": 1},
+    }
+
+
+def entry(entity: str, record_id, institution_id, class_id=None, resource_id=None, deleted: bool = False) -> UpdateOne:
+    record_id = to_object_id(record_id)
+    fields = {
+        "entity": entity,
+        "record_id": record_id,
+        "institution_id": to_object_id(institution_id),
+        "class_id": to_object_id(class_id),
+        "resource_id": to_object_id(resource_id),
+        "seq": ObjectId(),
+        "deleted": deleted,
+    }
+    if deleted:
+        fields["expires_at"] = _now() + timedelta(seconds=settings.CHANGES_TOMBSTONE_TTL_SECONDS)
+    return UpdateOne({"_id": f"{entity}:{record_id}"}, {"$set": fields}, upsert=True)
+
+
+def tree_entries(entity: str, record: dict, institution_id, class_id=None, resource_id=None) -> List[UpdateOne]:
+    """
+    Entries for a record and the records nested in it. Accepts stored (`_id`) and API (`id`) shapes.
+    """
+    record_id = to_object_id(record.get("_id", record.get("id")))
+    if record_id is None:
+        return []
+    if entity == "class":
+        class_id = record_id
+    elif entity == "resource":
+        resource_id = record_id
+
+    entries = [entry(entity, record_id, institution_id, class_id, resource_id)]
+    for key, child_entity in CHILDREN.items():
+        for child in record.get(key) or []:
+            if isinstance(child, dict):
+                entries.extend(tree_entries(child_entity, child, institution_id, class_id, resource_id))
+    return entries
+
+
+async def record(entries: List[UpdateOne]):
+    if entries:
+        await changes_collection.bulk_write(entries, ordered=False)
+
+
+async def record_comments(institution_id, class_id, resource_id):
+    """
+    Entries for the comments of a resource, which live in `comment_buckets`.
+    """
+    entries = []
+    async for bucket in comment_buckets_collection.find({"resource_id": to_object_id(resource_id)}, {"comments._id": 1}):
+        entries.extend(
+            entry("comment", comment["_id"], institution_id, class_id, resource_id)
+            for comment in bucket.get("comments") or []
+        )
+    await record(entries)
+
+
+async def resource_object_id(institution_id: ObjectId, class_id: ObjectId, resource_id) -> Optional[ObjectId]:
+    """
+    The ObjectId `_id` of a resource whose id may still be a legacy uuid; None when it is not found.
+    """
+    object_id = to_object_id(resource_id)
+    if object_id is not None or resource_id is None:
+        return object_id
+    institution = await educational_institutions_collection.find_one(
+        {"_id": institution_id, **class_match(class_id, resource_id)}, {"classes.$": 1}
+    )
+    if institution is None:
+        return None
+    resource = find_by_id(institution["classes"][0].get("resources") or [], resource_id)
+    return resource["_id"] if resource is not None else None
+
+
+@Events.add_listener
+async def record_event(event: EventModel):
+    tracked = TRACKED.get(event.type)
+    if tracked is None:
+        return
+    entity, deleted = tracked
+    institution_id, class_id = to_object_id(event.institution_id), to_object_id(event.class_id)
+
+    if deleted:
+        record_id = institution_id if entity == "institution" else class_id
+        await record([entry(entity, record_id, institution_id, class_id, deleted=True)])
+        nested = {"institution_id": institution_id, "entity": {"$ne": entity}}
+        if entity == "class":
+            nested["class_id"] = class_id
+        await changes_collection.delete_many(nested)
+        return
+
+    # Entries are keyed by ObjectId: a resource still named by its legacy uuid is looked up first
+    resource_id = await resource_object_id(institution_id, class_id, event.resource_id)
+    if event.resource_id is not None and resource_id is None:
+        return
+
+    if entity == "institution":
+        record_id = institution_id
+    elif entity == "class":
+        record_id = class_id
+    elif entity == "resource":
+        record_id = resource_id or to_object_id(event.data.get("id"))
+    else:
+        record_id = event.data.get("id")
+
+    if event.type.endswith(".created"):
+        # A new record may arrive with nested ones (e.g. an institution posted with its classes)
+        await record(tree_entries(entity, {**event.data, "id": record_id}, institution_id, class_id, resource_id))
+    else:
+        await record([entry(entity, record_id, institution_id, class_id, resource_id)])
+
+
+def parse_watermark(since: Optional[str]) -> Optional[ObjectId]:
+    """
+    The watermark as an ObjectId; raises ValueError when it is not one.
+    """
+    if since is None:
+        return None
+    watermark = to_object_id(since)
+    if watermark is None:
+        raise ValueError(since)
+    return watermark
+
+
+def expired(watermark: ObjectId) -> bool:
+    """
+    True when tombstones newer than the watermark may already be gone.
+    """
+    return watermark.generation_time < _now() - timedelta(seconds=settings.CHANGES_TOMBSTONE_TTL_SECONDS)
+
+
+async def _find_records(institution_id: ObjectId, entries: List[dict]) -> dict:
+    """
+    Current state of the records the entries point to, by `(entity, record_id)`.
+    """
+    live = [e for e in entries if not e["deleted"]]
+    found = {}
+
+    # Institution, classes, resources and class comments: one read of the institution document
+    if any(e["entity"] != "comment" or e.get("resource_id") is None for e in live):
+        institution = await educational_institutions_collection.find_one(
+            {"_id": institution_id}, {"classes.resources.comments": 0}
+        )
+        if institution is not None:
+            found[("institution", institution["_id"])] = institution
+            for cls in institution.get("classes") or []:
+                found[("class", cls.get("_id"))] = cls
+                for res in cls.get("resources") or []:
+                    found[("resource", res.get("_id"))] = res
+                for com in cls.get("comments") or []:
+                    found[("comment", com.get("_id"))] = com
+
+    # Resource comments: only the buckets holding the changed ones
+    comment_ids = {e["record_id"] for e in live if e["entity"] == "comment" and e.get("resource_id") is not None}
+    if comment_ids:
+        resource_ids = list({e["resource_id"] for e in live if e["record_id"] in comment_ids})
+        async for bucket in comment_buckets_collection.find(
+                {"resource_id": {"$in": resource_ids}, "comments._id": {"$in": list(comment_ids)}},
+                {"comments": 1}
+        ):
+            for com in bucket["comments"]:
+                if com["_id"] in comment_ids:
+                    found[("comment", com["_id"])] = com
+    return found
+
+
+def _change(entry: dict, record: Optional[dict]) -> dict:
+    change = {
+        "entity": entry["entity"],
+        "id": entry["record_id"],
+        "institution_id": entry["institution_id"],
+        "class_id": entry.get("class_id"),
+        "resource_id": entry.get("resource_id"),
+        "deleted": entry["deleted"],
+    }
+    if record is not None:
+        change["version"] = record.get("version", 0)
+        change["updated_at"] = record.get("updated_at") or record.get("created_at")
+        change["data"] = {key: value for key, value in record.items() if key not in HIDDEN_FIELDS}
+    return stringify_ids(change)
+
+
+async def changes_since(institution_id, watermark: Optional[ObjectId], limit: int) -> Tuple[List[dict], ObjectId, bool]:
+    """
+    Records of an institution changed after `watermark` (everything when None), oldest change first.
+
+    Returns `(changes, next_watermark, has_more)`. A record deleted after its entry was read
+    is skipped; its tombstone comes in a later page.
+    """
+    institution_id = to_object_id(institution_id)
+    settled = ObjectId.from_datetime(_now() - timedelta(seconds=settings.CHANGES_SETTLE_SECONDS))
+    seq = {"$lt": settled}
+    if watermark is not None:
+        seq["$gt"] = watermark
+
+    entries = await changes_collection.find({"institution_id": institution_id, "seq": seq}) \
+        .sort("seq", 1) \
+        .limit(limit + 1) \
+        .to_list(limit + 1)
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    found = await _find_records(institution_id, entries)
+    changes = []
+    for e in entries:
+        record = None if e["deleted"] else found.get((e["entity"], e["record_id"]))
+        if e["deleted"] or record is not None:
+            changes.append(_change(e, record))
+
+    if has_more:
+        next_watermark = entries[-1]["seq"]
+    else:
+        # Nothing else is settled up to `settled`, the next sync can start there
+        next_watermark = max(watermark, settled) if watermark is not None else settled
+    return changes, next_watermark, has_more
@@ -0,0 +1,168 @@
+from typing import List, Optional
+
+from pymongo import DESCENDING, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from Api.Config import settings
+from Api.Config.db import comment_buckets_collection
+from Api.Services import BatchWriter
+from Api.Services.Ids import to_object_id
+
+# Bucket pattern: the comments of a resource live in `comment_buckets`, at most
+# COMMENT_BUCKET_SIZE per document, instead of in an ever-growing array inside the
+# institution document.
+#
+#   {resource_id, class_id, institution_id, bucket, first_id, last_id, count, comments: [...]}
+#
+# Buckets are ordered by `first_id` (the ObjectId of their first comment). An append only
+# touches the open (not yet full) bucket of the resource; reading the latest page usually
+# needs just that one document.
+#
+# Buckets opened by the API are numbered 0, 1, 2... per resource, with a unique index on
+# (resource_id, bucket). An append upserts into the newest number while it has room and
+# the next number once it is full; when concurrent appends race to open the same bucket,
+# the unique index lets only one insert win and the others retry against it. So a resource
+# has a single open bucket at any time and the `first_id` ranges of its buckets follow
+# each other.
+#
+# Buckets written by the migration of embedded comments are `sealed` and unnumbered:
+# appends never go into them, which keeps them ordered before any bucket opened by the API.
+
+DUPLICATE_KEY = 11000
+
+_embedded_comments_migrated = False
+
+
+def embedded_comments_migrated() -> bool:
+    """
+    True once no resource keeps comments embedded in the institution document.
+    """
+    return _embedded_comments_migrated
+
+
+def mark_embedded_comments_migrated():
+    global _embedded_comments_migrated
+    _embedded_comments_migrated = True
+
+
+async def _newest_bucket(resource_id) -> Optional[dict]:
+    return await comment_buckets_collection.find_one(
+        {"resource_id": resource_id, "bucket": {"$exists": True}},
+        {"bucket": 1, "count": 1},
+        sort=[("bucket", DESCENDING)],
+    )
+
+
+async def append_comment(institution_id, class_id, resource_id, comment: dict):
+    resource_id = to_object_id(resource_id)
+    while True:
+        newest = await _newest_bucket(resource_id)
+        if newest is None:
+            number = 0
+        elif newest["count"] < settings.COMMENT_BUCKET_SIZE:
+            number = newest["bucket"]
+        else:
+            number = newest["bucket"] + 1
+        try:
+            await BatchWriter.submit(comment_buckets_collection, UpdateOne(
+                {
+                    "resource_id": resource_id,
+                    "bucket": number,
+                    "count": {"$lt": settings.COMMENT_BUCKET_SIZE},
+                },
+                {
+                    "$push": {"comments": comment},
+                    "$inc": {"count": 1},
+                    "$max": {"last_id": comment["_id"]},
+                    "$setOnInsert": {
+                        "institution_id": to_object_id(institution_id),
+                        "class_id": to_object_id(class_id),
+                        "first_id": comment["_id"],
+                    },
+                },
+                upsert=True,
+            ))
+            return
+        except BulkWriteError as error:
+            # The bucket filled up or was opened by a concurrent append: look again
+            if error.details["writeErrors"][0]["code"] != DUPLICATE_KEY:
+                raise
+
+
+async def list_comments(resource_id, limit: Optional[int] = None, before=None) -> List[dict]:
+    """
+    Comments of a resource in chronological order.
+
+    With `limit`, only the latest `limit` comments (older than the comment `before`, if given)
+    are returned, reading buckets from the newest one backwards until the page is full.
+    """
+    query = {"resource_id": to_object_id(resource_id)}
+    before = to_object_id(before)
+    if before is not None:
+        query["first_id"] = {"$lt": before}
+
+    if limit is None:
+        comments = []
+        async for bucket in comment_buckets_collection.find(query).sort("first_id", 1):
+            comments.extend(c for c in bucket["comments"] if before is None or c["_id"] < before)
+        return comments
+
+    comments = []
+    cursor = comment_buckets_collection.find(query).sort("first_id", -1).batch_size(2)
+    async for bucket in cursor:
+        for comment in reversed(bucket["comments"]):
+            if before is not None and comment["_id"] >= before:
+                continue
+            comments.append(comment)
+            if len(comments) == limit:
+                break
+        if len(comments) == limit:
+            break
+    await cursor.close()
+    comments.reverse()
+    return comments
+
+
+async def store_embedded_comments(institution_id, class_id, resource_id, comments: List[dict]):
+    """
+    Copy comments that were embedded in a resource into sealed buckets.
+
+    Idempotent: buckets are keyed by resource and first comment, so a retried migration
+    rewrites the same buckets instead of duplicating them.
+    """
+    size = settings.COMMENT_BUCKET_SIZE
+    operations = []
+    for start in range(0, len(comments), size):
+        chunk = comments[start:start + size]
+        key = {"resource_id": to_object_id(resource_id), "first_id": chunk[0]["_id"]}
+        operations.append(ReplaceOne(key, {
+            **key,
+            "institution_id": to_object_id(institution_id),
+            "class_id": to_object_id(class_id),
+            "last_id": chunk[-1]["_id"],
+            "count": len(chunk),
+            "sealed": True,
+            "comments": chunk,
+        }, upsert=True))
+    if operations:
+        await comment_buckets_collection.bulk_write(operations, ordered=True)
+
+
+async def any_stored(institution_id, class_id=None) -> bool:
+    """
+    True if some comment bucket of the institution (or of one of its classes) is left.
+    """
+    query = {"institution_id": to_object_id(institution_id)}
+    if class_id is not None:
+        query["class_id"] = to_object_id(class_id)
+    return await comment_buckets_collection.find_one(query, {"_id": 1}) is not None
+
+
+async def remove_class(institution_id, class_id):
+    await comment_buckets_collection.delete_many(
+        {"institution_id": to_object_id(institution_id), "class_id": to_object_id(class_id)}
+    )
+
+
+async def remove_institution(institution_id):
+    await comment_buckets_collection.delete_many({"institution_id": to_object_id(institution_id)})
@@ -0,0 +1,19 @@
+import contextlib
+
+import pymongo
+
+from Api.Config import settings
+
+# Upload routes are not under the request deadline of DeadlineMiddleware: the time a slow
+# client takes to send the body is not the server's to bound. They wrap their MongoDB writes
+# in `upload_writes()` instead, once the body (or, for resumable uploads, each part of it)
+# has arrived. Timeouts raised inside still reach the middleware, which answers 503/504.
+
+
+def upload_writes():
+    """
+    Context manager: the MongoDB calls made inside share one REQUEST_DEADLINES["uploads"] deadline.
+    """
+    if not settings.REQUEST_DEADLINES_ENABLED:
+        return contextlib.nullcontext()
+    return pymongo.timeout(settings.REQUEST_DEADLINES["uploads"] or None)
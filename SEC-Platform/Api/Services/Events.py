@@ -0,0 +1,33 @@
+import logging
+from typing import Awaitable, Callable, List
+
+from Api.Model.Event import EventModel
+from Api.Services.Ids import stringify_ids
+
+logger = logging.getLogger(__name__)
+
+# Write routes call `emit` once per change; features that react to changes register a listener
+# instead of adding their own calls to every route.
+_listeners: List[Callable[[EventModel], Awaitable[None]]] = []
+
+
+def add_listener(listener: Callable[[EventModel], Awaitable[None]]):
+    _listeners.append(listener)
+    return listener
+
+
+async def emit(type: str, institution_id, class_id=None, resource_id=None, data=None, actor_id=None):
+    event = EventModel(
+        type=type,
+        institution_id=str(institution_id),
+        class_id=str(class_id) if class_id is not None else None,
+        resource_id=str(resource_id) if resource_id is not None else None,
+        actor_id=str(actor_id) if actor_id is not None else None,
+        data=stringify_ids(data or {}),
+    )
+    for listener in _listeners:
+        try:
+            await listener(event)
+        except Exception:
+            # A failing listener must never fail the write that already happened
+            logger.exception("Event listener %s failed for %s", getattr(listener, "__name__", listener), type)
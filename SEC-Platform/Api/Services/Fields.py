@@ -0,0 +1,64 @@
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple, Type, Union
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict, create_model
+
+from Api.Services.Ids import stringify_ids
+
+# Sparse fieldsets: `?fields=id,name` selects which fields of a model a read route returns.
+# The selection becomes the MongoDB projection, so the other fields (and the nested arrays
+# behind them) are neither sent by the server nor decoded, and the response is validated
+# against a model with just the selected fields.
+
+
+def parse(fields: Optional[str], model: Type[BaseModel]) -> Optional[Tuple[str, ...]]:
+    """
+    The selected field names in the model's order, or None when `fields` was not given.
+    Unknown names are a 400.
+    """
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(model.model_fields)
+    if not requested or unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown)) or '(none selected)'}. "
+                   f"Valid fields: {', '.join(model.model_fields)}",
+        )
+    return tuple(name for name in model.model_fields if name in requested)
+
+
+def projection(selected: Iterable[str], prefix: str = "") -> dict:
+    """
+    Projection of the selected fields, stored under `prefix` (e.g. `classes.`). `id` is stored as `_id`.
+    """
+    selected = list(selected)
+    result = {f"{prefix}{'_id' if name == 'id' else name}": 1 for name in selected}
+    if not prefix and "id" not in selected:
+        result["_id"] = 0
+    return result
+
+
+@lru_cache(maxsize=None)
+def subset_model(model: Type[BaseModel], selected: Tuple[str, ...]) -> Type[BaseModel]:
+    """
+    A model with only the selected fields of `model`, same types and defaults.
+    """
+    return create_model(
+        f"{model.__name__}Fields",
+        __config__=ConfigDict(populate_by_name=True, arbitrary_types_allowed=True),
+        **{name: (model.model_fields[name].annotation, model.model_fields[name]) for name in selected},
+    )
+
+
+def response(model: Type[BaseModel], selected: Tuple[str, ...], content: Union[dict, List[dict]]) -> JSONResponse:
+    """
+    A stored document, or a list of them, already projected, as JSON with the selected fields.
+    """
+    subset = subset_model(model, selected)
+    if isinstance(content, list):
+        return JSONResponse([subset(**stringify_ids(document)).model_dump(mode="json") for document in content])
+    return JSONResponse(subset(**stringify_ids(content)).model_dump(mode="json"))
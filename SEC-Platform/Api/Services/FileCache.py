@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import AsyncIterator, Iterable, Optional, Tuple
+
+import anyio
+from fastapi import HTTPException
+from fastapi.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+from Api.Config import settings
+
+logger = logging.getLogger(__name__)
+
+# Hot-file cache: GridFS files downloaded over and over (the same lecture PDF for a whole
+# class) are kept on local disk, in FILE_CACHE_DIR, named by their GridFS id. A hit is served
+# with FileResponse straight from disk, with Range support, instead of one MongoDB query per
+# 255 KB chunk copied through Python. Servers that offer `http.response.pathsend` send the
+# file themselves (sendfile).
+#
+# - GridFS files never change once written, so a copy is valid until the file is deleted.
+#   Downloads still read the small `files` document first (scan status, existence), so a
+#   file deleted by another process or host is never served from a leftover copy;
+#   `Storage.delete_files` also removes the copies of this host right away.
+# - The first download streams from GridFS as before and writes a copy on the side, under a
+#   temporary name; an atomic rename publishes it only once it is complete. The workers of a
+#   host share the directory: two of them filling the same file write the same bytes.
+# - Past FILE_CACHE_MAX_BYTES the least recently used copies are removed. A hit bumps the
+#   copy's mtime, which is the LRU order every worker sees.
+
+PARTIAL_SUFFIX = ".part"
+# Temporary files of a fill interrupted by a crash are removed after this long
+PARTIAL_MAX_AGE_SECONDS = 3600
+
+_trim_lock = asyncio.Lock()
+
+
+def _path(file_id) -> str:
+    return os.path.join(settings.FILE_CACHE_DIR, str(file_id))
+
+
+def cacheable(length: int) -> bool:
+    return settings.FILE_CACHE_ENABLED and 0 < length <= settings.FILE_CACHE_MAX_FILE_BYTES
+
+
+def _touch(path: str) -> os.stat_result:
+    os.utime(path)
+    return os.stat(path)
+
+
+async def lookup(file_id, length: int) -> Optional[os.stat_result]:
+    """
+    The `stat` of the cached copy of a file, or None on a miss. A hit becomes the most recently used.
+    """
+    if not cacheable(length):
+        return None
+    try:
+        stat_result = await asyncio.to_thread(_touch, _path(file_id))
+    except FileNotFoundError:
+        return None
+    if stat_result.st_size != length:
+        await evict([file_id])  # Cannot happen through `fill`, but never serve a wrong copy
+        return None
+    return stat_result
+
+
+def _open_partial(file_id):
+    os.makedirs(settings.FILE_CACHE_DIR, exist_ok=True)
+    path = f"{_path(file_id)}.{uuid.uuid4().hex}{PARTIAL_SUFFIX}"
+    return path, open(path, "wb")
+
+
+def _close_partial(file, path: str, final_path: Optional[str]):
+    # Synchronous on purpose: it also runs while the stream is being cancelled, where an await would not
+    file.close()
+    if final_path is not None:
+        os.replace(path, final_path)
+    else:
+        os.remove(path)
+
+
+async def fill(file_id, length: int, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Pass `chunks` through, keeping a copy of the file in the cache once all `length` bytes went out.
+
+    A client that disconnects, or a failing disk, leaves no copy behind and never breaks the download.
+    """
+    file = partial_path = None
+    if cacheable(length):
+        try:
+            partial_path, file = await asyncio.to_thread(_open_partial, file_id)
+        except OSError:
+            logger.warning("Cannot write to the file cache in %s", settings.FILE_CACHE_DIR, exc_info=True)
+
+    written = 0
+    complete = False
+    try:
+        async for chunk in chunks:
+            yield chunk
+            if file is not None:
+                try:
+                    await asyncio.to_thread(file.write, chunk)
+                    written += len(chunk)
+                except OSError:
+                    logger.warning("Could not cache file %s", file_id, exc_info=True)
+                    _close_partial(file, partial_path, None)
+                    file = None
+        complete = file is not None and written == length
+    finally:
+        if file is not None:
+            _close_partial(file, partial_path, _path(file_id) if complete else None)
+
+    if complete:
+        await trim()
+
+
+async def evict(file_ids: Iterable):
+    """
+    Remove the cached copies of deleted files.
+    """
+    def remove():
+        for file_id in file_ids:
+            try:
+                os.remove(_path(file_id))
+            except FileNotFoundError:
+                pass
+
+    if settings.FILE_CACHE_ENABLED:
+        await asyncio.to_thread(remove)
+
+
+def _trim(max_bytes: int):
+    copies = []
+    total = 0
+    now = time.time()
+    with os.scandir(settings.FILE_CACHE_DIR) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            stat_result = entry.stat()
+            if entry.name.endswith(PARTIAL_SUFFIX):
+                if now - stat_result.st_mtime > PARTIAL_MAX_AGE_SECONDS:
+                    os.remove(entry.path)
+                continue
+            copies.append((stat_result.st_mtime, stat_result.st_size, entry.path))
+            total += stat_result.st_size
+    if total <= max_bytes:
+        return
+
+    # Down to 90%, so the next fills do not trim again right away
+    copies.sort()
+    for _, size, path in copies:
+        if total <= max_bytes * 0.9:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # Removed by another worker
+        total -= size
+
+
+async def trim():
+    """
+    Remove least recently used copies until the cache fits in FILE_CACHE_MAX_BYTES.
+    """
+    async with _trim_lock:
+        try:
+            await asyncio.to_thread(_trim, settings.FILE_CACHE_MAX_BYTES)
+        except OSError:
+            logger.warning("Could not trim the file cache", exc_info=True)
+
+
+def byte_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    `(first, last)` byte of a single-range `Range` header, or None to send the whole file.
+    Multiple ranges are answered with the whole file, which HTTP allows.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    first, _, last = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if not first:
+            suffix = int(last)  # `bytes=-500`: the last 500 bytes
+            first, last = max(size - suffix, 0), size - 1
+            if suffix == 0:
+                first = size  # Unsatisfiable
+        else:
+            first, last = int(first), min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if first >= size or last < first:
+        raise HTTPException(
+            status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"}
+        )
+    return first, last
+
+
+class FileRangeResponse(FileResponse):
+    """
+    `FileResponse` for bytes `first` to `last` (inclusive) of the file: 206 with `Content-Range`.
+    """
+
+    def __init__(self, path: str, first: int, last: int, stat_result: os.stat_result, **kwargs):
+        super().__init__(path, status_code=206, stat_result=stat_result, **kwargs)
+        self.first = first
+        self.last = last
+        self.headers["Content-Range"] = f"bytes {first}-{last}/{stat_result.st_size}"
+        self.headers["Content-Length"] = str(last - first + 1)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.first)
+            remaining = self.last - self.first + 1
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                remaining = remaining - len(chunk) if chunk else 0
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+
+
+def response(
+        file_id,
+        stat_result: os.stat_result,
+        media_type: str,
+        headers: dict,
+        range_header: Optional[str] = None,
+) -> FileResponse:
+    """
+    Serve a cached copy; with `range_header`, only the requested bytes.
+    """
+    path = _path(file_id)
+    selected = byte_range(range_header, stat_result.st_size)
+    if selected is not None:
+        return FileRangeResponse(path, *selected, stat_result, media_type=media_type, headers=headers)
+    return FileResponse(path, stat_result=stat_result, media_type=media_type, headers=headers)
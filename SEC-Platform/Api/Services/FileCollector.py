@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Set
+
+from bson import ObjectId
+
+from Api.Config import settings
+from Api.Config.db import educational_institutions_collection, grid_fs_files_collection, upload_sessions_collection
+from Api.Services import Storage
+from Api.Services.Ids import to_object_id
+
+logger = logging.getLogger(__name__)
+
+# Mark and sweep garbage collection of the `my-files` GridFS bucket.
+#
+# Mark: every id in `classes.resources.file_ids` (streamed one institution at a time,
+# projected down to the ids), plus the files of upload sessions that are not done yet.
+# Sweep: files that are not marked and were uploaded more than FILE_GC_GRACE_SECONDS
+# ago. The grace period covers files uploaded through `/files/upload` and not yet
+# attached to a resource. A thumbnail lives as long as its original.
+#
+# Files are deleted in batches of FILE_GC_BATCH_SIZE with a pause in between. Right
+# before each batch is deleted, its references are checked again, so a file attached
+# while the collector was running is kept.
+
+
+async def referenced_file_ids() -> Set[ObjectId]:
+    marked = set()
+    async for institution in educational_institutions_collection.find(
+            {"classes.resources.file_ids.0": {"$exists": True}}, {"classes.resources.file_ids": 1}
+    ):
+        for class_ in institution.get("classes", []):
+            for resource in class_.get("resources", []):
+                for file_id in resource.get("file_ids") or []:
+                    file_id = to_object_id(file_id)
+                    if file_id is not None:
+                        marked.add(file_id)
+    async for session in upload_sessions_collection.find({"status": {"$ne": "done"}}, {"_id": 1}):
+        marked.add(session["_id"])
+    return marked
+
+
+async def still_referenced(file_ids: List[ObjectId]) -> Set[ObjectId]:
+    """
+    The subset of `file_ids` that a resource or an unfinished upload session still uses.
+    """
+    candidates = set(file_ids)
+    referenced = set()
+    # Legacy routes may still store string ids until the migration converts them
+    values = file_ids + [str(file_id) for file_id in file_ids]
+    async for institution in educational_institutions_collection.find(
+            {"classes.resources.file_ids": {"$in": values}}, {"classes.resources.file_ids": 1}
+    ):
+        for class_ in institution.get("classes", []):
+            for resource in class_.get("resources", []):
+                for file_id in resource.get("file_ids") or []:
+                    if to_object_id(file_id) in candidates:
+                        referenced.add(to_object_id(file_id))
+    async for session in upload_sessions_collection.find(
+            {"_id": {"$in": file_ids}, "status": {"$ne": "done"}}, {"_id": 1}
+    ):
+        referenced.add(session["_id"])
+    return referenced
+
+
+async def _delete(file_ids: List[ObjectId]) -> int:
+    referenced = await still_referenced(file_ids)
+    return await Storage.delete_files([file_id for file_id in file_ids if file_id not in referenced])
+
+
+async def collect(dry_run: bool = False) -> dict:
+    """
+    Find the orphaned files and, unless `dry_run`, delete them.
+
+    Returns a report: files scanned, orphans found and their bytes, and files deleted
+    (which includes the thumbnails deleted along with their originals).
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.FILE_GC_GRACE_SECONDS)
+    marked = await referenced_file_ids()
+    report = {"dry_run": dry_run, "referenced": len(marked), "scanned": 0, "orphaned": 0,
+              "reclaimable_bytes": 0, "deleted": 0}
+
+    async def sweep(batch: List[ObjectId]):
+        if dry_run or not batch:
+            return
+        report["deleted"] += await _delete(batch)
+        # Throttled: the collector is a background chore, not a priority
+        await asyncio.sleep(settings.FILE_GC_PAUSE_SECONDS)
+
+    batch = []
+    async for file in grid_fs_files_collection.find(
+            {"uploadDate": {"$lt": cutoff}}, {"length": 1, "metadata.thumbnail_of": 1}
+    ):
+        report["scanned"] += 1
+        owner = (file.get("metadata") or {}).get("thumbnail_of")
+        if owner is not None:
+            # A thumbnail goes with its original; here only those whose original is already gone
+            if owner in marked or await grid_fs_files_collection.count_documents({"_id": owner}, limit=1):
+                continue
+        elif file["_id"] in marked:
+            continue
+        report["orphaned"] += 1
+        report["reclaimable_bytes"] += file.get("length", 0)
+        batch.append(file["_id"])
+        if len(batch) >= settings.FILE_GC_BATCH_SIZE:
+            await sweep(batch)
+            batch = []
+    await sweep(batch)
+
+    logger.info("File garbage collection: %s", report)
+    return report
+
+
+async def run_periodic_collection():
+    if settings.FILE_GC_INTERVAL_SECONDS <= 0:
+        return
+    while True:
+        await asyncio.sleep(settings.FILE_GC_INTERVAL_SECONDS)
+        try:
+            await collect()
+        except Exception:
+            logger.exception("File garbage collection failed")
@@ -0,0 +1,75 @@
+from typing import List, Optional
+
+from Api.Config.db import educational_institutions_collection
+from Api.Services import Reads
+
+# Nested classes are never needed by the geo endpoints and are by far the largest part of an institution
+INSTITUTION_PROJECTION = {"classes": 0}
+
+
+async def upgrade_locations():
+    """
+    Add the GeoJSON `type` to locations stored before they were GeoJSON Points.
+
+    Must run before the `2dsphere` index is created: the index build rejects documents
+    whose `location` is not valid GeoJSON.
+    """
+    await educational_institutions_collection.update_many(
+        {"location.coordinates": {"$exists": True}, "location.type": {"$exists": False}},
+        {"$set": {"location.type": "Point"}},
+    )
+
+
+def _point(lng: float, lat: float) -> dict:
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+
+async def near(
+        lng: float,
+        lat: float,
+        max_distance: Optional[float] = None,
+        query: Optional[dict] = None,
+        skip: int = 0,
+        limit: int = 20,
+) -> List[dict]:
+    """
+    Institutions sorted by distance (in meters) from the point, using the `2dsphere` index.
+    """
+    geo_near = {
+        "near": _point(lng, lat),
+        "distanceField": "distance",
+        "key": "location",
+        "spherical": True,
+    }
+    if max_distance is not None:
+        geo_near["maxDistance"] = max_distance
+    if query:
+        geo_near["query"] = query
+
+    pipeline = [
+        {"$geoNear": geo_near},
+        {"$skip": skip},
+        {"$limit": limit},
+        {"$project": INSTITUTION_PROJECTION},
+    ]
+    return await Reads.reader(educational_institutions_collection).aggregate(pipeline).to_list(limit)
+
+
+async def within_polygon(
+        ring: List[List[float]],
+        near_point: Optional[List[float]] = None,
+        skip: int = 0,
+        limit: int = 20,
+) -> List[dict]:
+    """
+    Institutions inside the polygon; sorted by distance when `near_point` is given, by `_id` otherwise.
+    """
+    within = {"location": {"$geoWithin": {"$geometry": {"type": "Polygon", "coordinates": [ring]}}}}
+    if near_point is not None:
+        return await near(near_point[0], near_point[1], query=within, skip=skip, limit=limit)
+
+    cursor = Reads.reader(educational_institutions_collection).find(within, INSTITUTION_PROJECTION) \
+        .sort("_id", 1) \
+        .skip(skip) \
+        .limit(limit)
+    return await cursor.to_list(limit)
@@ -0,0 +1,137 @@
+from typing import Optional, Iterable
+
+from bson import ObjectId
+
+# Canonical id representation:
+#   - Every institution, class, resource and comment is stored with an ObjectId `_id`.
+#   - References (`teacher_id`, `student_ids`, `user_id`, `author_id`, `file_ids`) are stored as ObjectId.
+#   - The API exposes them as `id` strings.
+# Elements created by the old uuid schema keep their uuid as `legacy_id` so old links still resolve.
+
+REFERENCE_FIELDS = ("teacher_id", "user_id", "author_id")
+REFERENCE_LIST_FIELDS = ("student_ids", "file_ids")
+
+
+def to_object_id(value) -> Optional[ObjectId]:
+    """
+    Return `value` as an ObjectId, or None when it is not a valid ObjectId (e.g. a legacy uuid).
+    """
+    if isinstance(value, ObjectId):
+        return value
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    return None
+
+
+def id_condition(value, prefix: str = "") -> dict:
+    """
+    Equality condition on the id of a nested element.
+
+    Canonical ids match the indexed `_id`; anything else is looked up as a legacy uuid,
+    either already migrated (`legacy_id`) or still waiting for the migrator (`id`).
+    """
+    object_id = to_object_id(value)
+    if object_id is not None:
+        return {f"{prefix}_id": object_id}
+    return {"$or": [{f"{prefix}legacy_id": value}, {f"{prefix}id": value}]}
+
+
+def class_match(class_id, resource_id=None) -> dict:
+    """
+    Filter on an institution that has the class `class_id` (and the resource `resource_id` inside that class).
+    """
+    condition = id_condition(class_id)
+    if resource_id is not None:
+        condition = {"$and": [condition, {"resources": {"$elemMatch": id_condition(resource_id)}}]}
+    return {"classes": {"$elemMatch": condition}}
+
+
+def array_filter(identifier: str, value) -> dict:
+    """
+    `array_filters` entry selecting the nested element whose id is `value`.
+    """
+    return id_condition(value, prefix=f"{identifier}.")
+
+
+def matches_id(element: dict, value) -> bool:
+    object_id = to_object_id(value)
+    if object_id is not None:
+        return element.get("_id") == object_id
+    return element.get("legacy_id") == value or element.get("id") == value
+
+
+def find_by_id(elements: Iterable[dict], value) -> Optional[dict]:
+    return next((element for element in elements if matches_id(element, value)), None)
+
+
+def canonicalize_element(element: dict) -> bool:
+    """
+    Convert one nested element to the canonical shape in place.
+
+    Returns True if anything was changed.
+    """
+    changed = False
+
+    if "_id" not in element:
+        legacy_id = element.pop("id", None)
+        object_id = to_object_id(legacy_id)
+        if object_id is None:
+            object_id = ObjectId()
+            if legacy_id is not None:
+                element["legacy_id"] = legacy_id
+        element["_id"] = object_id
+        changed = True
+    elif "id" in element:
+        element.pop("id")
+        changed = True
+    elif not isinstance(element["_id"], ObjectId) and to_object_id(element["_id"]) is not None:
+        element["_id"] = to_object_id(element["_id"])
+        changed = True
+
+    for field in REFERENCE_FIELDS:
+        object_id = to_object_id(element.get(field))
+        if object_id is not None and not isinstance(element[field], ObjectId):
+            element[field] = object_id
+            changed = True
+
+    for field in REFERENCE_LIST_FIELDS:
+        values = element.get(field) or []
+        if any(not isinstance(v, ObjectId) and to_object_id(v) is not None for v in values):
+            element[field] = [to_object_id(v) or v for v in values]
+            changed = True
+
+    return changed
+
+
+def canonicalize_classes(classes: list) -> bool:
+    """
+    Canonicalize every class, resource and comment of an institution in place.
+    """
+    changed = False
+    for cls in classes:
+        changed |= canonicalize_element(cls)
+        for res in cls.get("resources") or []:
+            changed |= canonicalize_element(res)
+            for com in res.get("comments") or []:
+                changed |= canonicalize_element(com)
+        for com in cls.get("comments") or []:
+            changed |= canonicalize_element(com)
+    return changed
+
+
+def stringify_ids(data):
+    """
+    Prepare a stored document for the API: `_id` becomes `id` and every ObjectId becomes a `str`.
+    """
+    if isinstance(data, list):
+        return [stringify_ids(item) for item in data]
+    if isinstance(data, dict):
+        result = {}
+        for key, value in data.items():
+            if key == "_id":
+                key = "id"
+            result[key] = stringify_ids(value)
+        return result
+    if isinstance(data, ObjectId):
+        return str(data)
+    return data
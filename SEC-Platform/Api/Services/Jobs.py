@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import os
+import random
+import socket
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from Api.Config import settings
+from Api.Config.db import jobs_collection
+
+logger = logging.getLogger(__name__)
+
+# Durable job queue in the `jobs` collection:
+#
+#   {_id, type, payload, status, attempts, max_attempts, run_at, locked_until, worker,
+#    progress, result, last_error, created_at, updated_at, finished_at}
+#
+# status: queued -> running -> done
+#                           -> queued again (retry, `run_at` pushed back exponentially)
+#                           -> failed (after `max_attempts`)
+#
+# A worker claims a job with a single `find_one_and_update`, so two workers never run the
+# same job at once. While it runs, the worker keeps extending `locked_until`; if the worker
+# dies, the lock expires and the job becomes claimable again (visibility timeout).
+
+Handler = Callable[[dict], Awaitable[Optional[dict]]]
+
+_handlers: Dict[str, Handler] = {}
+
+
+def handler(job_type: str):
+    """
+    Register the coroutine that runs jobs of `job_type`. It receives the job document
+    and may return a result dict, stored in the job.
+    """
+    def register(function: Handler) -> Handler:
+        _handlers[job_type] = function
+        return function
+    return register
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _job(job_type: str, payload: dict, delay: float, max_attempts: Optional[int]) -> dict:
+    now = _now()
+    return {
+        "_id": ObjectId(),
+        "type": job_type,
+        "payload": payload,
+        "status": "queued",
+        "attempts": 0,
+        "max_attempts": max_attempts or settings.JOB_MAX_ATTEMPTS,
+        "run_at": now + timedelta(seconds=delay),
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+async def enqueue(job_type: str, payload: dict, delay: float = 0, max_attempts: Optional[int] = None) -> ObjectId:
+    job = _job(job_type, payload, delay, max_attempts)
+    await jobs_collection.insert_one(job)
+    return job["_id"]
+
+
+async def enqueue_many(jobs: List[tuple]) -> List[ObjectId]:
+    """
+    Enqueue several `(job_type, payload)` pairs with a single write.
+    """
+    documents = [_job(job_type, payload, 0, None) for job_type, payload in jobs]
+    if documents:
+        await jobs_collection.insert_many(documents, ordered=False)
+    return [document["_id"] for document in documents]
+
+
+async def get_job(job_id) -> Optional[dict]:
+    return await jobs_collection.find_one({"_id": job_id})
+
+
+async def report_progress(job: dict, progress: dict):
+    await jobs_collection.update_one(
+        {"_id": job["_id"], "worker": job["worker"]},
+        {"$set": {"progress": progress, "updated_at": _now()}},
+    )
+
+
+def backoff_seconds(attempts: int) -> float:
+    delay = min(settings.JOB_BACKOFF_SECONDS * 2 ** (attempts - 1), settings.JOB_BACKOFF_MAX_SECONDS)
+    # Jitter, so jobs that failed together do not all retry at the same instant
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def claim(worker_id: str) -> Optional[dict]:
+    now = _now()
+    return await jobs_collection.find_one_and_update(
+        {
+            "type": {"$in": list(_handlers)},
+            "$or": [
+                {"status": "queued", "run_at": {"$lte": now}},
+                {"status": "running", "locked_until": {"$lt": now}},  # Its worker died
+            ],
+        },
+        {
+            "$set": {
+                "status": "running",
+                "worker": worker_id,
+                "locked_until": now + timedelta(seconds=settings.JOB_VISIBILITY_SECONDS),
+                "updated_at": now,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("run_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def _finish(job: dict, update: dict):
+    # Conditional on still owning the job: if the lock expired and another worker took
+    # it over, this outcome is discarded
+    await jobs_collection.update_one({"_id": job["_id"], "worker": job["worker"], "status": "running"}, update)
+
+
+async def _keep_locked(job: dict):
+    interval = settings.JOB_VISIBILITY_SECONDS / 3
+    while True:
+        await asyncio.sleep(interval)
+        await jobs_collection.update_one(
+            {"_id": job["_id"], "worker": job["worker"], "status": "running"},
+            {"$set": {"locked_until": _now() + timedelta(seconds=settings.JOB_VISIBILITY_SECONDS)}},
+        )
+
+
+async def run_job(job: dict):
+    heartbeat = asyncio.create_task(_keep_locked(job))
+    try:
+        result = await _handlers[job["type"]](job)
+    except asyncio.CancelledError:
+        # Shutting down: hand the job back right away instead of waiting for the lock to expire
+        await _finish(job, {"$set": {"status": "queued", "run_at": _now(), "updated_at": _now()},
+                            "$inc": {"attempts": -1}})
+        raise
+    except Exception as error:
+        now = _now()
+        if job["attempts"] >= job["max_attempts"]:
+            logger.exception("Job %s (%s) failed for good after %s attempts", job["_id"], job["type"], job["attempts"])
+            update = {"status": "failed", "finished_at": now}
+        else:
+            logger.warning("Job %s (%s) failed, attempt %s of %s", job["_id"], job["type"],
+                           job["attempts"], job["max_attempts"], exc_info=True)
+            update = {"status": "queued", "run_at": now + timedelta(seconds=backoff_seconds(job["attempts"]))}
+        await _finish(job, {"$set": {**update, "last_error": repr(error), "updated_at": now}})
+    else:
+        now = _now()
+        await _finish(job, {"$set": {"status": "done", "result": result, "finished_at": now, "updated_at": now}})
+    finally:
+        heartbeat.cancel()
+
+
+class WorkerPool:
+    """
+    `concurrency` asyncio workers claiming and running jobs from the queue.
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{ObjectId()}"
+        self._workers: Set[asyncio.Task] = set()
+        self._wake = asyncio.Event()
+        self._stopping = False
+
+    def start(self):
+        for _ in range(self.concurrency):
+            self._workers.add(asyncio.create_task(self._work()))
+
+    def wake(self):
+        """
+        Claim right away instead of at the next poll, e.g. after enqueueing from this process.
+        """
+        self._wake.set()
+
+    async def _work(self):
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                job = await claim(self.worker_id)
+            except Exception:
+                logger.exception("Could not claim a job")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), settings.JOB_POLL_SECONDS * random.uniform(0.8, 1.2))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Recording the outcome failed; the lock expires and the job is retried
+                logger.exception("Could not record the outcome of job %s", job["_id"])
+
+    async def stop(self, grace_seconds: float = 0):
+        """
+        Stop claiming, give running jobs `grace_seconds` to finish, then cancel them
+        (cancelled jobs are handed back to the queue).
+        """
+        self._stopping = True
+        self._wake.set()
+        if self._workers and grace_seconds > 0:
+            await asyncio.wait(self._workers, timeout=grace_seconds)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+
+pool: Optional[WorkerPool] = None
+
+
+def start_pool(concurrency: Optional[int] = None) -> WorkerPool:
+    global pool
+    pool = WorkerPool(concurrency or settings.JOB_WORKERS)
+    pool.start()
+    return pool
+
+
+async def stop_pool():
+    global pool
+    if pool is not None:
+        await pool.stop(settings.JOB_SHUTDOWN_GRACE_SECONDS)
+        pool = None
+
+
+def wake_pool():
+    if pool is not None:
+        pool.wake()
@@ -0,0 +1,64 @@
+from typing import List, Optional
+
+from Api.Config.db import educational_institutions_collection
+from Api.Services.Ids import to_object_id
+
+# "My classes": the classes a user teaches or attends, across every institution.
+#
+# The multikey indexes on `classes.teacher_id` and `classes.student_ids` find the few
+# institutions that have such a class (an `$or` over both indexes when no role is given);
+# `$filter` then keeps only the user's classes of each institution, trimmed to the fields
+# the list shows, so resources, comments and other students are never sent. Sorting and
+# paging happen after `$unwind`, over the user's classes only.
+
+ROLE_FIELDS = {"teacher": "teacher_id", "student": "student_ids"}
+
+
+def _role_condition(user_id, role: str) -> dict:
+    # Aggregation expression: the class in `$$cls` has the user in that role
+    if role == "teacher":
+        return {"$eq": ["$$cls.teacher_id", user_id]}
+    return {"$in": [user_id, {"$ifNull": ["$$cls.student_ids", []]}]}
+
+
+async def user_classes(user_id, role: Optional[str] = None, skip: int = 0, limit: int = 20) -> List[dict]:
+    """
+    Classes where the user is the teacher or a student (only `role`, if given), with the id
+    and name of their institution, sorted by institution and class name.
+    """
+    user_id = to_object_id(user_id)
+    roles = [role] if role is not None else list(ROLE_FIELDS)
+
+    pipeline = [
+        {"$match": {"$or": [{f"classes.{ROLE_FIELDS[r]}": user_id} for r in roles]}},
+        {"$project": {
+            "name": 1,
+            "classes": {"$map": {
+                "input": {"$filter": {
+                    "input": {"$ifNull": ["$classes", []]},
+                    "as": "cls",
+                    "cond": {"$or": [_role_condition(user_id, r) for r in roles]},
+                }},
+                "as": "cls",
+                "in": {
+                    "_id": "$$cls._id",
+                    "name": "$$cls.name",
+                    "teacher_id": "$$cls.teacher_id",
+                    "role": {"$cond": [_role_condition(user_id, "teacher"), "teacher", "student"]},
+                },
+            }},
+        }},
+        {"$unwind": "$classes"},
+        {"$sort": {"name": 1, "classes.name": 1, "classes._id": 1}},
+        {"$skip": skip},
+        {"$limit": limit},
+        {"$project": {
+            "_id": "$classes._id",
+            "name": "$classes.name",
+            "teacher_id": "$classes.teacher_id",
+            "role": "$classes.role",
+            "institution_id": "$_id",
+            "institution_name": "$name",
+        }},
+    ]
+    return await educational_institutions_collection.aggregate(pipeline).to_list(limit)
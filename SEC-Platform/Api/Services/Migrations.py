@@ -0,0 +1,265 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Optional
+
+from Api.Config.db import educational_institutions_collection, migrations_collection
+from Api.Config import settings
+from Api.Services.Ids import canonicalize_classes
+from Api.Services import Comments, Changes
+
+logger = logging.getLogger(__name__)
+
+
+class BatchMigration(ABC):
+    """
+    Online migration that rewrites the documents matching `query` in small batches.
+
+    Progress is stored in the `migrations` collection under `name`, so a restarted
+    process resumes after the last processed `_id` instead of starting over.
+    Each document is written with an optimistic filter on the fields it read; if a
+    request modified the document in between, the write is skipped and the document
+    is picked up again on the next pass.
+    """
+
+    name: str = ""
+    collection = None
+    query: dict = {}
+    projection: Optional[dict] = None
+
+    def __init__(self, batch_size: int = 100, pause_seconds: float = 0.5):
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+
+    @abstractmethod
+    async def transform(self, document: dict) -> Optional[tuple]:
+        """
+        Return `(filter, update)` for the document, or None if it needs no change.
+        """
+
+    async def progress(self) -> Optional[dict]:
+        return await migrations_collection.find_one({"_id": self.name})
+
+    async def _save_progress(self, fields: dict, increments: Optional[dict] = None):
+        update = {"$set": {**fields, "updated_at": datetime.now(timezone.utc)}}
+        if increments:
+            update["$inc"] = increments
+        await migrations_collection.update_one({"_id": self.name}, update, upsert=True)
+
+    async def run_pass(self, after=None) -> int:
+        """
+        Walk the pending documents once, in `_id` order. Returns the number of conflicts.
+        """
+        conflicts = 0
+        while True:
+            query = dict(self.query)
+            if after is not None:
+                query["_id"] = {"$gt": after}
+
+            batch = await self.collection.find(query, self.projection) \
+                .sort("_id", 1) \
+                .limit(self.batch_size) \
+                .to_list(self.batch_size)
+            if not batch:
+                return conflicts
+
+            converted = skipped = 0
+            for document in batch:
+                change = await self.transform(document)
+                if change is None:
+                    continue
+                result = await self.collection.update_one(*change)
+                if result.modified_count:
+                    converted += 1
+                else:
+                    skipped += 1
+            conflicts += skipped
+
+            after = batch[-1]["_id"]
+            await self._save_progress(
+                {"status": "running", "last_id": after},
+                {"processed": len(batch), "converted": converted, "conflicts": skipped},
+            )
+            # Throttle so the migration never competes with live traffic
+            await asyncio.sleep(self.pause_seconds)
+
+    async def run(self):
+        state = await self.progress()
+        if state and state.get("status") == "done" and not await self.collection.find_one(self.query, {"_id": 1}):
+            return
+
+        after = state.get("last_id") if state else None
+        await self._save_progress({"status": "running", "started_at": datetime.now(timezone.utc)})
+        logger.info("Migration %s started", self.name)
+
+        while True:
+            conflicts = await self.run_pass(after)
+            if not conflicts and after is None:
+                break
+            # Start over from the beginning to pick up documents skipped by a conflict
+            # or written in the legacy shape before the resume point.
+            after = None
+            if not await self.collection.find_one(self.query, {"_id": 1}):
+                break
+
+        await self._save_progress({"status": "done", "last_id": None, "finished_at": datetime.now(timezone.utc)})
+        logger.info("Migration %s finished", self.name)
+
+
+OBJECT_ID_PATTERN = "^[0-9a-fA-F]{24}$"
+
+
+class NestedIdMigration(BatchMigration):
+    """
+    Converts classes, resources and comments from the uuid `id` schema to ObjectId `_id`.
+    """
+
+    name = "nested-ids"
+    collection = educational_institutions_collection
+    query = {
+        "$or": [
+            {"classes.id": {"$exists": True}},
+            {"classes.resources.id": {"$exists": True}},
+            {"classes.comments.id": {"$exists": True}},
+            {"classes.resources.comments.id": {"$exists": True}},
+            # Only ids stored as hex strings: other legacy strings (e.g. "teacher1") cannot be
+            # converted and would be matched, and rewritten, on every startup
+            {"classes.teacher_id": {"$regex": OBJECT_ID_PATTERN}},
+            {"classes.student_ids": {"$regex": OBJECT_ID_PATTERN}},
+            {"classes.resources.file_ids": {"$regex": OBJECT_ID_PATTERN}},
+            {"classes.comments.author_id": {"$regex": OBJECT_ID_PATTERN}},
+            {"classes.comments.user_id": {"$regex": OBJECT_ID_PATTERN}},
+            {"classes.resources.comments.author_id": {"$regex": OBJECT_ID_PATTERN}},
+            {"classes.resources.comments.user_id": {"$regex": OBJECT_ID_PATTERN}},
+        ]
+    }
+    projection = {"classes": 1}
+
+    async def transform(self, document: dict) -> Optional[tuple]:
+        original = document.get("classes") or []
+        classes = [dict(cls) for cls in original]
+        # Deep enough copy: nested lists are replaced, never mutated, by canonicalize_element
+        for cls in classes:
+            cls["resources"] = [dict(res, comments=[dict(c) for c in res.get("comments") or []])
+                                for res in cls.get("resources") or []]
+            if "comments" in cls:
+                cls["comments"] = [dict(c) for c in cls["comments"]]
+
+        if not canonicalize_classes(classes):
+            return None
+
+        return (
+            {"_id": document["_id"], "classes": original},
+            {"$set": {"classes": classes}},
+        )
+
+
+class CommentBucketMigration(BatchMigration):
+    """
+    Moves comments embedded in `classes.resources.comments` into `comment_buckets`.
+    """
+
+    name = "comment-buckets"
+    collection = educational_institutions_collection
+    query = {"classes.resources.comments.0": {"$exists": True}}
+    projection = {"classes": 1}
+
+    async def transform(self, document: dict) -> Optional[tuple]:
+        original = document.get("classes") or []
+        classes = []
+        for cls in original:
+            resources = []
+            for res in cls.get("resources") or []:
+                embedded = res.get("comments") or []
+                if embedded:
+                    if "_id" not in cls or "_id" not in res or any("_id" not in c for c in embedded):
+                        return None  # Waits for NestedIdMigration
+                    await Comments.store_embedded_comments(document["_id"], cls["_id"], res["_id"], embedded)
+                    res = {key: value for key, value in res.items() if key != "comments"}
+                resources.append(res)
+            classes.append({**cls, "resources": resources} if "resources" in cls else cls)
+
+        return (
+            {"_id": document["_id"], "classes": original},
+            {"$set": {"classes": classes}},
+        )
+
+
+class ChangeLogMigration(BatchMigration):
+    """
+    Stamps `version` and `updated_at` on the records written before delta sync existed, and
+    records them (and the comments of their resources) in the change log.
+    """
+
+    name = "change-log"
+    collection = educational_institutions_collection
+    query = {
+        "$or": [
+            {"version": {"$exists": False}},
+            {"classes": {"$elemMatch": {"version": {"$exists": False}}}},
+            {"classes.resources": {"$elemMatch": {"version": {"$exists": False}}}},
+            {"classes.comments": {"$elemMatch": {"version": {"$exists": False}}}},
+        ]
+    }
+    projection = {"classes": 1, "version": 1}
+
+    async def transform(self, document: dict) -> Optional[tuple]:
+        original = document.get("classes")
+        institution_id = document["_id"]
+        now = datetime.now(timezone.utc)
+        entries = []
+        comments_of = []
+
+        def stamp(record: dict, entity: str, class_id=None, resource_id=None) -> dict:
+            if "version" in record:
+                return record
+            entries.append(Changes.entry(entity, record["_id"], institution_id, class_id, resource_id))
+            return {**record, "version": 1, "updated_at": now}
+
+        classes = []
+        for cls in original or []:
+            if "_id" not in cls or any("_id" not in e for e in (cls.get("resources") or []) + (cls.get("comments") or [])):
+                return None  # Waits for NestedIdMigration
+            resources = []
+            for res in cls.get("resources") or []:
+                if "version" not in res:
+                    comments_of.append((cls["_id"], res["_id"]))
+                resources.append(stamp(res, "resource", cls["_id"], res["_id"]))
+            cls = stamp(cls, "class", cls["_id"])
+            if "resources" in cls:
+                cls = {**cls, "resources": resources}
+            if "comments" in cls:
+                cls = {**cls, "comments": [stamp(com, "comment", cls["_id"]) for com in cls["comments"]]}
+            classes.append(cls)
+
+        update = {}
+        if "version" not in document:
+            entries.append(Changes.entry("institution", institution_id, institution_id))
+            update.update({"version": 1, "updated_at": now})
+        if original is not None:
+            update["classes"] = classes
+
+        # Recording twice is harmless, so a write skipped by a conflict is simply retried
+        await Changes.record(entries)
+        for class_id, resource_id in comments_of:
+            await Changes.record_comments(institution_id, class_id, resource_id)
+
+        return (
+            {"_id": institution_id, "classes": original, "version": document.get("version")},
+            {"$set": update},
+        )
+
+
+async def run_startup_migrations():
+    try:
+        if settings.MIGRATIONS_ENABLED:
+            for migration in (NestedIdMigration, CommentBucketMigration, ChangeLogMigration):
+                await migration(
+                    batch_size=settings.MIGRATION_BATCH_SIZE,
+                    pause_seconds=settings.MIGRATION_PAUSE_SECONDS,
+                ).run()
+        if not await educational_institutions_collection.find_one(CommentBucketMigration.query, {"_id": 1}):
+            Comments.mark_embedded_comments_migrated()
+    except Exception:
+        logger.exception("Background migration failed; it will resume on the next start")
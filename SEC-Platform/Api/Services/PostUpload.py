@@ -0,0 +1,141 @@
+import asyncio
+import hashlib
+import struct
+from typing import Iterable, Optional, Tuple
+
+from bson import ObjectId
+
+from Api.Config import settings
+from Api.Config.db import grid_fs_bucket, grid_fs_files_collection
+from Api.Services import Jobs, Thumbnails
+from Api.Services.Compression import gzip_decoder
+from Api.Services.Ids import to_object_id
+
+# Work done after an upload runs as queued jobs, so the upload request only pays for
+# the GridFS write:
+#   - `file.inspect`: SHA-256, MIME sniffing and, when a clamd daemon is configured, a virus scan
+#   - `thumbnail`: see Api.Services.Thumbnails
+
+# (offset, magic bytes, MIME type)
+SIGNATURES = [
+    (0, b"%PDF-", "application/pdf"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (0, b"PK\x03\x04", "application/zip"),
+    (0, b"ID3", "audio/mpeg"),
+    (0, b"OggS", "audio/ogg"),
+    (0, b"\x1aE\xdf\xa3", "video/webm"),
+    (4, b"ftyp", "video/mp4"),
+]
+
+
+def sniff(head: bytes) -> str:
+    for offset, magic, content_type in SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    try:
+        head.decode("utf-8")
+        return "text/plain"
+    except UnicodeDecodeError:
+        return "application/octet-stream"
+
+
+async def _file_chunks(file_id: ObjectId, compressed: bool):
+    grid_out = await grid_fs_bucket.open_download_stream(file_id)
+    decoder = gzip_decoder() if compressed else None
+    try:
+        async for chunk in grid_out:
+            yield decoder.decompress(chunk) if decoder is not None else chunk
+        if decoder is not None:
+            yield decoder.flush()
+    finally:
+        await grid_out.close()
+
+
+async def _open_clamd():
+    address = settings.CLAMD_ADDRESS
+    if address.startswith("unix:"):
+        return await asyncio.open_unix_connection(address[len("unix:"):])
+    host, _, port = address.rpartition(":")
+    return await asyncio.open_connection(host, int(port))
+
+
+class Scanner:
+    """
+    Streams a file to clamd with the INSTREAM command while it is being hashed.
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def open(cls) -> "Scanner":
+        reader, writer = await _open_clamd()
+        writer.write(b"zINSTREAM\0")
+        return cls(reader, writer)
+
+    async def send(self, data: bytes):
+        if data:
+            self.writer.write(struct.pack("!L", len(data)) + data)
+            await self.writer.drain()
+
+    async def verdict(self) -> Tuple[str, Optional[str]]:
+        self.writer.write(struct.pack("!L", 0))
+        await self.writer.drain()
+        reply = (await self.reader.readuntil(b"\0")).rstrip(b"\0").decode()
+        self.writer.close()
+        # "stream: OK" or "stream: <signature> FOUND"
+        if reply.endswith("FOUND"):
+            return "infected", reply.split(": ", 1)[-1][:-len(" FOUND")]
+        if reply.endswith("OK"):
+            return "clean", None
+        raise RuntimeError(f"Unexpected clamd reply: {reply}")
+
+
+@Jobs.handler("file.inspect")
+async def inspect_file(job: dict) -> Optional[dict]:
+    file_id = to_object_id(job["payload"]["file_id"])
+    file = await grid_fs_files_collection.find_one({"_id": file_id}, {"metadata": 1})
+    if file is None:
+        return None  # Deleted before the job ran
+    metadata = file.get("metadata") or {}
+
+    scanner = await Scanner.open() if settings.CLAMD_ADDRESS else None
+    digest = hashlib.sha256()
+    head = b""
+    async for data in _file_chunks(file_id, metadata.get("contentEncoding") == "gzip"):
+        digest.update(data)
+        if len(head) < 512:
+            head += data[:512 - len(head)]
+        if scanner is not None:
+            await scanner.send(data)
+
+    result = {"sha256": digest.hexdigest(), "sniffedType": sniff(head)}
+    if scanner is not None:
+        result["scan"], signature = await scanner.verdict()
+        if signature is not None:
+            result["signature"] = signature
+
+    await grid_fs_files_collection.update_one(
+        {"_id": file_id},
+        {"$set": {f"metadata.{key}": value for key, value in result.items()}},
+    )
+    return result
+
+
+async def enqueue(files: Iterable[Tuple[ObjectId, Optional[str]]]):
+    """
+    Queue the post-upload jobs of freshly stored `(file_id, content_type)` pairs.
+    """
+    jobs = []
+    for file_id, content_type in files:
+        jobs.append(("file.inspect", {"file_id": file_id}))
+        if Thumbnails.supports(content_type):
+            jobs.append(("thumbnail", {"file_id": file_id}))
+    await Jobs.enqueue_many(jobs)
+    Jobs.wake_pool()
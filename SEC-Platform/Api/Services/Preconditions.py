@@ -0,0 +1,55 @@
+from typing import List, Optional
+
+from fastapi import HTTPException, status
+
+# Optimistic concurrency for the PUT routes. Institutions, classes and users carry a `version`
+# that every write increments, exposed as the ETag `"<version>"`. A PUT with `If-Match` adds
+# the expected version to the update filter, so the check and the write are one atomic
+# operation: if another request wrote first nothing matches, nothing is written, and the
+# client gets 412 with the current ETag. Without `If-Match` the update is unconditional.
+#
+# Records written before versions existed count as version 0 (`$inc` turns a missing field into 1).
+
+
+def version_of(document: dict) -> int:
+    return document.get("version") or 0
+
+
+def etag(document: dict) -> str:
+    return f'"{version_of(document)}"'
+
+
+def expected_versions(if_match: Optional[str]) -> Optional[List[int]]:
+    """
+    Versions accepted by an `If-Match` header, or None when it sets no precondition (absent or `*`).
+
+    `If-Match` uses the strong comparison, so weak (`W/`) or foreign tags match nothing.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    versions = []
+    for tag in if_match.split(","):
+        tag = tag.strip()
+        if len(tag) > 2 and tag[0] == tag[-1] == '"' and tag[1:-1].isdigit():
+            versions.append(int(tag[1:-1]))
+    return versions
+
+
+def version_condition(versions: Optional[List[int]], prefix: str = "") -> dict:
+    """
+    Filter condition on `version` (at `prefix`, e.g. inside an `$elemMatch`) for the accepted versions.
+    """
+    if versions is None:
+        return {}
+    values = list(versions)
+    if 0 in values:
+        values.append(None)  # Also matches a missing `version`
+    return {f"{prefix}version": {"$in": values}}
+
+
+def precondition_failed(current: dict) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="The record was modified by another request",
+        headers={"ETag": etag(current)},
+    )
@@ -0,0 +1,77 @@
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+from Api.Config import settings
+from Api.Config.db import client
+
+# Per-route read preferences. Routes that can live with slightly stale data (listings,
+# searches, geo queries, stats) declare `dependencies=[Depends(Reads.reporting)]`; for the
+# rest of the request, every read made through `reader(collection)` uses
+# REPORTING_READ_PREFERENCE (secondaryPreferred by default) bounded by
+# REPORTING_MAX_STALENESS_SECONDS, so heavy reads stop competing with the writes of live
+# classes on the primary. Outside those routes `reader` returns the collection as it is.
+#
+# Writes always go to the primary. Flows that read what they just wrote run in a
+# `causal_session()` and keep their reads on the primary, so they see their own writes
+# whatever the client's default read preference is (e.g. `readPreference` in MONGO_URI).
+
+MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+_route_preference: ContextVar[Optional[object]] = ContextVar("route_read_preference", default=None)
+_handles: Dict[Tuple[str, str], object] = {}
+
+
+def read_preference(mode: str, max_staleness: int = -1):
+    if mode not in MODES:
+        raise ValueError(f"Unknown read preference {mode!r}, expected one of {', '.join(MODES)}")
+    if mode == "primary":
+        return Primary()
+    return MODES[mode](max_staleness=max_staleness)
+
+
+reporting_preference = read_preference(settings.REPORTING_READ_PREFERENCE, settings.REPORTING_MAX_STALENESS_SECONDS)
+
+
+async def reporting():
+    """
+    Route dependency: reads of this request may go to secondaries.
+    """
+    _route_preference.set(reporting_preference)
+
+
+def _with_preference(collection, preference):
+    key = (collection.full_name, preference.name)
+    handle = _handles.get(key)
+    if handle is None:
+        handle = _handles[key] = collection.with_options(read_preference=preference)
+    return handle
+
+
+def reader(collection):
+    """
+    `collection` with the read preference of the current route.
+    """
+    preference = _route_preference.get()
+    return collection if preference is None else _with_preference(collection, preference)
+
+
+def primary(collection):
+    return _with_preference(collection, Primary())
+
+
+@asynccontextmanager
+async def causal_session():
+    """
+    Session for a write followed by reads of what was written (pass it as `session=`).
+    """
+    async with await client.start_session(causal_consistency=True) as session:
+        yield session
@@ -0,0 +1,33 @@
+import re
+from typing import List, Optional, Pattern, Set, Tuple
+
+# One classification of the API routes, shared by the middlewares that treat requests
+# differently by route (rate limits, deadlines). `classify` names what a request does;
+# each middleware maps those kinds to its own groups, so a new route is added here once.
+
+# (methods, path pattern, kind). The first matching rule wins.
+ROUTES: List[Tuple[Set[str], Pattern, str]] = [
+    ({"POST"}, re.compile(r"^/api/v1/auth/"), "auth"),
+    ({"GET"}, re.compile(r"/events/?$"), "feed"),
+    ({"GET"}, re.compile(r"/files/[^/]+/?$"), "download"),
+    ({"POST"}, re.compile(r"/files(/upload)?/?$"), "upload"),
+    ({"PUT"}, re.compile(r"/uploads/[^/]+/?$"), "upload"),
+    ({"POST"}, re.compile(r"/uploads/?$"), "upload-session"),
+    ({"GET"}, re.compile(r"^/api/v1/(users|educationalInstitutions|educational-institutions)/?$"), "list"),
+    ({"GET"}, re.compile(r"/classes/?$"), "list"),
+    ({"GET"}, re.compile(r"/(search|near|within-radius)/?$"), "search"),
+    ({"POST"}, re.compile(r"/within-polygon/?$"), "search"),
+    ({"GET"}, re.compile(r"/(stats|activity|changes)/?$"), "report"),
+]
+
+UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    """
+    The kind of route a request goes to, or None for anything without special treatment.
+    """
+    for methods, pattern, kind in ROUTES:
+        if method in methods and pattern.search(path):
+            return kind
+    return None
@@ -0,0 +1,170 @@
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from pymongo import ReplaceOne
+
+from Api.Config.db import educational_institutions_collection, search_entries_collection, comment_buckets_collection, \
+    migrations_collection
+from Api.Services import BatchWriter, Reads
+from Api.Services.Ids import to_object_id
+
+logger = logging.getLogger(__name__)
+
+# One flat entry per resource and per comment, so the text index ranks individual items
+# instead of whole institution documents. `institution_id` is the equality prefix of the
+# compound text index, which keeps every query inside a single institution's entries.
+
+
+def _resource_entry(institution_id, class_id, resource: dict) -> dict:
+    return {
+        "_id": resource["_id"],
+        "kind": "resource",
+        "institution_id": to_object_id(institution_id),
+        "class_id": to_object_id(class_id),
+        "resource_id": resource["_id"],
+        "title": resource.get("title"),
+        "description": resource.get("description"),
+        "created_at": resource.get("created_at"),
+    }
+
+
+def _comment_entry(institution_id, class_id, resource_id, comment: dict) -> dict:
+    return {
+        "_id": comment["_id"],
+        "kind": "comment",
+        "institution_id": to_object_id(institution_id),
+        "class_id": to_object_id(class_id),
+        "resource_id": to_object_id(resource_id),
+        "content": comment.get("content"),
+        "created_at": comment.get("created_at"),
+    }
+
+
+async def index_resource(institution_id, class_id, resource: dict):
+    entry = _resource_entry(institution_id, class_id, resource)
+    await search_entries_collection.replace_one({"_id": entry["_id"]}, entry, upsert=True)
+
+
+async def index_comment(institution_id, class_id, resource_id, comment: dict):
+    entry = _comment_entry(institution_id, class_id, resource_id, comment)
+    await BatchWriter.submit(search_entries_collection, ReplaceOne({"_id": entry["_id"]}, entry, upsert=True))
+
+
+async def remove_class(institution_id, class_id):
+    await search_entries_collection.delete_many(
+        {"institution_id": to_object_id(institution_id), "class_id": to_object_id(class_id)}
+    )
+
+
+async def remove_institution(institution_id):
+    await search_entries_collection.delete_many({"institution_id": to_object_id(institution_id)})
+
+
+async def search(
+        institution_id: str,
+        query: str,
+        class_id: Optional[str] = None,
+        kind: Optional[str] = None,
+        page: int = 1,
+        page_size: int = 20,
+):
+    """
+    Ranked full-text search inside one institution.
+
+    Returns `(entries, has_more)`; one extra entry is fetched instead of counting the matches.
+    """
+    text_filter = {"institution_id": to_object_id(institution_id), "$text": {"$search": query}}
+    if class_id is not None:
+        text_filter["class_id"] = to_object_id(class_id)
+    if kind is not None:
+        text_filter["kind"] = kind
+
+    cursor = Reads.reader(search_entries_collection).find(text_filter, {"score": {"$meta": "textScore"}}) \
+        .sort([("score", {"$meta": "textScore"})]) \
+        .skip((page - 1) * page_size) \
+        .limit(page_size + 1)
+    entries = await cursor.to_list(page_size + 1)
+    return entries[:page_size], len(entries) > page_size
+
+
+async def rebuild_search_index(batch_size: int = 500) -> int:
+    """
+    Rebuild the entries of every institution. Used to backfill data written before search existed.
+
+    Returns the number of classes and resources left out because they still have legacy ids.
+    """
+    operations = []
+    skipped = 0
+    cursor = educational_institutions_collection.find(
+        {},
+        {"classes._id": 1, "classes.resources": 1, "classes.comments": 1},
+    )
+    async for institution in cursor:
+        for cls in institution.get("classes") or []:
+            if "_id" not in cls:
+                skipped += 1  # Not migrated yet; indexed by the next rebuild
+                continue
+            for res in cls.get("resources") or []:
+                if "_id" not in res:
+                    skipped += 1
+                    continue
+                entry = _resource_entry(institution["_id"], cls["_id"], res)
+                operations.append(ReplaceOne({"_id": entry["_id"]}, entry, upsert=True))
+                for com in res.get("comments") or []:
+                    if "_id" in com:
+                        entry = _comment_entry(institution["_id"], cls["_id"], res["_id"], com)
+                        operations.append(ReplaceOne({"_id": entry["_id"]}, entry, upsert=True))
+            for com in cls.get("comments") or []:
+                if "_id" in com:
+                    entry = _comment_entry(institution["_id"], cls["_id"], None, com)
+                    operations.append(ReplaceOne({"_id": entry["_id"]}, entry, upsert=True))
+
+            if len(operations) >= batch_size:
+                await search_entries_collection.bulk_write(operations, ordered=False)
+                operations = []
+
+    async for bucket in comment_buckets_collection.find({}):
+        for com in bucket["comments"]:
+            entry = _comment_entry(bucket["institution_id"], bucket["class_id"], bucket["resource_id"], com)
+            operations.append(ReplaceOne({"_id": entry["_id"]}, entry, upsert=True))
+        if len(operations) >= batch_size:
+            await search_entries_collection.bulk_write(operations, ordered=False)
+            operations = []
+
+    if operations:
+        await search_entries_collection.bulk_write(operations, ordered=False)
+    return skipped
+
+
+# Progress of the backfill, next to the one of the migrations
+BACKFILL_MARKER = "search-backfill"
+
+
+async def backfill_search_index():
+    """
+    Backfill the search entries on startup, until one backfill has indexed everything.
+
+    Completion is recorded in the `migrations` collection. A backfill that was interrupted,
+    failed or ran before every class and resource had an ObjectId runs again on the next
+    start; rebuilding is idempotent, so entries already written are only replaced.
+    """
+    try:
+        marker = await migrations_collection.find_one({"_id": BACKFILL_MARKER})
+        if marker and marker.get("status") == "done":
+            return
+        await migrations_collection.update_one(
+            {"_id": BACKFILL_MARKER},
+            {"$set": {"status": "running", "started_at": datetime.now(timezone.utc)}},
+            upsert=True,
+        )
+        skipped = await rebuild_search_index()
+        if skipped:
+            logger.info("Search index backfill left out %s elements with legacy ids; it runs again next start", skipped)
+            return
+        await migrations_collection.update_one(
+            {"_id": BACKFILL_MARKER},
+            {"$set": {"status": "done", "finished_at": datetime.now(timezone.utc)}},
+        )
+    except Exception:
+        logger.exception("Search index backfill failed")
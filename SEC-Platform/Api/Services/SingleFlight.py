@@ -0,0 +1,63 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from bson import ObjectId
+from fastapi import HTTPException
+
+from Api.Config import settings
+
+# Identical reads that arrive while the first one is still running share its MongoDB call
+# instead of issuing their own: 300 students opening the same class link produce one
+# `find_one`, not 300. Nothing is cached; once the call finishes, the next read goes to
+# the database again.
+#
+# Every waiter receives the same object, so results must be treated as read-only.
+# Only use it on read routes: a read issued right after a write could otherwise join a
+# call that started before the write and see the old data.
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None):
+        """
+        Run `fn()` unless a call with the same `key` is already running, and wait for its result.
+
+        Exceptions raised by `fn` reach every waiter. `timeout` only bounds this caller's
+        wait: a caller giving up (or being cancelled) does not cancel the shared call.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return await asyncio.wait_for(asyncio.shield(task), timeout)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved, so an error nobody waited for is not reported as unhandled
+
+
+flights = SingleFlight()
+
+
+def query_key(*parts) -> tuple:
+    """
+    Key for a read: ids are normalized so that the same query always produces the same key.
+    """
+    return tuple(str(part) if isinstance(part, ObjectId) else part for part in parts)
+
+
+async def coalesce(key: Hashable, fn: Callable[[], Awaitable[Any]]):
+    if not settings.SINGLE_FLIGHT_ENABLED:
+        return await fn()
+    try:
+        return await flights.do(key, fn, settings.SINGLE_FLIGHT_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Timed out waiting for the database")
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+from typing import Optional
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from Api.Config import settings
+from Api.Config.db import educational_institutions_collection, comment_buckets_collection, grid_fs_files_collection
+from Api.Services import BatchWriter, Reads
+from Api.Services.Ids import to_object_id
+
+logger = logging.getLogger(__name__)
+
+# Counters kept next to the data they describe:
+#   institution: stats.{classes, resources, comments, files, bytes}
+#   class:       classes.$.stats.{resources, comments, files, bytes}
+# They are incremented with `$inc` in the same update that changes the data, except for
+# comments, whose bucket lives in another collection (one extra `$inc`). Anything that
+# can make them drift (a failed second write, a race with a class deletion) is fixed by
+# `reconcile_institution`.
+
+COUNTERS = ("classes", "resources", "comments", "files", "bytes")
+CLASS_COUNTERS = ("resources", "comments", "files", "bytes")
+
+
+def inc(class_path: Optional[str] = None, **counts) -> dict:
+    """
+    `$inc` document for the institution counters and, with `class_path` (e.g. `classes.$`), the class ones.
+    """
+    update = {f"stats.{name}": value for name, value in counts.items()}
+    if class_path is not None:
+        update.update({f"{class_path}.stats.{name}": value for name, value in counts.items() if name != "classes"})
+    return update
+
+
+async def add_comment(institution_id, class_id):
+    await BatchWriter.submit(educational_institutions_collection, UpdateOne(
+        {"_id": to_object_id(institution_id), "classes._id": to_object_id(class_id)},
+        {"$inc": inc("classes.$", comments=1)},
+    ))
+
+
+async def institution_stats(institution_id) -> Optional[dict]:
+    institution = await Reads.reader(educational_institutions_collection).find_one(
+        {"_id": to_object_id(institution_id)}, {"stats": 1}
+    )
+    if institution is None:
+        return None
+    stats = institution.get("stats") or {}
+    return {name: stats.get(name, 0) for name in COUNTERS}
+
+
+async def class_stats(institution_id, class_id) -> Optional[dict]:
+    """
+    Counters of one class. Only the counters leave the server, not the class.
+    """
+    pipeline = [
+        {"$match": {"_id": to_object_id(institution_id), "classes._id": to_object_id(class_id)}},
+        {"$project": {
+            "_id": 0,
+            "stats": {"$first": {"$map": {
+                "input": {"$filter": {"input": "$classes", "cond": {"$eq": ["$$this._id", to_object_id(class_id)]}}},
+                "in": {"$ifNull": ["$$this.stats", {}]},
+            }}},
+        }},
+    ]
+    result = await Reads.reader(educational_institutions_collection).aggregate(pipeline).to_list(1)
+    if not result:
+        return None
+    stats = result[0].get("stats") or {}
+    return {name: stats.get(name, 0) for name in CLASS_COUNTERS}
+
+
+# Attempts of `reconcile_institution` against concurrent counter updates before leaving it for the next run
+RECONCILE_ATTEMPTS = 3
+
+
+async def reconcile_institution(institution_id):
+    """
+    Recompute every counter of an institution from the data itself.
+
+    The counters are written only if the institution's `stats` are still the ones read with
+    the data: every `$inc` of a counter also moves `stats`, so one landing in between makes
+    the write miss, and the counts are taken again instead of overwriting it.
+    """
+    institution_id = to_object_id(institution_id)
+    for _ in range(RECONCILE_ATTEMPTS):
+        if await _reconcile_once(institution_id):
+            return
+    logger.info("Counters of institution %s kept changing; left for the next reconciliation", institution_id)
+
+
+async def _reconcile_once(institution_id: ObjectId) -> bool:
+    """
+    One attempt of `reconcile_institution`. False when a counter changed since the data was read.
+    """
+    institution = await educational_institutions_collection.find_one(
+        {"_id": institution_id},
+        {"stats": 1, "classes._id": 1, "classes.comments._id": 1, "classes.resources.file_ids": 1,
+         "classes.resources.comments._id": 1},
+    )
+    if institution is None:
+        return True
+
+    classes = [cls for cls in institution.get("classes") or [] if "_id" in cls]
+
+    bucket_counts = {}
+    async for row in comment_buckets_collection.aggregate([
+        {"$match": {"institution_id": institution_id}},
+        {"$group": {"_id": "$class_id", "comments": {"$sum": "$count"}}},
+    ]):
+        bucket_counts[row["_id"]] = row["comments"]
+
+    sizes = await _file_sizes(classes)
+    totals = dict.fromkeys(COUNTERS, 0)
+    totals["classes"] = len(classes)
+    update = {}
+    array_filters = []
+    for index, cls in enumerate(classes):
+        counts = _class_counts(cls, bucket_counts.get(cls["_id"], 0), sizes)
+        for name, value in counts.items():
+            totals[name] += value
+        update[f"classes.$[c{index}].stats"] = counts
+        array_filters.append({f"c{index}._id": cls["_id"]})
+
+    # A comment whose bucket was counted above may still have its `$inc` queued: written
+    # now, it lands before the write below and makes it miss instead of being added on top
+    await BatchWriter.flush(comment_buckets_collection, educational_institutions_collection)
+    update["stats"] = totals
+    # `stats` as read: equality on the whole subdocument, a missing one matches None
+    result = await educational_institutions_collection.update_one(
+        {"_id": institution_id, "stats": institution.get("stats")}, {"$set": update}, array_filters=array_filters or None
+    )
+    return result.matched_count == 1
+
+
+async def _file_sizes(classes) -> dict:
+    file_ids = [fid for cls in classes for res in cls.get("resources") or [] for fid in res.get("file_ids") or []]
+    if not file_ids:
+        return {}
+    sizes = {}
+    async for file in grid_fs_files_collection.find({"_id": {"$in": file_ids}}, {"length": 1}):
+        sizes[file["_id"]] = file["length"]
+    return sizes
+
+
+def _class_counts(cls: dict, bucket_comments: int, sizes: dict) -> dict:
+    resources = cls.get("resources") or []
+    file_ids = [fid for res in resources for fid in res.get("file_ids") or []]
+    return {
+        "resources": len(resources),
+        "comments": bucket_comments
+                    + len(cls.get("comments") or [])
+                    + sum(len(res.get("comments") or []) for res in resources),
+        "files": len(file_ids),
+        "bytes": sum(sizes.get(fid, 0) for fid in file_ids),
+    }
+
+
+async def initialize(institution: dict) -> dict:
+    """
+    Set the counters of an institution about to be inserted, counted from the classes it comes with.
+    """
+    classes = institution.get("classes") or []
+    sizes = await _file_sizes(classes)
+    totals = dict.fromkeys(COUNTERS, 0)
+    totals["classes"] = len(classes)
+    for cls in classes:
+        cls["stats"] = _class_counts(cls, 0, sizes)
+        for name, value in cls["stats"].items():
+            totals[name] += value
+    institution["stats"] = totals
+    return institution
+
+
+async def reconcile_all():
+    async for institution in educational_institutions_collection.find({}, {"_id": 1}):
+        await reconcile_institution(institution["_id"])
+        # Throttled: reconciliation is a background chore, not a priority
+        await asyncio.sleep(settings.STATS_RECONCILE_PAUSE_SECONDS)
+
+
+async def run_periodic_reconciliation():
+    if settings.STATS_RECONCILE_INTERVAL_SECONDS <= 0:
+        return
+    while True:
+        try:
+            await reconcile_all()
+        except Exception:
+            logger.exception("Stats reconciliation failed")
+        await asyncio.sleep(settings.STATS_RECONCILE_INTERVAL_SECONDS)
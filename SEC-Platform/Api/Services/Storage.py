@@ -0,0 +1,159 @@
+import asyncio
+import gzip
+from datetime import timezone
+from email.utils import format_datetime
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException
+from fastapi.responses import Response, StreamingResponse
+from gridfs.errors import NoFile
+
+from Api.Config import settings
+from Api.Config.db import grid_fs_bucket, grid_fs_chunks_collection, grid_fs_files_collection
+from Api.Services.Compression import accepted_encodings, gzip_decoder, is_compressible
+from Api.Services import FileCache
+
+# Compressible uploads (text, CSV, HTML, SVG, JSON...) are stored gzip-compressed once,
+# at upload time, with `metadata.contentEncoding = "gzip"` and `metadata.originalLength`.
+# Downloads then cost no compression at all: clients that accept gzip get the stored
+# bytes as they are, and the few that don't get them decompressed chunk by chunk.
+# Only gzip is stored: every client accepts it, so one stored variant is enough.
+
+DEFAULT_CONTENT_TYPE = "application/octet-stream"
+
+
+async def store_upload(filename: str, content_type: Optional[str], contents: bytes) -> Tuple[ObjectId, int]:
+    """
+    Store an uploaded file in GridFS, compressed when that pays off.
+
+    Returns the file id and the number of bytes actually stored.
+    """
+    metadata = {"contentType": content_type}
+    data = contents
+    if is_compressible(content_type) and len(contents) >= settings.STORAGE_COMPRESS_MIN_BYTES:
+        compressed = await asyncio.to_thread(gzip.compress, contents, settings.STORAGE_COMPRESS_LEVEL)
+        # Already-compressed content disguised as text is not worth the decompression on download
+        if len(compressed) <= len(contents) * settings.STORAGE_COMPRESS_MAX_RATIO:
+            data = compressed
+            metadata["contentEncoding"] = "gzip"
+            metadata["originalLength"] = len(contents)
+
+    file_id = await grid_fs_bucket.upload_from_stream(filename, data, metadata=metadata)
+    return file_id, len(data)
+
+
+async def delete_files(file_ids: List[ObjectId]) -> int:
+    """
+    Delete several files and their thumbnails with one `delete_many` per collection,
+    instead of one `grid_fs_bucket.delete` (two round trips) per file.
+
+    Chunks go first, so an interrupted call leaves `files` documents behind, which a
+    retry (or the file garbage collector) deletes, rather than chunks nothing points to.
+    Returns the number of files deleted.
+    """
+    if not file_ids:
+        return 0
+    thumbnails = [
+        thumbnail["_id"] async for thumbnail in
+        grid_fs_files_collection.find({"metadata.thumbnail_of": {"$in": file_ids}}, {"_id": 1})
+    ]
+    file_ids = list(file_ids) + thumbnails
+    await grid_fs_chunks_collection.delete_many({"files_id": {"$in": file_ids}})
+    deleted = (await grid_fs_files_collection.delete_many({"_id": {"$in": file_ids}})).deleted_count
+    await FileCache.evict(file_ids)
+    return deleted
+
+
+async def _stream(grid_out):
+    try:
+        async for chunk in grid_out:
+            yield chunk
+    finally:
+        await grid_out.close()
+
+
+async def _stream_decompressed(grid_out):
+    decoder = gzip_decoder()
+    try:
+        async for chunk in grid_out:
+            data = decoder.decompress(chunk)
+            if data:
+                yield data
+        tail = decoder.flush()
+        if tail:
+            yield tail
+    finally:
+        await grid_out.close()
+
+
+async def find_servable(file_id) -> dict:
+    """
+    The GridFS document of a file that may be sent to clients: 404 when it does not exist,
+    403 when the virus scanner blocked it.
+    """
+    file = await grid_fs_files_collection.find_one({"_id": ObjectId(file_id)})
+    if file is None:
+        await FileCache.evict([ObjectId(file_id)])
+        raise HTTPException(status_code=404, detail="File not found in GridFS")
+    if (file.get("metadata") or {}).get("scan") == "infected":
+        raise HTTPException(status_code=403, detail="File blocked by the virus scanner")
+    return file
+
+
+async def open_file_response(
+        file_id,
+        accept_encoding: Optional[str],
+        disposition: Optional[str] = None,
+        range_header: Optional[str] = None,
+        if_range: Optional[str] = None,
+) -> Response:
+    """
+    Send a GridFS file, sending stored gzip bytes as-is to clients that accept gzip.
+
+    Files served as stored come from the local file cache when they are in it, and are put
+    in it on the first download. Uncompressed cached files also answer `Range` requests.
+    With `disposition` (`inline` or `attachment`) a `Content-Disposition` header carries the file name.
+    """
+    file = await find_servable(file_id)
+    metadata = file.get("metadata") or {}
+    headers = {}
+    if disposition is not None:
+        headers["Content-Disposition"] = f'{disposition}; filename="{file["filename"]}"'
+    media_type = metadata.get("contentType") or DEFAULT_CONTENT_TYPE
+
+    stored_gzip = metadata.get("contentEncoding") == "gzip"
+    if stored_gzip:
+        headers["Vary"] = "Accept-Encoding"
+        if "gzip" not in accepted_encodings(accept_encoding):
+            grid_out = await _open(file["_id"])
+            headers["Content-Length"] = str(metadata["originalLength"])
+            return StreamingResponse(_stream_decompressed(grid_out), media_type=media_type, headers=headers)
+        headers["Content-Encoding"] = "gzip"
+
+    # The stored bytes never change, so the file id identifies them
+    headers["ETag"] = f'"{file["_id"]}"'
+    headers["Last-Modified"] = format_datetime(file["uploadDate"].replace(tzinfo=timezone.utc), usegmt=True)
+
+    cached = await FileCache.lookup(file["_id"], file["length"])
+    if cached is not None:
+        # Byte ranges of gzip bytes would not be ranges of the file the client sees
+        if stored_gzip or (if_range is not None and if_range != headers["ETag"]):
+            range_header = None
+        else:
+            headers["Accept-Ranges"] = "bytes"
+        return FileCache.response(file["_id"], cached, media_type, headers, range_header)
+
+    grid_out = await _open(file["_id"])
+    headers["Content-Length"] = str(file["length"])
+    return StreamingResponse(
+        FileCache.fill(file["_id"], file["length"], _stream(grid_out)), media_type=media_type, headers=headers
+    )
+
+
+async def _open(file_id):
+    try:
+        return await grid_fs_bucket.open_download_stream(file_id)
+    except NoFile:
+        # Deleted between reading its `files` document and opening it
+        raise HTTPException(status_code=404, detail="File not found in GridFS")
@@ -0,0 +1,172 @@
+import asyncio
+import io
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from bson import ObjectId
+
+from Api.Config import settings
+from Api.Config.db import grid_fs_bucket, grid_fs_files_collection
+from Api.Services import Jobs
+from Api.Services.SingleFlight import SingleFlight
+from Api.Services.Ids import to_object_id
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional: without it no thumbnails are generated
+    Image = None
+
+try:
+    import pymupdf  # Optional: first-page previews of PDFs
+except ImportError:
+    pymupdf = None
+
+logger = logging.getLogger(__name__)
+
+# A thumbnail is a JPEG stored in the same GridFS bucket as its original, linked by
+# `metadata.thumbnail_of`. Decoding and resizing run in a process pool: they are CPU
+# bound and would otherwise block the event loop (and hold the GIL) for every request.
+
+THUMBNAIL_CONTENT_TYPE = "image/jpeg"
+PDF_CONTENT_TYPE = "application/pdf"
+
+_executor: Optional[ProcessPoolExecutor] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_generating = SingleFlight()
+
+
+def supports(content_type: Optional[str]) -> bool:
+    if Image is None or not content_type:
+        return False
+    if content_type.startswith("image/"):
+        return content_type != "image/svg+xml"
+    return content_type == PDF_CONTENT_TYPE and pymupdf is not None
+
+
+# --- Run in the worker processes ---------------------------------------------------
+
+def _to_jpeg(image, size: int) -> bytes:
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((size, size))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=80, optimize=True)
+    return output.getvalue()
+
+
+def render_image(data: bytes, size: int) -> bytes:
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft("RGB", (size, size))  # JPEG sources are decoded at a reduced scale
+        return _to_jpeg(image, size)
+
+
+def render_pdf(data: bytes, size: int) -> bytes:
+    with pymupdf.open(stream=data, filetype="pdf") as document:
+        page = document[0]
+        zoom = size / max(page.rect.width, page.rect.height)
+        pixmap = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+        return _to_jpeg(Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples), size)
+
+
+# --- Event loop side ---------------------------------------------------------------
+
+def start():
+    global _executor, _semaphore
+    if not settings.THUMBNAILS_ENABLED or Image is None:
+        if Image is None:
+            logger.info("Pillow is not installed, thumbnails are disabled")
+        return
+    _executor = ProcessPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS)
+    # At most one pending render per worker; the rest wait here instead of piling up in the pool
+    _semaphore = asyncio.Semaphore(settings.THUMBNAIL_WORKERS)
+
+
+async def stop():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def find_thumbnail(file_id) -> Optional[dict]:
+    # The oldest one: see `_keep_first`
+    return await grid_fs_files_collection.find_one(
+        {"metadata.thumbnail_of": to_object_id(file_id), "metadata.size": settings.THUMBNAIL_SIZE},
+        sort=[("_id", 1)],
+    )
+
+
+async def generate(file_id) -> Optional[dict]:
+    """
+    Create the thumbnail of a GridFS file, unless it already exists.
+
+    Returns the GridFS document of the thumbnail, or None when the file has no preview.
+    Concurrent calls for the same file in this process share one rendering.
+    """
+    if _executor is None:
+        return None
+    file_id = to_object_id(file_id)
+    return await _generating.do(("thumbnail", file_id, settings.THUMBNAIL_SIZE), lambda: _generate(file_id))
+
+
+async def _generate(file_id: ObjectId) -> Optional[dict]:
+    existing = await find_thumbnail(file_id)
+    if existing is not None:
+        return existing
+
+    original = await grid_fs_files_collection.find_one({"_id": file_id})
+    if original is None:
+        return None
+    metadata = original.get("metadata") or {}
+    content_type = metadata.get("contentType")
+    if not supports(content_type) or original["length"] > settings.THUMBNAIL_MAX_SOURCE_BYTES:
+        return None
+    if metadata.get("scan") == "infected":
+        return None  # Never handed to the image or PDF libraries
+
+    async with _semaphore:
+        grid_out = await grid_fs_bucket.open_download_stream(file_id)
+        try:
+            data = await grid_out.read()
+        finally:
+            await grid_out.close()
+        render = render_pdf if content_type == PDF_CONTENT_TYPE else render_image
+        try:
+            thumbnail = await asyncio.get_running_loop().run_in_executor(
+                _executor, render, data, settings.THUMBNAIL_SIZE
+            )
+        except Exception:
+            logger.warning("Could not render a preview of file %s (%s)", file_id, content_type, exc_info=True)
+            return None
+
+    thumbnail_id = ObjectId()
+    await grid_fs_bucket.upload_from_stream_with_id(
+        thumbnail_id,
+        f"{original['filename']}.thumbnail.jpg",
+        thumbnail,
+        metadata={
+            "contentType": THUMBNAIL_CONTENT_TYPE,
+            "thumbnail_of": file_id,
+            "size": settings.THUMBNAIL_SIZE,
+        },
+    )
+    return await _keep_first(file_id, thumbnail_id)
+
+
+async def _keep_first(file_id: ObjectId, thumbnail_id: ObjectId) -> Optional[dict]:
+    """
+    Another process may have stored a thumbnail of the same file meanwhile: the oldest one
+    stays, the others are deleted by whoever stored them.
+    """
+    first = await find_thumbnail(file_id)
+    if first is not None and first["_id"] != thumbnail_id:
+        await grid_fs_bucket.delete(thumbnail_id)
+    return first
+
+
+@Jobs.handler("thumbnail")
+async def thumbnail_job(job: dict) -> Optional[dict]:
+    thumbnail = await generate(job["payload"]["file_id"])
+    return {"thumbnail_id": thumbnail["_id"]} if thumbnail is not None else None
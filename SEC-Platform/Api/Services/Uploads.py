@@ -0,0 +1,242 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Optional, Tuple
+
+from bson import Binary, ObjectId
+from fastapi import HTTPException
+from pymongo import ReplaceOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from Api.Config import settings
+from Api.Config.db import educational_institutions_collection, grid_fs_chunks_collection, grid_fs_files_collection, \
+    upload_sessions_collection
+from Api.Services import Stats, Changes, Deadlines
+from Api.Services.Ids import to_object_id
+
+logger = logging.getLogger(__name__)
+
+# Resumable uploads write straight into the GridFS collections of the `my-files` bucket.
+# The session id is also the id of the GridFS file, so every chunk written for the
+# session is already a chunk of the final file:
+#
+#   upload_sessions: {_id, institution_id, class_id, resource_id, filename, content_type,
+#                     length, chunk_size, received, status, created_at, expires_at}
+#   my-files.chunks: {files_id: session _id, n, data}
+#
+# `received` only ever grows by whole chunks (or the final, shorter one) and only after
+# those chunks are stored, so it is always a safe offset to resume from. Finalizing
+# inserts the `my-files.files` document, which makes the file visible to GridFS, and
+# attaches it to the resource in a single update.
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _expiry() -> datetime:
+    return _now() + timedelta(seconds=settings.UPLOAD_SESSION_TTL_SECONDS)
+
+
+async def create_session(institution_id, class_id, resource_id, filename: str,
+                         content_type: Optional[str], length: int) -> dict:
+    if length > settings.UPLOAD_MAX_LENGTH:
+        raise HTTPException(status_code=413, detail=f"Files larger than {settings.UPLOAD_MAX_LENGTH} bytes are not accepted")
+    session = {
+        "_id": ObjectId(),
+        "institution_id": to_object_id(institution_id),
+        "class_id": to_object_id(class_id),
+        "resource_id": to_object_id(resource_id),
+        "filename": filename,
+        "content_type": content_type,
+        "length": length,
+        "chunk_size": settings.UPLOAD_CHUNK_SIZE,
+        "received": 0,
+        "status": "open",
+        "created_at": _now(),
+        "expires_at": _expiry(),
+    }
+    await upload_sessions_collection.insert_one(session)
+    return session
+
+
+async def get_session(session_id: str) -> dict:
+    session_object_id = to_object_id(session_id)
+    session = None
+    if session_object_id is not None:
+        session = await upload_sessions_collection.find_one({"_id": session_object_id})
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Upload session {session_id} not found")
+    return session
+
+
+def _conflict(detail: str, received: int) -> HTTPException:
+    return HTTPException(status_code=409, detail=detail, headers={"Upload-Offset": str(received)})
+
+
+async def write_chunks(session_id: str, offset: int, stream: AsyncIterator[bytes]) -> int:
+    """
+    Append the request body at `offset`, which must be the current `received` offset.
+
+    The body is cut into GridFS chunks and flushed every UPLOAD_FLUSH_CHUNKS chunks, so a
+    dropped connection keeps everything flushed before it. Returns the new offset.
+    """
+    with Deadlines.upload_writes():
+        session = await get_session(session_id)
+    if session["status"] != "open":
+        raise _conflict("Upload session is already being finalized", session["received"])
+    if offset != session["received"]:
+        raise _conflict(f"Expected offset {session['received']}", session["received"])
+
+    chunk_size = session["chunk_size"]
+    length = session["length"]
+    position = offset
+    operations = []
+    pending = 0
+
+    async def flush():
+        nonlocal position, operations, pending
+        if not operations:
+            return
+        # Each flush gets its own deadline: the time spent receiving the part is the client's
+        with Deadlines.upload_writes():
+            await grid_fs_chunks_collection.bulk_write(operations, ordered=False)
+            result = await upload_sessions_collection.update_one(
+                {"_id": session["_id"], "received": position, "status": "open"},
+                {"$set": {"received": position + pending, "expires_at": _expiry()}},
+            )
+            if result.matched_count == 0:
+                # Another request for the same offset got there first; its chunks are identical
+                current = await get_session(session_id)
+                raise _conflict("Concurrent upload to the same session", current["received"])
+        position += pending
+        operations = []
+        pending = 0
+
+    def add_chunk(data: bytes):
+        nonlocal pending
+        n = (position + pending) // chunk_size
+        operations.append(ReplaceOne(
+            {"files_id": session["_id"], "n": n},
+            {"files_id": session["_id"], "n": n, "data": Binary(data)},
+            upsert=True,
+        ))
+        pending += len(data)
+
+    buffer = bytearray()
+    async for part in stream:
+        buffer += part
+        if position + pending + len(buffer) > length:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds the declared length of {length} bytes")
+        while len(buffer) >= chunk_size:
+            add_chunk(bytes(buffer[:chunk_size]))
+            del buffer[:chunk_size]
+            if len(operations) >= settings.UPLOAD_FLUSH_CHUNKS:
+                await flush()
+
+    if buffer:
+        if position + pending + len(buffer) != length:
+            await flush()
+            raise HTTPException(
+                status_code=400,
+                detail=f"Only the last part of the file may end off a {chunk_size}-byte boundary",
+                headers={"Upload-Offset": str(position)},
+            )
+        add_chunk(bytes(buffer))
+    await flush()
+    return position
+
+
+async def finalize(session_id: str) -> Tuple[ObjectId, bool]:
+    """
+    Turn a complete session into a GridFS file and attach it to the resource.
+
+    Safe to retry: every step is idempotent, and a finished session answers with its file id.
+    Returns `(file_id, finished)`: `finished` is True only for the one call that marked the
+    session done, so follow-up work (processing jobs, events) runs once per file.
+    """
+    session = await get_session(session_id)
+    if session["status"] == "done":
+        return session["_id"], False
+    session = await upload_sessions_collection.find_one_and_update(
+        {"_id": session["_id"], "status": {"$in": ["open", "finalizing"]}, "$expr": {"$eq": ["$received", "$length"]}},
+        {"$set": {"status": "finalizing"}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if session is None:
+        session = await get_session(session_id)
+        if session["status"] == "done":
+            return session["_id"], False
+        raise _conflict(f"Upload incomplete: {session['received']} of {session['length']} bytes received", session["received"])
+
+    file_id = session["_id"]
+    try:
+        await grid_fs_files_collection.insert_one({
+            "_id": file_id,
+            "length": session["length"],
+            "chunkSize": session["chunk_size"],
+            "uploadDate": _now(),
+            "filename": session["filename"],
+            "metadata": {"contentType": session["content_type"]},
+        })
+    except DuplicateKeyError:
+        pass  # Inserted by a previous attempt
+
+    # `file_ids: {$ne: file_id}` keeps a retried finalize from attaching (and counting) the file twice
+    result = await educational_institutions_collection.update_one(
+        {
+            "_id": session["institution_id"],
+            "classes": {"$elemMatch": {
+                "_id": session["class_id"],
+                "resources": {"$elemMatch": {"_id": session["resource_id"], "file_ids": {"$ne": file_id}}},
+            }},
+        },
+        Changes.stamped({
+            "$push": {"classes.$[class].resources.$[res].file_ids": file_id},
+            "$inc": Stats.inc("classes.$[class]", files=1, bytes=session["length"]),
+        }, "classes.$[class].resources.$[res]"),
+        array_filters=[{"class._id": session["class_id"]}, {"res._id": session["resource_id"]}],
+    )
+    if result.matched_count == 0:
+        attached = await educational_institutions_collection.find_one(
+            {"_id": session["institution_id"], "classes.resources.file_ids": file_id}, {"_id": 1}
+        )
+        if attached is None:
+            await abort(session)
+            raise HTTPException(status_code=404, detail=f"Resource {session['resource_id']} no longer exists")
+
+    # Two concurrent finalize calls can both get here; only one of them moves the session to "done"
+    result = await upload_sessions_collection.update_one({"_id": file_id, "status": "finalizing"}, {"$set": {"status": "done"}})
+    return file_id, result.modified_count == 1
+
+
+async def abort(session: dict):
+    await grid_fs_chunks_collection.delete_many({"files_id": session["_id"]})
+    await grid_fs_files_collection.delete_one({"_id": session["_id"]})
+    await upload_sessions_collection.delete_one({"_id": session["_id"]})
+
+
+async def sweep_expired_sessions() -> int:
+    """
+    Delete expired sessions, and the chunks of the ones that were never finalized.
+    """
+    swept = 0
+    async for session in upload_sessions_collection.find({"expires_at": {"$lt": _now()}}):
+        if session["status"] == "open":
+            await abort(session)
+        else:
+            # Finished (or half-finished, left for the GridFS garbage collector): the file stays
+            await upload_sessions_collection.delete_one({"_id": session["_id"]})
+        swept += 1
+    return swept
+
+
+async def run_periodic_sweep():
+    while True:
+        try:
+            swept = await sweep_expired_sessions()
+            if swept:
+                logger.info("Removed %s expired upload sessions", swept)
+        except Exception:
+            logger.exception("Upload session sweep failed")
+        await asyncio.sleep(settings.UPLOAD_SWEEP_INTERVAL_SECONDS)
@@ -0,0 +1,78 @@
+"""
+Measure what micro-batching saves on a burst of comment appends to the same resources.
+
+Sends the same concurrent bucket-style upserts to a throwaway database twice: one
+`update_one` per comment, then through a BatchWriter, and reports writes per second:
+
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/batch_write_benchmark.py --writes 5000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from Api.Services.BatchWriter import BatchWriter  # noqa: E402
+
+
+def append(resource_id, bucket_size):
+    comment = {"_id": ObjectId(), "user_id": ObjectId(), "content": "Benchmark comment",
+               "created_at": datetime.now(timezone.utc)}
+    return (
+        {"resource_id": resource_id, "count": {"$lt": bucket_size}},
+        {"$push": {"comments": comment}, "$inc": {"count": 1}},
+    )
+
+
+async def run(write, resources, writes, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await write(resources[i % len(resources)])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(writes)))
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writes", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--resources", type=int, default=20)
+    parser.add_argument("--bucket-size", type=int, default=100)
+    parser.add_argument("--delay", type=float, default=0.005)
+    parser.add_argument("--max-batch", type=int, default=500)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    collection = client.sec_benchmark.comment_buckets
+    resources = [ObjectId() for _ in range(args.resources)]
+    writer = BatchWriter(collection, args.delay, args.max_batch)
+
+    async def direct(resource_id):
+        await collection.update_one(*append(resource_id, args.bucket_size), upsert=True)
+
+    async def batched(resource_id):
+        await writer.submit(UpdateOne(*append(resource_id, args.bucket_size), upsert=True))
+
+    for name, write in (("direct", direct), ("batched", batched)):
+        await collection.drop()
+        await collection.create_index([("resource_id", 1), ("count", 1)])
+        elapsed = await run(write, resources, args.writes, args.concurrency)
+        stored = sum([bucket["count"] async for bucket in collection.find({}, {"count": 1})])
+        print(f"{name:>8}: {args.writes / elapsed:9.0f} writes/s, {stored} comments stored")
+
+    await client.drop_database("sec_benchmark")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,101 @@
+"""
+Compare the `2dsphere` nearest-institution query against a full collection scan.
+
+Seeds a throwaway database with random institutions around Lima and times both approaches:
+
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/geo_benchmark.py --institutions 50000
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import GEOSPHERE
+
+EARTH_RADIUS_METERS = 6_371_000
+
+
+def haversine(lng1, lat1, lng2, lat2):
+    lng1, lat1, lng2, lat2 = map(math.radians, (lng1, lat1, lng2, lat2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
+
+
+async def seed(collection, count):
+    await collection.drop()
+    batch = []
+    for i in range(count):
+        batch.append({
+            "name": f"Institution {i}",
+            "address": f"Street {i}",
+            "location": {
+                "type": "Point",
+                "coordinates": [-77.03 + random.uniform(-1, 1), -12.04 + random.uniform(-1, 1)],
+            },
+            # Institutions carry their classes, which is what makes a full scan expensive
+            "classes": [{"name": f"Class {j}", "resources": []} for j in range(5)],
+        })
+        if len(batch) == 1000:
+            await collection.insert_many(batch)
+            batch = []
+    if batch:
+        await collection.insert_many(batch)
+    await collection.create_index([("location", GEOSPHERE)])
+
+
+async def indexed_near(collection, lng, lat, limit):
+    pipeline = [
+        {"$geoNear": {
+            "near": {"type": "Point", "coordinates": [lng, lat]},
+            "distanceField": "distance",
+            "key": "location",
+            "spherical": True,
+        }},
+        {"$limit": limit},
+        {"$project": {"classes": 0}},
+    ]
+    return await collection.aggregate(pipeline).to_list(limit)
+
+
+async def full_scan_near(collection, lng, lat, limit):
+    institutions = await collection.find().to_list(None)
+    for inst in institutions:
+        inst["distance"] = haversine(lng, lat, *inst["location"]["coordinates"])
+    institutions.sort(key=lambda inst: inst["distance"])
+    return institutions[:limit]
+
+
+async def timed(label, fn, collection, queries, limit):
+    start = time.perf_counter()
+    for lng, lat in queries:
+        await fn(collection, lng, lat, limit)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12} {elapsed / len(queries) * 1000:9.2f} ms/query")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--institutions", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    collection = client.SEC_benchmark.educational_institutions
+
+    print(f"Seeding {args.institutions} institutions...")
+    await seed(collection, args.institutions)
+
+    queries = [(-77.03 + random.uniform(-1, 1), -12.04 + random.uniform(-1, 1)) for _ in range(args.queries)]
+    await timed("2dsphere", indexed_near, collection, queries, args.limit)
+    await timed("full scan", full_scan_near, collection, queries, args.limit)
+
+    await client.drop_database("SEC_benchmark")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
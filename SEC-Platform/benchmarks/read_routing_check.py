@@ -0,0 +1,90 @@
+"""
+Show where the reads of each route go: prints the `$readPreference` and the causal
+`afterClusterTime` of every command sent to MongoDB while a few routes are called.
+
+Needs a replica set (on a standalone server every read goes to the one server):
+
+    just mongo-rs                      # single-host replica set on localhost:27018
+    MONGO_URI="mongodb://localhost:27018/?replicaSet=rs0" python benchmarks/read_routing_check.py
+"""
+import asyncio
+import json
+import os
+import sys
+
+from pymongo import monitoring
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+class CommandLog(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.command_name in ("find", "aggregate", "insert", "update", "findAndModify"):
+            preference = event.command.get("$readPreference", {"mode": "primary"})
+            after = (event.command.get("readConcern") or {}).get("afterClusterTime")
+            self.commands.append((event.command_name, preference, after is not None))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+# Registered before the app creates its client
+log = CommandLog()
+monitoring.register(log)
+
+from app import app  # noqa: E402
+
+
+async def call(method: str, path: str, body=None):
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http", "method": method, "path": path, "raw_path": path.encode(), "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"host", b"check")],
+        "client": ("127.0.0.1", 0), "server": ("check", 80), "scheme": "http", "http_version": "1.1",
+        "root_path": "",
+    }
+    response = {}
+
+    async def receive():
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"] = response.get("body", b"") + message.get("body", b"")
+
+    await app(scope, receive, send)
+    return response["status"], json.loads(response.get("body") or b"null")
+
+
+async def main():
+    calls = [
+        ("POST", "/api/v1/educationalInstitutions/", {"name": "Read routing", "address": "-"}),
+        ("GET", "/api/v1/educationalInstitutions/", None),
+        ("GET", "/api/v1/users/", None),
+        ("GET", "/api/v1/educationalInstitutions/near?lng=-74.08&lat=4.6", None),
+    ]
+    created = None
+    for method, path, body in calls:
+        log.commands.clear()
+        status, result = await call(method, path, body)
+        if method == "POST":
+            created = result.get("id")
+        print(f"{method} {path} -> {status}")
+        for name, preference, causal in log.commands:
+            print(f"    {name:14} {json.dumps(preference):60} {'afterClusterTime' if causal else ''}")
+    if created:
+        from Api.Config.db import educational_institutions_collection
+        from bson import ObjectId
+        await educational_institutions_collection.delete_one({"_id": ObjectId(created)})
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+"""
+Measure how request throughput scales with the number of server worker processes.
+
+Starts `serve.py` once per worker count, waits for `/api/v1/health`, then keeps
+`--connections` keep-alive connections busy for `--seconds` from several load
+generator processes and reports requests per second:
+
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/server_benchmark.py --workers 1 2 4
+
+Any GET path can be measured with `--path` (e.g. a class or a listing).
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "SERVER_WORKERS": str(workers),
+        "SERVER_HOST": "127.0.0.1",
+        "SERVER_PORT": str(port),
+        # Measure the server, not the rate limiter or background chores
+        "RATE_LIMITS_ENABLED": "false",
+        "JOBS_IN_APP": "false",
+        "STATS_RECONCILE_INTERVAL_SECONDS": "0",
+    }
+    server = subprocess.Popen([sys.executable, "serve.py"], cwd=ROOT, env=env)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/api/v1/health", timeout=1).read()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError("The server did not start")
+
+
+async def connection(port: int, path: str, until: float) -> int:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    request = f"GET {path} HTTP/1.1\r\nHost: benchmark\r\n\r\n".encode()
+    done = 0
+    while time.monotonic() < until:
+        writer.write(request)
+        headers = await reader.readuntil(b"\r\n\r\n")
+        length = 0
+        for line in headers.split(b"\r\n"):
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":", 1)[1])
+        await reader.readexactly(length)
+        done += 1
+    writer.close()
+    return done
+
+
+def generate_load(port: int, path: str, connections: int, seconds: float, results):
+    async def run():
+        until = time.monotonic() + seconds
+        return sum(await asyncio.gather(*(connection(port, path, until) for _ in range(connections))))
+    results.put(asyncio.run(run()))
+
+
+def measure(port: int, path: str, connections: int, seconds: float, generators: int) -> float:
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=generate_load, args=(port, path, connections // generators, seconds, results))
+        for _ in range(generators)
+    ]
+    for process in processes:
+        process.start()
+    total = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return total / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--path", default="/api/v1/health")
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--generators", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    args = parser.parse_args()
+
+    baseline = None
+    for workers in args.workers:
+        port = free_port()
+        server = start_server(workers, port)
+        try:
+            measure(port, args.path, args.connections, 1, args.generators)  # Warm-up
+            rate = measure(port, args.path, args.connections, args.seconds, args.generators)
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+        baseline = baseline or rate
+        print(f"{workers:3d} workers: {rate:10.0f} req/s  ({rate / baseline:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
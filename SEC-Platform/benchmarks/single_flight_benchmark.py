@@ -0,0 +1,93 @@
+"""
+Measure what single-flight coalescing saves when many clients open the same class at once.
+
+Seeds a throwaway database with one institution, then fires bursts of identical concurrent
+reads of one class, with and without coalescing, counting the `find` commands that reach MongoDB:
+
+    MONGO_URI=mongodb://localhost:27017 python benchmarks/single_flight_benchmark.py --clients 300
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from Api.Services.SingleFlight import SingleFlight  # noqa: E402
+
+
+class FindCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.finds = 0
+
+    def started(self, event):
+        if event.command_name == "find":
+            self.finds += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def seed(collection, resources):
+    await collection.drop()
+    class_id = ObjectId()
+    institution_id = (await collection.insert_one({
+        "name": "Benchmark",
+        "address": "-",
+        "classes": [{
+            "_id": class_id,
+            "name": "Live class",
+            "resources": [{"_id": ObjectId(), "title": f"Resource {i}", "type": "document", "file_ids": []}
+                          for i in range(resources)],
+        }],
+    })).inserted_id
+    await collection.create_index("classes._id")
+    return institution_id, class_id
+
+
+async def burst(read, clients):
+    start = time.perf_counter()
+    await asyncio.gather(*(read() for _ in range(clients)))
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=300)
+    parser.add_argument("--bursts", type=int, default=5)
+    parser.add_argument("--resources", type=int, default=200)
+    args = parser.parse_args()
+
+    counter = FindCounter()
+    client = AsyncIOMotorClient(os.getenv("MONGO_URI", "mongodb://localhost:27017"), event_listeners=[counter])
+    collection = client.sec_benchmark.institutions
+    institution_id, class_id = await seed(collection, args.resources)
+    flights = SingleFlight()
+
+    async def find_class():
+        return await collection.find_one({"_id": institution_id, "classes._id": class_id}, {"classes.$": 1})
+
+    async def shared_class():
+        return await flights.do(("class", institution_id, class_id), find_class)
+
+    for name, read in (("direct", find_class), ("single-flight", shared_class)):
+        counter.finds = 0
+        elapsed = 0
+        for _ in range(args.bursts):
+            elapsed += await burst(read, args.clients)
+        print(f"{name:>14}: {counter.finds:6d} finds for {args.bursts * args.clients} reads, "
+              f"{elapsed / args.bursts * 1000:8.1f} ms per burst")
+
+    await client.drop_database("sec_benchmark")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
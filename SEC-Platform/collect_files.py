@@ -0,0 +1,29 @@
+"""
+Garbage-collect GridFS files that nothing references.
+
+    python collect_files.py --dry-run      # report what would be deleted and how many bytes
+    python collect_files.py                # delete, in throttled batches
+"""
+import argparse
+import asyncio
+import json
+import logging
+
+from Api.Config.db import client
+from Api.Services import FileCollector
+
+
+async def main(dry_run: bool):
+    try:
+        report = await FileCollector.collect(dry_run=dry_run)
+        print(json.dumps(report, indent=2))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true", help="only report the orphaned files")
+    args = parser.parse_args()
+    asyncio.run(main(args.dry_run))
@@ -0,0 +1,67 @@
+"""
+Production entry point: several uvicorn worker processes behind one listening socket.
+
+    python serve.py                        # SERVER_WORKERS processes (one per CPU by default)
+    SERVER_WORKERS=4 python serve.py
+
+`uvicorn app:app --reload` stays the way to develop; it runs one process and a file watcher.
+"""
+import importlib.util
+import logging
+import os
+
+import uvicorn
+
+from Api.Config import settings
+
+logger = logging.getLogger("serve")
+
+
+def worker_count() -> int:
+    return settings.SERVER_WORKERS or os.cpu_count() or 1
+
+
+def event_loop() -> str:
+    # uvloop and httptools are C implementations of the event loop and the HTTP parser;
+    # without them (e.g. on Windows) uvicorn falls back to asyncio and h11
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def http_protocol() -> str:
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+def check_app():
+    """
+    Import the app once in the supervisor, so a broken configuration fails here instead
+    of in every worker. Workers are spawned, not forked, and import it again: the Motor
+    client must be created in the process that uses it.
+    """
+    import app
+    app.client.close()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    check_app()
+    workers = worker_count()
+    logger.info("Starting %s workers (%s, %s)", workers, event_loop(), http_protocol())
+    # SIGTERM: stop accepting, let in-flight requests finish for up to
+    # SERVER_GRACEFUL_SHUTDOWN_SECONDS (open SSE feeds are cut after that), then run
+    # the lifespan shutdown, which stops the job pool and closes Motor
+    uvicorn.run(
+        "app:app",
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=workers,
+        loop=event_loop(),
+        http=http_protocol(),
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEP_ALIVE_SECONDS,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_SHUTDOWN_SECONDS,
+        access_log=settings.SERVER_ACCESS_LOG,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import os
+
 from requests import get, post, put, delete, HTTPError
 
 
@@ -5,19 +7,21 @@ def test_api():
     """
     An automated version of the manual testing I've been doing,
     testing the lifecycle of an inserted document.
+
+    Runs against a live server: `API_URL=http://localhost:8000 pytest test_api.py`.
     """
-    student_root = "http://localhost:8000/students/"
+    user_root = os.getenv("API_URL", "http://localhost:8000") + "/api/v1/users/"
 
     initial_doc = {
-        "course": "Test Course",
+        "name": {"first_name": "Jane", "last_name": "Doe"},
         "email": "jdoe_test@example.com",
-        "gpa": "3.0",
-        "name": "Jane Doe",
+        "password": "securepassword123",
+        "role": "student",
     }
 
     try:
-        # Insert a student
-        response = post(student_root, json=initial_doc)
+        # Insert a user
+        response = post(user_root, json=initial_doc)
         response.raise_for_status()
         doc = response.json()
         inserted_id = doc["id"]
@@ -25,58 +29,56 @@ def test_api():
         print(
             "If the test fails in the middle you may want to manually remove the document."
         )
-        assert doc["course"] == "Test Course"
         assert doc["email"] == "jdoe_test@example.com"
-        assert doc["gpa"] == 3.0
-        assert doc["name"] == "Jane Doe"
+        assert doc["role"] == "student"
+        assert doc["name"]["first_name"] == "Jane"
 
-        # List students and ensure it's present
-        response = get(student_root)
+        # List users and ensure it's present
+        response = get(user_root)
         response.raise_for_status()
-        student_ids = {s["id"] for s in response.json()["students"]}
-        assert inserted_id in student_ids
+        user_ids = {u["id"] for u in response.json()}
+        assert inserted_id in user_ids
 
-        # Get individual student doc
-        response = get(student_root + inserted_id)
+        # Get individual user doc
+        response = get(user_root + inserted_id)
         response.raise_for_status()
         doc = response.json()
         assert doc["id"] == inserted_id
-        assert doc["course"] == "Test Course"
         assert doc["email"] == "jdoe_test@example.com"
-        assert doc["gpa"] == 3.0
-        assert doc["name"] == "Jane Doe"
+        etag = response.headers["ETag"]
 
-        # Update the student doc
+        # Update the user doc, conditionally on the version just read
         response = put(
-            student_root + inserted_id,
+            user_root + inserted_id,
             json={
                 "email": "updated_email@example.com",
             },
+            headers={"If-Match": etag},
         )
         response.raise_for_status()
         doc = response.json()
         assert doc["id"] == inserted_id
-        assert doc["course"] == "Test Course"
         assert doc["email"] == "updated_email@example.com"
-        assert doc["gpa"] == 3.0
-        assert doc["name"] == "Jane Doe"
+        assert doc["role"] == "student"
+
+        # The same precondition again is stale now
+        response = put(user_root + inserted_id, json={"role": "teacher"}, headers={"If-Match": etag})
+        assert response.status_code == 412
 
-        # Get the student doc and check for change
-        response = get(student_root + inserted_id)
+        # Get the user doc and check for change
+        response = get(user_root + inserted_id)
         response.raise_for_status()
         doc = response.json()
         assert doc["id"] == inserted_id
-        assert doc["course"] == "Test Course"
         assert doc["email"] == "updated_email@example.com"
-        assert doc["gpa"] == 3.0
-        assert doc["name"] == "Jane Doe"
+        assert doc["role"] == "student"
 
         # Delete the doc
-        response = delete(student_root + inserted_id)
+        response = delete(user_root + inserted_id)
         response.raise_for_status()
 
         # Get the doc and ensure it's been deleted
-        response = get(student_root + inserted_id)
+        response = get(user_root + inserted_id)
         assert response.status_code == 404
     except HTTPError as he:
         print(he.response.json())
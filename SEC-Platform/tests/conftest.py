@@ -0,0 +1,75 @@
+import asyncio
+import os
+import sys
+from contextlib import asynccontextmanager
+
+import pytest
+
+# The tests run against mongomock: no MongoDB server is needed. The collections of
+# `Api.Config.db` are replaced before any route or service module imports them.
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("FILE_CACHE_ENABLED", "false")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mongomock import filtering
+from mongomock_motor import AsyncMongoMockClient, AsyncMongoMockCollection
+
+import Api.Config.db as db_module
+
+mock_client = AsyncMongoMockClient()
+mock_db = mock_client.SEC
+db_module.client = mock_client
+db_module.db = mock_db
+for name in list(vars(db_module)):
+    if name.endswith("_collection"):
+        setattr(db_module, name, mock_db[getattr(db_module, name).name])
+
+# mongomock does not implement the positional projection `classes.$` used by the class and resource reads
+_find_one = AsyncMongoMockCollection.find_one
+
+
+async def _find_one_positional(self, filter=None, projection=None, *args, **kwargs):
+    if not projection or "classes.$" not in projection:
+        return await _find_one(self, filter, projection, *args, **kwargs)
+    document = await _find_one(self, filter, None, *args, **kwargs)
+    if document is None:
+        return None
+    condition = filter.get("classes", {}).get("$elemMatch", {})
+    for cls in document.get("classes", []):
+        if filtering.filter_applies(condition, cls):
+            return {"_id": document["_id"], "classes": [cls]}
+    return None
+
+
+AsyncMongoMockCollection.find_one = _find_one_positional
+
+
+@pytest.fixture(autouse=True)
+def empty_database():
+    async def drop_all():
+        for name in await mock_db.list_collection_names():
+            await mock_db[name].delete_many({})
+
+    asyncio.run(drop_all())
+    yield
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """
+    The application without its lifespan (indexes, migrations, background tasks), with reads
+    on the only "server" there is.
+    """
+    from fastapi.testclient import TestClient
+    from Api.Services import Reads
+    import app
+
+    @asynccontextmanager
+    async def no_session():
+        yield None
+
+    monkeypatch.setattr(Reads, "causal_session", no_session)
+    monkeypatch.setattr(Reads, "reader", lambda collection: collection)
+    monkeypatch.setattr(Reads, "primary", lambda collection: collection)
+    monkeypatch.setattr(app.app.router, "lifespan_context", None)
+    return TestClient(app.app)
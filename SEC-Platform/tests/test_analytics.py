@@ -0,0 +1,105 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+from Api.Config import settings
+from Api.Config.db import activity_events_collection, activity_hourly_collection, educational_institutions_collection
+from Api.Model.Event import EventModel
+from Api.Services import Analytics
+
+HOUR = datetime(2024, 3, 4, 10, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def unbatched(monkeypatch):
+    monkeypatch.setattr(settings, "ACTIVITY_ENABLED", True)
+    monkeypatch.setattr(settings, "BATCH_WRITES_ENABLED", False)
+
+
+def test_write_events_become_activity():
+    institution_id, class_id, actor_id = ObjectId(), ObjectId(), ObjectId()
+    events = [
+        EventModel(type="comment.created", institution_id=str(institution_id), class_id=str(class_id),
+                   actor_id=str(actor_id), created_at=HOUR),
+        EventModel(type="file.uploaded", institution_id=str(institution_id), class_id=str(class_id),
+                   data={"count": 3}, created_at=HOUR),
+        EventModel(type="class.updated", institution_id=str(institution_id), class_id=str(class_id)),
+        EventModel(type="comment.created", institution_id=str(institution_id)),
+    ]
+    for event in events:
+        asyncio.run(Analytics.record_activity(event))
+
+    activity = asyncio.run(activity_events_collection.find({}, {"_id": 0}).sort("counter", 1).to_list(None))
+    assert [(a["counter"], a["n"], a.get("actor_id")) for a in activity] == [("comments", 1, actor_id), ("uploads", 3, None)]
+    assert activity[0]["class_id"] == class_id
+
+
+def test_the_rollup_resumes_from_the_last_hour_written():
+    assert asyncio.run(Analytics._rollup_start()) is None
+
+    # Dates come back naive, as from a client without `tz_aware`
+    asyncio.run(activity_events_collection.insert_one({"ts": HOUR.replace(minute=42, second=7)}))
+    assert asyncio.run(Analytics._rollup_start()).replace(tzinfo=timezone.utc) == HOUR
+
+    asyncio.run(activity_hourly_collection.insert_many([{"hour": HOUR + timedelta(hours=n)} for n in range(3)]))
+    assert asyncio.run(Analytics._rollup_start()).replace(tzinfo=timezone.utc) == HOUR + timedelta(hours=2)
+
+
+class RecordingCollection:
+    def __init__(self):
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return self
+
+    async def to_list(self, length):
+        return []
+
+
+def test_the_rollup_replaces_whole_buckets(monkeypatch):
+    events, hourly = RecordingCollection(), RecordingCollection()
+    hourly.name = "activity_hourly"
+
+    async def since():
+        return HOUR
+
+    monkeypatch.setattr(Analytics, "_rollup_start", since)
+    monkeypatch.setattr(Analytics, "activity_events_collection", events)
+    monkeypatch.setattr(Analytics, "activity_hourly_collection", hourly)
+    asyncio.run(Analytics.rollup())
+
+    [hours] = events.pipelines
+    assert hours[0]["$match"]["ts"]["$gte"] == HOUR
+    assert hours[-1]["$merge"] == {"into": "activity_hourly", "whenMatched": "replace", "whenNotMatched": "insert"}
+    [days] = hourly.pipelines
+    # Every day that may contain a recomputed hour is recomputed from all its hours
+    assert days[0] == {"$match": {"hour": {"$gte": HOUR - timedelta(days=1)}}}
+    assert days[-1]["$merge"]["into"] == Analytics.activity_daily_collection.name
+
+
+def test_the_activity_route_reads_the_buckets(client):
+    institution_id, math, art = ObjectId(), ObjectId(), ObjectId()
+    asyncio.run(educational_institutions_collection.insert_one({"_id": institution_id, "classes": [{"_id": math}]}))
+    asyncio.run(activity_hourly_collection.insert_many([
+        {"institution_id": institution_id, "class_id": math, "hour": HOUR, "comments": 2, "active_users": 1, "actors": ["x"]},
+        {"institution_id": institution_id, "class_id": art, "hour": HOUR, "uploads": 1},
+        {"institution_id": institution_id, "class_id": math, "hour": HOUR + timedelta(days=2), "comments": 9},
+        {"institution_id": ObjectId(), "class_id": math, "hour": HOUR, "comments": 5},
+    ]))
+    url = f"/api/v1/educationalInstitutions/{institution_id}/activity"
+    window = {"granularity": "hour", "start": "2024-03-04T00:00:00", "end": "2024-03-05T00:00:00"}
+
+    buckets = client.get(url, params=window).json()
+    assert sorted((b["class_id"], b["comments"], b["uploads"]) for b in buckets) == sorted([
+        (str(math), 2, 0), (str(art), 0, 1),
+    ])
+    assert "actors" not in buckets[0]
+
+    only_math = client.get(url, params={**window, "class_id": str(math)}).json()
+    assert [(b["class_id"], b["active_users"]) for b in only_math] == [(str(math), 1)]
+
+    assert client.get(url, params={**window, "start": window["end"]}).status_code == 400
+    assert client.get(url, params={**window, "start": "2024-01-01T00:00:00"}).status_code == 400
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from Api.Config.db import audit_log_collection
+from Api.Services import Audit
+from Api.Services.Audit import AuditBuffer
+
+USER = {
+    "name": {"first_name": "Jane", "last_name": "Doe"},
+    "email": "jdoe@example.com",
+    "password": "secret",
+    "role": "student",
+}
+
+
+def test_a_full_buffer_keeps_the_newest_entries():
+    buffer = AuditBuffer(size=3, batch_size=10)
+    for number in range(5):
+        buffer.append({"n": number})
+    assert len(buffer) == 3
+    assert buffer.dropped == 2
+    assert [entry["n"] for entry in buffer._entries] == [2, 3, 4]
+
+
+def test_a_full_batch_wakes_the_flusher():
+    async def scenario():
+        buffer = AuditBuffer(size=10, batch_size=2)
+        buffer.append({})
+        assert not buffer._ready.is_set()
+        buffer.append({})
+        await asyncio.wait_for(buffer.wait(timeout=3600), timeout=1)
+
+    asyncio.run(scenario())
+
+
+def test_flush_writes_in_batches():
+    buffer = AuditBuffer(size=10, batch_size=2)
+    for number in range(5):
+        buffer.append({"n": number})
+    asyncio.run(buffer.flush())
+    assert len(buffer) == 0
+    assert sorted(entry["n"] for entry in asyncio.run(audit_log_collection.find().to_list(None))) == list(range(5))
+
+
+def test_a_failed_flush_puts_entries_back_as_far_as_there_is_room(monkeypatch):
+    buffer = AuditBuffer(size=4, batch_size=3)
+
+    async def unreachable(batch, ordered):
+        # Two requests finish while the batch is on the wire
+        buffer.append({"n": "late-1"})
+        buffer.append({"n": "late-2"})
+        raise ConnectionError("down")
+
+    monkeypatch.setattr(audit_log_collection, "insert_many", unreachable)
+    for number in range(4):
+        buffer.append({"n": number})
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(buffer.flush())
+    # Only one entry of the batch fits back in front of the three waiting ones
+    assert [entry["n"] for entry in buffer._entries] == [2, 3, "late-1", "late-2"]
+    assert buffer.dropped == 2
+
+
+def test_annotate_only_inside_an_audited_request():
+    async def scenario():
+        Audit.annotate(entity="ignored")
+        entry = {}
+        Audit.begin(entry)
+        Audit.annotate(entity="user", entity_id=None)
+        return entry
+
+    assert asyncio.run(scenario()) == {"entity": "user"}
+
+
+def test_write_requests_are_audited_with_what_the_route_adds(client, monkeypatch):
+    buffer = AuditBuffer(size=10, batch_size=10)
+    monkeypatch.setattr(Audit, "buffer", buffer)
+
+    user_id = client.post("/api/v1/users/", json=USER).json()["id"]
+    client.get(f"/api/v1/users/{user_id}")
+
+    [entry] = buffer._entries
+    assert entry["method"] == "POST"
+    assert entry["path"] == "/api/v1/users/"
+    assert entry["status"] == 201
+    assert entry["entity"] == "user"
+    assert entry["entity_id"] == user_id
+    assert entry["duration_ms"] >= 0
+    assert "ts" in entry
@@ -0,0 +1,129 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from Api.Config import settings
+from Api.Services import BatchWriter as batching
+from Api.Services.BatchWriter import BatchWriter
+
+
+class RecordingCollection:
+    """
+    Records each bulk write; operations whose filter has `fail` raise a write error.
+    """
+
+    full_name = "test.batched"
+
+    def __init__(self):
+        self.batches = []
+
+    async def bulk_write(self, operations, ordered=True):
+        self.batches.append(list(operations))
+        for index, operation in enumerate(operations):
+            if isinstance(operation, UpdateOne) and operation._filter.get("fail"):
+                raise BulkWriteError({"writeErrors": [{"index": index, "errmsg": "failed"}], "upserted": []})
+        upserted = {index: f"upserted-{index}" for index, operation in enumerate(operations)
+                    if isinstance(operation, UpdateOne) and operation._upsert}
+        return SimpleNamespace(upserted_ids=upserted)
+
+
+def test_concurrent_writes_share_one_bulk_write():
+    collection = RecordingCollection()
+
+    async def scenario():
+        writer = BatchWriter(collection, max_delay=0.01, max_batch=100)
+        documents = [{"_id": ObjectId()} for _ in range(5)]
+        ids = await asyncio.gather(*(writer.submit(InsertOne(document)) for document in documents))
+        return documents, ids
+
+    documents, ids = asyncio.run(scenario())
+    assert len(collection.batches) == 1
+    assert ids == [document["_id"] for document in documents]
+
+
+def test_a_full_batch_is_sent_without_waiting():
+    collection = RecordingCollection()
+
+    async def scenario():
+        writer = BatchWriter(collection, max_delay=3600, max_batch=2)
+        await asyncio.wait_for(
+            asyncio.gather(writer.submit(InsertOne({})), writer.submit(InsertOne({}))), timeout=1
+        )
+
+    asyncio.run(scenario())
+    assert [len(batch) for batch in collection.batches] == [2]
+
+
+def test_upserted_ids_reach_their_callers():
+    collection = RecordingCollection()
+
+    async def scenario():
+        writer = BatchWriter(collection, max_delay=0.01, max_batch=100)
+        return await asyncio.gather(
+            writer.submit(UpdateOne({"a": 1}, {"$set": {"b": 1}})),
+            writer.submit(UpdateOne({"a": 2}, {"$set": {"b": 1}}, upsert=True)),
+        )
+
+    assert asyncio.run(scenario()) == [None, "upserted-1"]
+
+
+def test_only_the_failed_operation_gets_the_error():
+    collection = RecordingCollection()
+
+    async def scenario():
+        writer = BatchWriter(collection, max_delay=0.01, max_batch=100)
+        return await asyncio.gather(
+            writer.submit(InsertOne({"_id": 1})),
+            writer.submit(UpdateOne({"fail": True}, {"$set": {"b": 1}})),
+            writer.submit(InsertOne({"_id": 3})),
+            return_exceptions=True,
+        )
+
+    first, failed, after = asyncio.run(scenario())
+    assert first == 1
+    assert isinstance(failed, BulkWriteError)
+    # Skipped by the ordered bulk write, then written in the next batch
+    assert after == 3
+    assert [len(batch) for batch in collection.batches] == [3, 1]
+
+
+def test_other_errors_reach_every_caller_of_the_batch():
+    class Unreachable(RecordingCollection):
+        async def bulk_write(self, operations, ordered=True):
+            raise ConnectionError("down")
+
+    async def scenario():
+        writer = BatchWriter(Unreachable(), max_delay=0.01, max_batch=100)
+        return await asyncio.gather(
+            writer.submit(InsertOne({})), writer.submit(InsertOne({})), return_exceptions=True
+        )
+
+    assert all(isinstance(result, ConnectionError) for result in asyncio.run(scenario()))
+
+
+def test_flush_writes_what_is_still_queued():
+    collection = RecordingCollection()
+
+    async def scenario():
+        writer = BatchWriter(collection, max_delay=3600, max_batch=100)
+        pending = asyncio.ensure_future(writer.submit(InsertOne({"_id": 1})))
+        await asyncio.sleep(0)
+        await writer.flush()
+        return await pending
+
+    assert asyncio.run(scenario()) == 1
+    assert len(collection.batches) == 1
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_submit_returns_the_written_id(monkeypatch, enabled):
+    monkeypatch.setattr(settings, "BATCH_WRITES_ENABLED", enabled)
+    monkeypatch.setattr(batching, "_writers", {})
+    collection = RecordingCollection()
+    result = asyncio.run(batching.submit(collection, UpdateOne({"a": 1}, {"$set": {"b": 1}}, upsert=True)))
+    assert result == "upserted-0"
+    assert len(collection.batches) == 1
@@ -0,0 +1,59 @@
+import asyncio
+import json
+
+from Api.Model.Event import EventModel
+from Api.Services import Broker as feed
+from Api.Services.Broker import Broker
+
+
+def test_a_slow_subscriber_loses_its_oldest_messages():
+    async def scenario():
+        broker = Broker(queue_size=2)
+        with broker.subscribe(["class:1"]) as subscription:
+            for message in ["a", "b", "c"]:
+                broker.fan_out(["class:1"], message)
+            return subscription.dropped, [await subscription.get(0.1) for _ in range(3)]
+
+    assert asyncio.run(scenario()) == (1, ["b", "c", None])
+
+
+def test_fan_out_delivers_once_per_subscriber():
+    async def scenario():
+        broker = Broker()
+        both = broker.subscribe(["class:1", "resource:2"])
+        other = broker.subscribe(["class:3"])
+        broker.fan_out(["class:1", "resource:2"], "event")
+        return both.queue.qsize(), other.queue.qsize()
+
+    assert asyncio.run(scenario()) == (1, 0)
+
+
+def test_closing_removes_empty_topics():
+    async def scenario():
+        broker = Broker()
+        first = broker.subscribe(["class:1"])
+        second = broker.subscribe(["class:1", "class:2"])
+        first.close()
+        assert broker.subscriber_count("class:1") == 1
+        second.close()
+        return broker._topics
+
+    assert asyncio.run(scenario()) == {}
+
+
+def test_events_reach_class_and_resource_subscribers(monkeypatch):
+    async def scenario():
+        broker = Broker()
+        monkeypatch.setattr(feed, "broker", broker)
+        in_class = broker.subscribe([feed.class_topic("c1")])
+        on_resource = broker.subscribe([feed.resource_topic("r1")])
+
+        await feed.publish_to_feed(EventModel(type="comment.created", institution_id="i1", class_id="c1", resource_id="r1"))
+        await feed.publish_to_feed(EventModel(type="institution.updated", institution_id="i1"))
+        return [await in_class.get(0.1), await in_class.get(0.1)], await on_resource.get(0.1)
+
+    class_messages, resource_message = asyncio.run(scenario())
+    assert json.loads(class_messages[0])["type"] == "comment.created"
+    # Institution-wide events have no class topic
+    assert class_messages[1] is None
+    assert resource_message == class_messages[0]
@@ -0,0 +1,99 @@
+import asyncio
+
+from bson import ObjectId
+
+from Api.Config.db import comment_buckets_collection, educational_institutions_collection, jobs_collection
+
+
+def class_with(resources, comments, files, size, file_ids=()):
+    return {"_id": ObjectId(), "name": "Math", "resources": [{"_id": ObjectId(), "file_ids": list(file_ids)}],
+            "stats": {"resources": resources, "comments": comments, "files": files, "bytes": size}}
+
+
+def school(*classes):
+    institution_id = ObjectId()
+    asyncio.run(educational_institutions_collection.insert_one({
+        "_id": institution_id,
+        "name": "School",
+        "stats": {"classes": 2, "resources": 5, "comments": 7, "files": 3, "bytes": 300},
+        "classes": list(classes),
+    }))
+    return institution_id
+
+
+def test_delete_class_subtracts_its_counters_and_queues_cleanup(client):
+    deleted, kept = class_with(2, 3, 1, 100, [ObjectId()]), class_with(3, 4, 2, 200)
+    institution_id = school(deleted, kept)
+
+    response = client.delete(f"/api/v1/educationalInstitutions/{institution_id}/classes/{deleted['_id']}")
+    assert response.status_code == 202
+    assert response.headers["Location"] == f"/api/v1/jobs/{response.json()['id']}"
+
+    institution = asyncio.run(educational_institutions_collection.find_one({"_id": institution_id}))
+    assert [cls["_id"] for cls in institution["classes"]] == [kept["_id"]]
+    assert institution["stats"] == {"classes": 1, "resources": 3, "comments": 4, "files": 2, "bytes": 200}
+    assert asyncio.run(jobs_collection.count_documents({})) == 1
+
+    again = client.delete(f"/api/v1/educationalInstitutions/{institution_id}/classes/{deleted['_id']}")
+    assert again.status_code == 404
+
+
+def test_delete_class_with_nothing_to_cascade_answers_204(client):
+    deleted, kept = class_with(2, 3, 1, 100), class_with(3, 4, 2, 200)
+    institution_id = school(deleted, kept)
+
+    response = client.delete(f"/api/v1/educationalInstitutions/{institution_id}/classes/{deleted['_id']}")
+    assert response.status_code == 204
+    assert asyncio.run(jobs_collection.count_documents({})) == 0
+
+    institution = asyncio.run(educational_institutions_collection.find_one({"_id": institution_id}))
+    assert institution["stats"] == {"classes": 1, "resources": 3, "comments": 4, "files": 2, "bytes": 200}
+
+
+def test_delete_class_reads_again_when_its_counters_change_meanwhile(client, monkeypatch):
+    from Api.Routes import EducationalInstitutionRoutes
+
+    deleted, kept = class_with(2, 3, 1, 100), class_with(3, 4, 2, 200)
+    institution_id = school(deleted, kept)
+    find_one = educational_institutions_collection.find_one
+    reads = []
+
+    async def racing_find_one(*args, **kwargs):
+        found = await find_one(*args, **kwargs)
+        reads.append(1)
+        if len(reads) == 1:
+            # A comment is added to the class right after its counters were read
+            await educational_institutions_collection.update_one(
+                {"_id": institution_id, "classes._id": deleted["_id"]},
+                {"$inc": {"stats.comments": 1, "classes.$.stats.comments": 1}},
+            )
+        return found
+
+    monkeypatch.setattr(EducationalInstitutionRoutes.educational_institutions_collection, "find_one", racing_find_one)
+    response = client.delete(f"/api/v1/educationalInstitutions/{institution_id}/classes/{deleted['_id']}")
+    assert response.status_code == 204
+    assert len(reads) == 2
+
+    institution = asyncio.run(find_one({"_id": institution_id}))
+    assert institution["stats"] == {"classes": 1, "resources": 3, "comments": 4, "files": 2, "bytes": 200}
+
+
+def test_delete_institution_answers_202_with_the_job(client):
+    institution_id = asyncio.run(educational_institutions_collection.insert_one({"name": "School", "classes": []})).inserted_id
+    asyncio.run(comment_buckets_collection.insert_one({"institution_id": institution_id, "comments": []}))
+
+    response = client.delete(f"/api/v1/educationalInstitutions/{institution_id}")
+    assert response.status_code == 202
+    assert response.json()["type"] == "cascade.delete"
+    assert response.headers["Location"] == f"/api/v1/jobs/{response.json()['id']}"
+    assert asyncio.run(jobs_collection.count_documents({})) == 1
+    assert client.delete(f"/api/v1/educationalInstitutions/{institution_id}").status_code == 404
+
+
+def test_delete_institution_with_nothing_to_cascade_answers_204(client):
+    institution_id = asyncio.run(educational_institutions_collection.insert_one({"name": "School", "classes": []})).inserted_id
+
+    response = client.delete(f"/api/v1/educationalInstitutions/{institution_id}")
+    assert response.status_code == 204
+    assert response.content == b""
+    assert asyncio.run(jobs_collection.count_documents({})) == 0
@@ -0,0 +1,131 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+from Api.Config import settings
+from Api.Config.db import changes_collection, educational_institutions_collection
+from Api.Model.Event import EventModel
+from Api.Services import Changes
+from Api.Services.Ids import stringify_ids
+
+
+@pytest.fixture(autouse=True)
+def settled_at_once(monkeypatch):
+    # Entries count as settled right away (the bound is a few seconds in the future)
+    monkeypatch.setattr(settings, "CHANGES_SETTLE_SECONDS", -5)
+
+
+def test_stamp_versions_nested_records_with_object_ids():
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    record = Changes.stamp({"classes": [{"_id": ObjectId(), "resources": [{"_id": "legacy-uuid"}]}]}, now)
+    assert record["version"] == 1 and record["updated_at"] == now
+    assert record["classes"][0]["version"] == 1
+    assert "version" not in record["classes"][0]["resources"][0]
+
+
+def test_stamped_adds_version_and_updated_at_at_the_path():
+    update = Changes.stamped({"$set": {"classes.$[elem].name": "Math"}, "$inc": {"stats.classes": 1}}, "classes.$[elem]")
+    assert update["$set"]["classes.$[elem].name"] == "Math"
+    assert "classes.$[elem].updated_at" in update["$set"]
+    assert update["$inc"] == {"stats.classes": 1, "classes.$[elem].version": 1}
+    assert Changes.stamped({})["$inc"] == {"version": 1}
+
+
+def test_parse_watermark_and_expiry():
+    assert Changes.parse_watermark(None) is None
+    watermark = ObjectId()
+    assert Changes.parse_watermark(str(watermark)) == watermark
+    with pytest.raises(ValueError):
+        Changes.parse_watermark("not-an-id")
+
+    assert not Changes.expired(watermark)
+    old = datetime.now(timezone.utc) - timedelta(seconds=settings.CHANGES_TOMBSTONE_TTL_SECONDS + 60)
+    assert Changes.expired(ObjectId.from_datetime(old))
+
+
+def seed_institution():
+    institution = Changes.stamp({
+        "_id": ObjectId(),
+        "name": "School",
+        "address": "Main St",
+        "classes": [{"_id": ObjectId(), "name": "Math", "resources": [{"_id": ObjectId(), "title": "Notes"}]}],
+    })
+    asyncio.run(educational_institutions_collection.insert_one(institution))
+    event = EventModel(type="institution.created", institution_id=str(institution["_id"]), data=stringify_ids(institution))
+    asyncio.run(Changes.record_event(event))
+    return institution
+
+
+def test_a_created_institution_brings_its_nested_records():
+    institution = seed_institution()
+    changes, _, has_more = asyncio.run(Changes.changes_since(institution["_id"], None, 100))
+
+    assert not has_more
+    assert [(change["entity"], change["version"]) for change in changes] == [
+        ("institution", 1), ("class", 1), ("resource", 1),
+    ]
+    assert changes[0]["data"] == {"name": "School", "address": "Main St"}
+    assert changes[2]["class_id"] == str(institution["classes"][0]["_id"])
+
+
+def test_pages_follow_the_watermark():
+    institution = seed_institution()
+    first, watermark, has_more = asyncio.run(Changes.changes_since(institution["_id"], None, 2))
+    assert has_more and len(first) == 2
+
+    rest, _, has_more = asyncio.run(Changes.changes_since(institution["_id"], watermark, 2))
+    assert not has_more
+    assert [change["entity"] for change in rest] == ["resource"]
+
+
+def test_a_deleted_class_leaves_one_tombstone():
+    institution = seed_institution()
+    # The last entry read; `next` would be the settle bound, which this fixture moves ahead of the deletion
+    watermark = asyncio.run(changes_collection.find().sort("seq", -1).to_list(1))[0]["seq"]
+    class_id = institution["classes"][0]["_id"]
+
+    event = EventModel(type="class.deleted", institution_id=str(institution["_id"]), class_id=str(class_id))
+    asyncio.run(Changes.record_event(event))
+
+    changes, _, _ = asyncio.run(Changes.changes_since(institution["_id"], watermark, 100))
+    assert changes == [{
+        "entity": "class", "id": str(class_id), "institution_id": str(institution["_id"]),
+        "class_id": str(class_id), "resource_id": None, "deleted": True,
+    }]
+    # The tombstone covers the resource, whose entry is gone
+    assert asyncio.run(changes_collection.count_documents({"entity": "resource"})) == 0
+
+
+def test_the_route_rejects_bad_and_expired_watermarks(client):
+    institution = seed_institution()
+    url = f"/api/v1/educationalInstitutions/{institution['_id']}/changes"
+
+    page = client.get(url)
+    assert page.status_code == 200
+    assert len(page.json()["changes"]) == 3
+    assert client.get(url, params={"since": page.json()["next"]}).json()["changes"] == []
+
+    assert client.get(url, params={"since": "nope"}).status_code == 400
+    old = ObjectId.from_datetime(datetime(2000, 1, 1, tzinfo=timezone.utc))
+    assert client.get(url, params={"since": str(old)}).status_code == 410
+
+
+def test_an_upload_to_a_legacy_resource_is_keyed_by_its_object_id():
+    resource_id = ObjectId()
+    institution = {
+        "_id": ObjectId(),
+        "name": "School",
+        "classes": [{"_id": ObjectId(), "name": "Math", "resources": [{"_id": resource_id, "legacy_id": "uuid-1"}]}],
+    }
+    asyncio.run(educational_institutions_collection.insert_one(institution))
+    class_id = institution["classes"][0]["_id"]
+
+    for resource in ("uuid-1", "uuid-gone"):
+        event = EventModel(type="file.uploaded", institution_id=str(institution["_id"]), class_id=str(class_id),
+                           resource_id=resource, data={"count": 1})
+        asyncio.run(Changes.record_event(event))
+
+    entries = asyncio.run(changes_collection.find({}).to_list(None))
+    assert [(e["_id"], e["resource_id"]) for e in entries] == [(f"resource:{resource_id}", resource_id)]
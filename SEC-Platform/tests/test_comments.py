@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from Api.Config import settings
+from Api.Config.db import comment_buckets_collection, educational_institutions_collection
+from Api.Services import Comments
+
+
+@pytest.fixture(autouse=True)
+def small_buckets(monkeypatch):
+    monkeypatch.setattr(settings, "COMMENT_BUCKET_SIZE", 2)
+    monkeypatch.setattr(settings, "BATCH_WRITES_ENABLED", False)
+
+
+def comment(content):
+    return {"_id": ObjectId(), "user_id": ObjectId(), "content": content}
+
+
+def append_all(institution_id, class_id, resource_id, contents):
+    comments = [comment(content) for content in contents]
+
+    async def append():
+        for item in comments:
+            await Comments.append_comment(institution_id, class_id, resource_id, item)
+
+    asyncio.run(append())
+    return comments
+
+
+def contents(comments):
+    return [c["content"] for c in comments]
+
+
+def test_appends_fill_bounded_buckets():
+    institution_id, class_id, resource_id = ObjectId(), ObjectId(), ObjectId()
+    append_all(institution_id, class_id, resource_id, "abcde")
+
+    buckets = asyncio.run(comment_buckets_collection.find({"resource_id": resource_id}).sort("first_id", 1).to_list(None))
+    assert [bucket["count"] for bucket in buckets] == [2, 2, 1]
+    assert [contents(bucket["comments"]) for bucket in buckets] == [["a", "b"], ["c", "d"], ["e"]]
+    assert buckets[0]["first_id"] == buckets[0]["comments"][0]["_id"]
+    assert buckets[0]["last_id"] == buckets[0]["comments"][-1]["_id"]
+    assert buckets[0]["class_id"] == class_id
+    assert [bucket["bucket"] for bucket in buckets] == [0, 1, 2]
+
+
+@pytest.fixture
+def numbered_buckets():
+    asyncio.run(comment_buckets_collection.create_index(
+        [("resource_id", 1), ("bucket", 1)], unique=True, partialFilterExpression={"bucket": {"$exists": True}},
+    ))
+    yield
+    asyncio.run(comment_buckets_collection.drop_indexes())
+
+
+def test_an_append_racing_for_a_full_bucket_opens_the_next_one_only_once(numbered_buckets, monkeypatch):
+    institution_id, class_id, resource_id = ObjectId(), ObjectId(), ObjectId()
+    append_all(institution_id, class_id, resource_id, "ab")
+    newest_bucket, stale = Comments._newest_bucket, [{"bucket": 0, "count": 1}]
+
+    async def newest_bucket_once_stale(resource_id):
+        # Read before a concurrent append filled bucket 0
+        return stale.pop() if stale else await newest_bucket(resource_id)
+
+    monkeypatch.setattr(Comments, "_newest_bucket", newest_bucket_once_stale)
+    append_all(institution_id, class_id, resource_id, "c")
+    monkeypatch.setattr(Comments, "_newest_bucket", newest_bucket)
+    append_all(institution_id, class_id, resource_id, "d")
+
+    buckets = asyncio.run(comment_buckets_collection.find({"resource_id": resource_id}).sort("bucket", 1).to_list(None))
+    assert [(bucket["bucket"], contents(bucket["comments"])) for bucket in buckets] == [(0, ["a", "b"]), (1, ["c", "d"])]
+
+
+def test_pages_read_backwards_from_the_newest_bucket():
+    resource_id = ObjectId()
+    comments = append_all(ObjectId(), ObjectId(), resource_id, "abcde")
+
+    assert contents(asyncio.run(Comments.list_comments(resource_id))) == list("abcde")
+    assert contents(asyncio.run(Comments.list_comments(resource_id, limit=3))) == list("cde")
+    before_d = asyncio.run(Comments.list_comments(resource_id, limit=2, before=comments[3]["_id"]))
+    assert contents(before_d) == list("bc")
+    assert contents(asyncio.run(Comments.list_comments(resource_id, before=comments[3]["_id"]))) == list("abc")
+
+
+def test_migrated_buckets_are_sealed_and_idempotent():
+    institution_id, class_id, resource_id = ObjectId(), ObjectId(), ObjectId()
+    embedded = [comment(content) for content in "abc"]
+
+    for _ in range(2):
+        asyncio.run(Comments.store_embedded_comments(institution_id, class_id, resource_id, embedded))
+    assert asyncio.run(comment_buckets_collection.count_documents({"sealed": True})) == 2
+
+    # New comments never go into a sealed bucket
+    append_all(institution_id, class_id, resource_id, "d")
+    assert asyncio.run(comment_buckets_collection.count_documents({})) == 3
+    assert contents(asyncio.run(Comments.list_comments(resource_id))) == list("abcd")
+
+
+def test_the_route_merges_embedded_comments_during_the_migration(client, monkeypatch):
+    institution_id, class_id, resource_id = ObjectId(), ObjectId(), ObjectId()
+    embedded = {**comment("embedded"), "created_at": None}
+    asyncio.run(educational_institutions_collection.insert_one({
+        "_id": institution_id,
+        "classes": [{"_id": class_id, "name": "Math", "resources": [{"_id": resource_id, "comments": [embedded]}]}],
+    }))
+    append_all(institution_id, class_id, resource_id, ["bucketed"])
+    url = f"/api/v1/educationalInstitutions/{institution_id}/classes/{class_id}/resources/{resource_id}/comments"
+
+    monkeypatch.setattr(Comments, "_embedded_comments_migrated", False)
+    assert contents(client.get(url).json()) == ["embedded", "bucketed"]
+    assert contents(client.get(url, params={"limit": 1}).json()) == ["bucketed"]
+
+    monkeypatch.setattr(Comments, "_embedded_comments_migrated", True)
+    assert contents(client.get(url).json()) == ["bucketed"]
+
+    assert client.get(url.replace(str(resource_id), str(ObjectId()))).status_code == 404
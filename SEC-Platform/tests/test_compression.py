@@ -0,0 +1,90 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from Api.Middleware.CompressionMiddleware import CompressionMiddleware
+from Api.Services import Compression
+from Api.Services.Compression import Encoder, accepted_encodings, choose_encoding, is_compressible
+
+
+@pytest.mark.parametrize("content_type, expected", [
+    ("application/json", True),
+    ("text/html; charset=utf-8", True),
+    ("application/vnd.api+json", True),
+    ("image/svg+xml", True),
+    ("text/event-stream", False),
+    ("image/png", False),
+    ("application/pdf", False),
+    (None, False),
+])
+def test_is_compressible(content_type, expected):
+    assert is_compressible(content_type) is expected
+
+
+def test_accepted_encodings_drops_refused_ones():
+    assert accepted_encodings("gzip;q=1.0, br;q=0, identity") == {"gzip", "identity"}
+    assert accepted_encodings("*") == {"*", "gzip", "br"}
+    assert accepted_encodings(None) == set()
+    assert accepted_encodings("gzip;q=x") == set()
+
+
+def test_choose_encoding_prefers_brotli(monkeypatch):
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("identity") is None
+    if Compression.brotli is not None:
+        assert choose_encoding("gzip, br") == "br"
+    monkeypatch.setattr(Compression, "brotli", None)
+    assert choose_encoding("gzip, br") == "gzip"
+
+
+def test_gzip_encoder_round_trip():
+    encoder = Encoder("gzip")
+    data = encoder.compress(b"a" * 1000) + encoder.flush() + encoder.compress(b"b" * 1000) + encoder.finish()
+    assert gzip.decompress(data) == b"a" * 1000 + b"b" * 1000
+
+
+def compression_client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/large")
+    async def large():
+        return PlainTextResponse("x" * 1000)
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("x")
+
+    @app.get("/stored")
+    async def stored():
+        return Response(gzip.compress(b"x" * 1000), media_type="text/plain", headers={"Content-Encoding": "gzip"})
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for _ in range(3):
+                yield b"y" * 500
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    return TestClient(app)
+
+
+def test_middleware_compresses_only_what_is_worth_it():
+    client = compression_client()
+    headers = {"Accept-Encoding": "gzip"}
+
+    large = client.get("/large", headers=headers)
+    assert large.headers["content-encoding"] == "gzip"
+    assert large.text == "x" * 1000
+    assert "accept-encoding" in large.headers["vary"].lower()
+
+    assert "content-encoding" not in client.get("/small", headers=headers).headers
+    assert client.get("/stored", headers=headers).text == "x" * 1000
+    assert "content-encoding" not in client.get("/large", headers={"Accept-Encoding": "identity"}).headers
+
+    streamed = client.get("/stream", headers=headers)
+    assert streamed.headers["content-encoding"] == "gzip"
+    assert streamed.text == "y" * 1500
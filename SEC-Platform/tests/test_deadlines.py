@@ -0,0 +1,122 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from pymongo import _csot
+from pymongo.errors import ExecutionTimeout, OperationFailure, ServerSelectionTimeoutError
+
+from Api.Middleware.DeadlineMiddleware import DeadlineMiddleware, route_group
+from Api.Services import Storage
+
+DEADLINES = {"feeds": 0, "downloads": 5, "uploads": 5, "reports": 5, "default": 0.1}
+
+
+@pytest.mark.parametrize("method, path, expected", [
+    ("GET", "/api/v1/educationalInstitutions/1/events", "feeds"),
+    ("GET", "/api/v1/files/abc", "downloads"),
+    ("POST", "/api/v1/files/upload", "uploads"),
+    ("PUT", "/api/v1/uploads/abc", "uploads"),
+    ("POST", "/api/v1/uploads/abc/finalize", "default"),
+    ("GET", "/api/v1/users/", "reports"),
+    ("GET", "/api/v1/educationalInstitutions/1/stats", "reports"),
+    ("GET", "/api/v1/users/1", "default"),
+])
+def test_route_group(method, path, expected):
+    assert route_group(method, path) == expected
+
+
+def deadline_client():
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow():
+        await asyncio.sleep(1)
+
+    @app.get("/overloaded")
+    async def overloaded():
+        raise ServerSelectionTimeoutError("no server")
+
+    @app.get("/failing")
+    async def failing():
+        raise OperationFailure("not a timeout")
+
+    @app.get("/remaining")
+    async def remaining():
+        return {"remaining": _csot.remaining()}
+
+    @app.get("/x/events")
+    async def feed():
+        await asyncio.sleep(0.2)
+        return {"remaining": _csot.remaining()}
+
+    @app.put("/uploads/{upload_id}")
+    async def upload(upload_id: str):
+        await asyncio.sleep(0.2)
+        raise ExecutionTimeout("operation exceeded time limit", 50)
+
+    @app.get("/stream")
+    async def stream():
+        async def body():
+            yield b"first,"
+            await asyncio.sleep(0.2)
+            yield b"second"
+
+        return StreamingResponse(body())
+
+    app.add_middleware(DeadlineMiddleware, deadlines=DEADLINES)
+    return TestClient(app)
+
+
+def test_a_request_past_its_deadline_is_504():
+    response = deadline_client().get("/slow")
+    assert response.status_code == 504
+    assert "retry-after" not in response.headers
+
+
+def test_no_server_in_time_is_503_with_retry_after():
+    response = deadline_client().get("/overloaded")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+
+def test_other_database_errors_are_not_mapped():
+    with pytest.raises(OperationFailure):
+        deadline_client().get("/failing")
+
+
+def test_mongodb_calls_get_the_remaining_time():
+    remaining = deadline_client().get("/remaining").json()["remaining"]
+    assert 0 < remaining <= DEADLINES["default"]
+
+
+def test_feeds_have_no_deadline():
+    response = deadline_client().get("/x/events")
+    assert response.status_code == 200
+    assert response.json() == {"remaining": None}
+
+
+def test_uploads_have_no_request_deadline_but_their_timeouts_are_mapped():
+    # Slower than the default deadline, yet it is the write timeout that answers
+    response = deadline_client().put("/uploads/abc")
+    assert response.status_code == 504
+
+
+def test_a_started_response_is_not_cut_by_a_slow_client_or_body():
+    response = deadline_client().get("/stream")
+    assert response.status_code == 200
+    assert response.content == b"first,second"
+
+
+def test_legacy_file_routes_let_timeouts_through(client, monkeypatch):
+    async def timing_out(*args, **kwargs):
+        raise ExecutionTimeout("operation exceeded time limit", 50)
+
+    monkeypatch.setattr(Storage, "store_upload", timing_out)
+    monkeypatch.setattr(Storage, "open_file_response", timing_out)
+
+    upload = client.post("/api/v1/files/upload", files={"file": ("notes.txt", io.BytesIO(b"notes"), "text/plain")})
+    assert upload.status_code == 504
+    assert client.get("/api/v1/files/abc").status_code == 504
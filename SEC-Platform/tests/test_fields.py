@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from Api.Config.db import educational_institutions_collection
+from Api.Model.EducationalInstitution import EducationalInstitutionModel
+from Api.Services import Fields
+
+
+def test_parse_keeps_the_model_order():
+    assert Fields.parse(None, EducationalInstitutionModel) is None
+    assert Fields.parse("address, id,,name", EducationalInstitutionModel) == ("id", "name", "address")
+
+
+@pytest.mark.parametrize("fields", ["name,secret", "", " , "])
+def test_parse_rejects_unknown_or_empty_selections(fields):
+    with pytest.raises(HTTPException) as error:
+        Fields.parse(fields, EducationalInstitutionModel)
+    assert error.value.status_code == 400
+
+
+def test_projection():
+    assert Fields.projection(("id", "name")) == {"_id": 1, "name": 1}
+    assert Fields.projection(("name",)) == {"name": 1, "_id": 0}
+    # Inside an array the parent's `_id` is projected by the positional operator
+    assert Fields.projection(("id", "name"), prefix="classes.") == {"classes._id": 1, "classes.name": 1}
+
+
+def test_subset_model_is_cached_and_keeps_types():
+    subset = Fields.subset_model(EducationalInstitutionModel, ("id", "location"))
+    assert subset is Fields.subset_model(EducationalInstitutionModel, ("id", "location"))
+    assert set(subset.model_fields) == {"id", "location"}
+    instance = subset(_id="abc", location={"coordinates": [1, 2]})
+    assert instance.location.type == "Point"
+
+
+def test_routes_return_only_the_selected_fields(client):
+    institution_id = asyncio.run(educational_institutions_collection.insert_one({
+        "name": "School",
+        "address": "Main St",
+        "version": 2,
+        "classes": [{"_id": "c1", "name": "Math"}],
+    })).inserted_id
+
+    listed = client.get("/api/v1/educationalInstitutions/", params={"fields": "name"})
+    assert listed.status_code == 200
+    assert listed.json() == [{"name": "School"}]
+
+    shown = client.get(f"/api/v1/educationalInstitutions/{institution_id}", params={"fields": "id,address"})
+    assert shown.status_code == 200
+    assert shown.json() == {"id": str(institution_id), "address": "Main St"}
+    assert shown.headers["ETag"] == '"2"'
+
+    assert client.get("/api/v1/educationalInstitutions/", params={"fields": "classes"}).status_code == 400
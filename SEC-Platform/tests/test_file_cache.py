@@ -0,0 +1,114 @@
+import asyncio
+import os
+from typing import Optional
+
+import pytest
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.testclient import TestClient
+
+from Api.Config import settings
+from Api.Services import FileCache
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "FILE_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "FILE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "FILE_CACHE_MAX_FILE_BYTES", 100)
+    monkeypatch.setattr(settings, "FILE_CACHE_MAX_BYTES", 1000)
+    return tmp_path
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("bytes=0-9", (0, 9)),
+    ("bytes=10-", (10, 99)),
+    ("bytes=90-200", (90, 99)),
+    ("bytes=-10", (90, 99)),
+    ("bytes=-500", (0, 99)),
+    ("bytes=0-1,5-6", None),
+    ("items=0-9", None),
+    ("bytes=a-b", None),
+])
+def test_byte_range(header, expected):
+    assert FileCache.byte_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=-0", "bytes=9-3"])
+def test_unsatisfiable_byte_range_is_416(header):
+    with pytest.raises(HTTPException) as error:
+        FileCache.byte_range(header, 100)
+    assert error.value.status_code == 416
+    assert error.value.headers == {"Content-Range": "bytes */100"}
+
+
+async def chunks(*parts):
+    for part in parts:
+        yield part
+
+
+async def drain(stream):
+    return b"".join([chunk async for chunk in stream])
+
+
+def test_fill_publishes_a_complete_copy(cache_dir):
+    assert asyncio.run(drain(FileCache.fill("f1", 6, chunks(b"abc", b"def")))) == b"abcdef"
+    assert (cache_dir / "f1").read_bytes() == b"abcdef"
+    assert asyncio.run(FileCache.lookup("f1", 6)).st_size == 6
+
+
+def test_an_incomplete_stream_leaves_no_copy(cache_dir):
+    async def interrupted():
+        stream = FileCache.fill("f1", 6, chunks(b"abc", b"def"))
+        assert await stream.__anext__() == b"abc"
+        await stream.aclose()
+
+    asyncio.run(interrupted())
+    assert os.listdir(cache_dir) == []
+    assert asyncio.run(FileCache.lookup("f1", 6)) is None
+
+
+def test_lookup_evicts_a_copy_of_the_wrong_size(cache_dir):
+    (cache_dir / "f1").write_bytes(b"abc")
+    assert asyncio.run(FileCache.lookup("f1", 6)) is None
+    assert not (cache_dir / "f1").exists()
+
+
+def test_files_too_large_are_not_cached(cache_dir):
+    data = b"x" * 101
+    assert asyncio.run(drain(FileCache.fill("big", len(data), chunks(data)))) == data
+    assert os.listdir(cache_dir) == []
+
+
+def test_trim_removes_least_recently_used_copies(cache_dir):
+    for index, name in enumerate(["old", "mid", "new"]):
+        path = cache_dir / name
+        path.write_bytes(b"x" * 400)
+        os.utime(path, (index, index))
+
+    asyncio.run(FileCache.trim())
+    # 1200 bytes over a 1000 byte budget: down to 90%, the oldest copy goes
+    assert sorted(os.listdir(cache_dir)) == ["mid", "new"]
+
+
+def test_response_serves_the_requested_range(cache_dir):
+    (cache_dir / "f1").write_bytes(b"0123456789")
+    app = FastAPI()
+
+    @app.get("/files/{file_id}")
+    async def download(file_id: str, range: Optional[str] = Header(None)):
+        stat_result = await FileCache.lookup(file_id, 10)
+        return FileCache.response(file_id, stat_result, "text/plain", {}, range)
+
+    client = TestClient(app)
+    whole = client.get("/files/f1")
+    assert whole.status_code == 200
+    assert whole.content == b"0123456789"
+
+    part = client.get("/files/f1", headers={"Range": "bytes=2-4"})
+    assert part.status_code == 206
+    assert part.content == b"234"
+    assert part.headers["Content-Range"] == "bytes 2-4/10"
+    assert part.headers["Content-Length"] == "3"
+
+    assert client.get("/files/f1", headers={"Range": "bytes=10-"}).status_code == 416
@@ -0,0 +1,83 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from bson import ObjectId
+
+from Api.Config import settings
+from Api.Config.db import educational_institutions_collection, grid_fs_files_collection, upload_sessions_collection
+from Api.Services import FileCollector
+
+
+@pytest.fixture
+def deleted(monkeypatch):
+    deleted = []
+
+    async def delete_files(file_ids):
+        deleted.extend(file_ids)
+        await grid_fs_files_collection.delete_many({"_id": {"$in": file_ids}})
+        return len(file_ids)
+
+    monkeypatch.setattr(FileCollector.Storage, "delete_files", delete_files)
+    monkeypatch.setattr(settings, "FILE_GC_GRACE_SECONDS", 3600)
+    monkeypatch.setattr(settings, "FILE_GC_PAUSE_SECONDS", 0)
+    monkeypatch.setattr(settings, "FILE_GC_BATCH_SIZE", 2)
+    return deleted
+
+
+def stored_file(age_seconds=7200, length=10, **metadata):
+    file_id = ObjectId()
+    asyncio.run(grid_fs_files_collection.insert_one({
+        "_id": file_id,
+        "length": length,
+        "uploadDate": datetime.now(timezone.utc) - timedelta(seconds=age_seconds),
+        "metadata": metadata,
+    }))
+    return file_id
+
+
+def attach(*file_ids):
+    asyncio.run(educational_institutions_collection.insert_one({
+        "classes": [{"resources": [{"file_ids": list(file_ids)}]}],
+    }))
+
+
+def test_only_old_unreferenced_files_are_collected(deleted):
+    attached, legacy_string, recent, orphan = stored_file(), stored_file(), stored_file(age_seconds=60), stored_file()
+    uploading = stored_file()
+    attach(attached, str(legacy_string))
+    asyncio.run(upload_sessions_collection.insert_one({"_id": uploading, "status": "uploading"}))
+    thumbnail_of_attached = stored_file(thumbnail_of=attached)
+    orphan_thumbnail = stored_file(thumbnail_of=ObjectId())
+
+    report = asyncio.run(FileCollector.collect())
+    assert sorted(deleted) == sorted([orphan, orphan_thumbnail])
+    assert report["orphaned"] == 2 and report["deleted"] == 2
+    assert report["reclaimable_bytes"] == 20
+    assert asyncio.run(grid_fs_files_collection.count_documents({"_id": {"$in": [
+        attached, legacy_string, recent, uploading, thumbnail_of_attached,
+    ]}})) == 5
+
+
+def test_dry_run_deletes_nothing(deleted):
+    orphan = stored_file(length=42)
+    report = asyncio.run(FileCollector.collect(dry_run=True))
+    assert report["orphaned"] == 1 and report["reclaimable_bytes"] == 42
+    assert deleted == []
+    assert asyncio.run(grid_fs_files_collection.count_documents({"_id": orphan})) == 1
+
+
+def test_a_file_attached_during_the_sweep_is_kept(deleted, monkeypatch):
+    orphans = [stored_file() for _ in range(3)]
+    mark = FileCollector.referenced_file_ids
+
+    async def attach_after_marking():
+        marked = await mark()
+        # Another request attaches a file between the mark and the sweep
+        await educational_institutions_collection.insert_one({"classes": [{"resources": [{"file_ids": [orphans[0]]}]}]})
+        return marked
+
+    monkeypatch.setattr(FileCollector, "referenced_file_ids", attach_after_marking)
+    report = asyncio.run(FileCollector.collect())
+    assert report["orphaned"] == 3
+    assert sorted(deleted) == sorted(orphans[1:])
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from pydantic import ValidationError
+
+from Api.Config.db import educational_institutions_collection
+from Api.Model.EducationalInstitution import CoordinatesModel, PolygonQueryModel
+from Api.Services import Geo, Reads
+
+RING = [[-77.1, -12.2], [-76.9, -12.2], [-76.9, -11.9], [-77.1, -11.9], [-77.1, -12.2]]
+
+
+class Cursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    async def to_list(self, length):
+        return self.documents
+
+
+class RecordingCollection:
+    """
+    Stands in for the institutions collection: records the geo queries, answers with `documents`.
+    """
+
+    def __init__(self, documents=()):
+        self.documents = list(documents)
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return Cursor(self.documents)
+
+
+@pytest.fixture
+def geo_collection(monkeypatch):
+    collection = RecordingCollection([
+        {"_id": ObjectId(), "name": "School", "address": "Main St",
+         "location": {"type": "Point", "coordinates": [-77.0, -12.0]}, "distance": 1234.5},
+    ])
+    monkeypatch.setattr(Reads, "reader", lambda _: collection)
+    return collection
+
+
+def test_coordinates_are_longitude_then_latitude():
+    assert CoordinatesModel(coordinates=[-77.0, -12.0]).type == "Point"
+    with pytest.raises(ValidationError):
+        CoordinatesModel(coordinates=[-12.0, -177.0])
+    with pytest.raises(ValidationError):
+        CoordinatesModel(coordinates=[1.0])
+
+
+def test_polygon_rings_must_be_closed_and_valid():
+    assert PolygonQueryModel(coordinates=RING, near=[-77.0, -12.0]).near == [-77.0, -12.0]
+    with pytest.raises(ValidationError):
+        PolygonQueryModel(coordinates=RING[:-1] + [[-77.0, -12.2]])
+    with pytest.raises(ValidationError):
+        PolygonQueryModel(coordinates=RING, near=[0.0, 95.0])
+
+
+def test_upgrade_locations_adds_the_geojson_type():
+    legacy = ObjectId()
+    asyncio.run(educational_institutions_collection.insert_many([
+        {"_id": legacy, "location": {"department": "Lima", "coordinates": [-77.0, -12.0]}},
+        {"_id": ObjectId()},
+    ]))
+    asyncio.run(Geo.upgrade_locations())
+    upgraded = asyncio.run(educational_institutions_collection.find_one({"_id": legacy}))
+    assert upgraded["location"] == {"department": "Lima", "coordinates": [-77.0, -12.0], "type": "Point"}
+    assert asyncio.run(educational_institutions_collection.count_documents({"location": {"$exists": True}})) == 1
+
+
+def test_near_pages_after_geo_near_and_leaves_classes_out(geo_collection):
+    asyncio.run(Geo.near(-77.0, -12.0, max_distance=500, skip=20, limit=10))
+    [pipeline] = geo_collection.pipelines
+    assert pipeline[0] == {"$geoNear": {
+        "near": {"type": "Point", "coordinates": [-77.0, -12.0]},
+        "distanceField": "distance",
+        "key": "location",
+        "spherical": True,
+        "maxDistance": 500,
+    }}
+    assert pipeline[1:] == [{"$skip": 20}, {"$limit": 10}, {"$project": {"classes": 0}}]
+
+
+def test_polygon_with_a_point_is_sorted_by_distance(geo_collection):
+    asyncio.run(Geo.within_polygon(RING, near_point=[-77.0, -12.0]))
+    query = geo_collection.pipelines[0][0]["$geoNear"]["query"]
+    assert query == {"location": {"$geoWithin": {"$geometry": {"type": "Polygon", "coordinates": [RING]}}}}
+
+
+def test_near_routes(client, geo_collection):
+    response = client.get("/api/v1/educationalInstitutions/near", params={"lng": -77, "lat": -12, "page": 2, "page_size": 5})
+    assert response.status_code == 200
+    assert response.json()[0]["distance"] == 1234.5
+    assert geo_collection.pipelines[0][1] == {"$skip": 5}
+
+    radius = client.get("/api/v1/educationalInstitutions/within-radius", params={"lng": -77, "lat": -12, "radius": 100})
+    assert radius.status_code == 200
+    assert geo_collection.pipelines[1][0]["$geoNear"]["maxDistance"] == 100
+
+    assert client.get("/api/v1/educationalInstitutions/near", params={"lng": -77, "lat": -95}).status_code == 422
+    open_ring = {"coordinates": RING[:-1] + [[0.0, 0.0]]}
+    assert client.post("/api/v1/educationalInstitutions/within-polygon", json=open_ring).status_code == 422
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from Api.Config.db import educational_institutions_collection
+from Api.Services.Ids import canonicalize_element, class_match, id_condition, stringify_ids, to_object_id
+from Api.Services.Migrations import BatchMigration, NestedIdMigration
+
+
+def test_to_object_id():
+    object_id = ObjectId()
+    assert to_object_id(object_id) is object_id
+    assert to_object_id(str(object_id)) == object_id
+    assert to_object_id(str(object_id).upper()) == object_id
+    assert to_object_id("b6f3d8a4-1c2e-4f7a-9d0b-3e5c7a9b1d2f") is None
+    assert to_object_id("teacher1") is None
+    assert to_object_id(None) is None
+    assert to_object_id(42) is None
+
+
+def test_id_condition_falls_back_to_legacy_ids():
+    object_id = ObjectId()
+    assert id_condition(str(object_id), "classes.") == {"classes._id": object_id}
+    assert id_condition("legacy") == {"$or": [{"legacy_id": "legacy"}, {"id": "legacy"}]}
+    assert class_match(object_id) == {"classes": {"$elemMatch": {"_id": object_id}}}
+
+
+def test_canonicalize_element():
+    teacher_id = ObjectId()
+    element = {"id": "b6f3d8a4", "teacher_id": str(teacher_id), "file_ids": [str(teacher_id), "legacy"]}
+    assert canonicalize_element(element)
+    assert isinstance(element["_id"], ObjectId)
+    assert element["legacy_id"] == "b6f3d8a4"
+    assert "id" not in element
+    assert element["teacher_id"] == teacher_id
+    assert element["file_ids"] == [teacher_id, "legacy"]
+    assert not canonicalize_element(element)
+
+
+def test_stringify_ids():
+    object_id = ObjectId()
+    assert stringify_ids({"_id": object_id, "classes": [{"_id": object_id, "name": "Math"}]}) == {
+        "id": str(object_id), "classes": [{"id": str(object_id), "name": "Math"}]
+    }
+
+
+def test_nested_id_migration_skips_strings_that_are_not_object_ids():
+    convertible = ObjectId()
+
+    async def main():
+        await educational_institutions_collection.insert_many([
+            {"_id": convertible, "classes": [{"_id": ObjectId(), "teacher_id": str(ObjectId())}]},
+            {"classes": [{"_id": ObjectId(), "teacher_id": "teacher1",
+                          "resources": [{"_id": ObjectId(), "file_ids": ["legacy.pdf"]}]}]},
+        ])
+        matched = [document["_id"] async for document in educational_institutions_collection.find(NestedIdMigration.query)]
+        await NestedIdMigration(pause_seconds=0).run()
+        remaining = await educational_institutions_collection.count_documents(NestedIdMigration.query)
+        migrated = await educational_institutions_collection.find_one({"_id": convertible})
+        return matched, remaining, migrated
+
+    matched, remaining, migrated = asyncio.run(main())
+    assert matched == [convertible]
+    assert remaining == 0
+    assert isinstance(migrated["classes"][0]["teacher_id"], ObjectId)
+
+
+def test_nested_id_migration_finds_every_reference_stored_as_a_string():
+    def hex_id():
+        return str(ObjectId())
+
+    documents = [
+        {"_id": ObjectId(), "classes": [{"_id": ObjectId(), "student_ids": [ObjectId(), hex_id()]}]},
+        {"_id": ObjectId(), "classes": [{"_id": ObjectId(), "comments": [{"_id": ObjectId(), "author_id": hex_id()}]}]},
+        {"_id": ObjectId(), "classes": [{"_id": ObjectId(), "comments": [{"_id": ObjectId(), "user_id": hex_id()}]}]},
+        {"_id": ObjectId(), "classes": [{"_id": ObjectId(), "resources": [
+            {"_id": ObjectId(), "comments": [{"_id": ObjectId(), "author_id": hex_id()}]},
+        ]}]},
+        {"_id": ObjectId(), "classes": [{"_id": ObjectId(), "resources": [
+            {"_id": ObjectId(), "comments": [{"_id": ObjectId(), "user_id": hex_id()}]},
+        ]}]},
+    ]
+
+    async def main():
+        await educational_institutions_collection.insert_many(documents)
+        matched = await educational_institutions_collection.count_documents(NestedIdMigration.query)
+        await NestedIdMigration(pause_seconds=0).run()
+        return matched, await educational_institutions_collection.count_documents(NestedIdMigration.query)
+
+    assert asyncio.run(main()) == (len(documents), 0)
+
+
+def test_batch_migrations_must_define_transform():
+    class Incomplete(BatchMigration):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
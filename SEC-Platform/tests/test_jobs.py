@@ -0,0 +1,120 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from Api.Config import settings
+from Api.Config.db import jobs_collection
+from Api.Services import Jobs
+
+
+@pytest.fixture(autouse=True)
+def handlers(monkeypatch):
+    monkeypatch.setattr(Jobs, "_handlers", {})
+    monkeypatch.setattr(settings, "JOB_BACKOFF_SECONDS", 10)
+    monkeypatch.setattr(settings, "JOB_BACKOFF_MAX_SECONDS", 60)
+
+
+def stored(job_id):
+    return asyncio.run(jobs_collection.find_one({"_id": job_id}))
+
+
+def claim_and_run():
+    async def scenario():
+        job = await Jobs.claim("worker-1")
+        await Jobs.run_job(job)
+        return job
+
+    return asyncio.run(scenario())
+
+
+def test_backoff_doubles_up_to_the_maximum():
+    for attempts, ceiling in [(1, 10), (2, 20), (3, 40), (4, 60), (10, 60)]:
+        assert ceiling / 2 <= Jobs.backoff_seconds(attempts) <= ceiling
+
+
+def test_a_job_runs_once_and_stores_its_result():
+    @Jobs.handler("echo")
+    async def echo(job):
+        return {"echo": job["payload"]["value"]}
+
+    job_id = asyncio.run(Jobs.enqueue("echo", {"value": 1}))
+    claim_and_run()
+
+    job = stored(job_id)
+    assert job["status"] == "done"
+    assert job["attempts"] == 1
+    assert job["result"] == {"echo": 1}
+    assert asyncio.run(Jobs.claim("worker-2")) is None
+
+
+def test_claim_skips_delayed_jobs_and_types_without_a_handler():
+    @Jobs.handler("known")
+    async def known(job):
+        return None
+
+    asyncio.run(Jobs.enqueue("unknown", {}))
+    asyncio.run(Jobs.enqueue("known", {}, delay=3600))
+    assert asyncio.run(Jobs.claim("worker-1")) is None
+
+
+def test_a_failing_job_is_retried_later_then_fails_for_good():
+    @Jobs.handler("broken")
+    async def broken(job):
+        raise RuntimeError("boom")
+
+    job_id = asyncio.run(Jobs.enqueue("broken", {}, max_attempts=2))
+    claim_and_run()
+    job = stored(job_id)
+    assert job["status"] == "queued"
+    assert job["last_error"] == "RuntimeError('boom')"
+    assert job["run_at"] - job["updated_at"] >= timedelta(seconds=5)
+
+    asyncio.run(jobs_collection.update_one({"_id": job_id}, {"$set": {"run_at": job["created_at"]}}))
+    claim_and_run()
+    job = stored(job_id)
+    assert job["status"] == "failed"
+    assert job["attempts"] == 2
+
+
+def test_a_job_whose_worker_died_is_claimed_again():
+    @Jobs.handler("slow")
+    async def slow(job):
+        return None
+
+    job_id = asyncio.run(Jobs.enqueue("slow", {}))
+    first = asyncio.run(Jobs.claim("worker-1"))
+    assert asyncio.run(Jobs.claim("worker-2")) is None
+
+    asyncio.run(jobs_collection.update_one({"_id": job_id}, {"$set": {"locked_until": first["created_at"]}}))
+    second = asyncio.run(Jobs.claim("worker-2"))
+    assert second["worker"] == "worker-2"
+    assert second["attempts"] == 2
+
+    # The first worker's late outcome is discarded
+    asyncio.run(Jobs._finish(first, {"$set": {"status": "done"}}))
+    assert stored(job_id)["status"] == "running"
+
+
+def test_a_cancelled_job_goes_back_to_the_queue():
+    started = asyncio.Event()
+
+    @Jobs.handler("stuck")
+    async def stuck(job):
+        started.set()
+        await asyncio.sleep(3600)
+
+    job_id = asyncio.run(Jobs.enqueue("stuck", {}))
+
+    async def scenario():
+        job = await Jobs.claim("worker-1")
+        task = asyncio.create_task(Jobs.run_job(job))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    job = stored(job_id)
+    assert job["status"] == "queued"
+    assert job["attempts"] == 0
@@ -0,0 +1,58 @@
+import asyncio
+
+from bson import ObjectId
+
+from Api.Config.db import educational_institutions_collection, users_collection
+
+USER = {
+    "name": {"first_name": "Jane", "last_name": "Doe"},
+    "email": "jdoe@example.com",
+    "password": "secret",
+    "role": "teacher",
+}
+
+
+def seed():
+    user_id = asyncio.run(users_collection.insert_one(dict(USER))).inserted_id
+    other = ObjectId()
+    asyncio.run(educational_institutions_collection.insert_many([
+        {"_id": ObjectId(), "name": "B School", "classes": [
+            {"_id": ObjectId(), "name": "Physics", "teacher_id": user_id, "student_ids": []},
+            {"_id": ObjectId(), "name": "Art", "teacher_id": other, "student_ids": [user_id, other]},
+            {"_id": ObjectId(), "name": "History", "teacher_id": other, "student_ids": [other],
+             "resources": [{"title": "never sent"}]},
+        ]},
+        {"_id": ObjectId(), "name": "A School", "classes": [
+            {"_id": ObjectId(), "name": "Math", "teacher_id": user_id},
+        ]},
+        {"_id": ObjectId(), "name": "C School", "classes": [
+            {"_id": ObjectId(), "name": "Music", "teacher_id": other},
+        ]},
+    ]))
+    return user_id
+
+
+def test_lists_classes_across_institutions_in_order(client):
+    user_id = seed()
+    response = client.get(f"/api/v1/users/{user_id}/classes")
+    assert response.status_code == 200
+    classes = response.json()
+    assert [(c["institution_name"], c["name"], c["role"]) for c in classes] == [
+        ("A School", "Math", "teacher"),
+        ("B School", "Art", "student"),
+        ("B School", "Physics", "teacher"),
+    ]
+    assert set(classes[0]) == {"id", "name", "teacher_id", "role", "institution_id", "institution_name"}
+
+
+def test_filters_by_role_and_pages(client):
+    user_id = seed()
+    students = client.get(f"/api/v1/users/{user_id}/classes", params={"role": "student"}).json()
+    assert [c["name"] for c in students] == ["Art"]
+
+    second_page = client.get(f"/api/v1/users/{user_id}/classes", params={"page": 2, "page_size": 2}).json()
+    assert [c["name"] for c in second_page] == ["Physics"]
+
+
+def test_unknown_user_is_404(client):
+    assert client.get(f"/api/v1/users/{ObjectId()}/classes").status_code == 404
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from Api.Config.db import users_collection
+from Api.Services import Preconditions
+
+USER = {
+    "name": {"first_name": "Jane", "last_name": "Doe"},
+    "email": "jdoe@example.com",
+    "password": "secret",
+    "role": "student",
+}
+
+
+def test_version_and_etag():
+    assert Preconditions.version_of({"version": 3}) == 3
+    assert Preconditions.version_of({}) == 0
+    assert Preconditions.etag({"version": 3}) == '"3"'
+    assert Preconditions.etag({}) == '"0"'
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("*", None),
+    (' * ', None),
+    ('"3"', [3]),
+    ('"3", "4"', [3, 4]),
+    ('W/"3"', []),
+    ('"abc"', []),
+    ('""', []),
+    ('"3", W/"4", "x"', [3]),
+])
+def test_expected_versions(header, expected):
+    assert Preconditions.expected_versions(header) == expected
+
+
+def test_version_condition():
+    assert Preconditions.version_condition(None) == {}
+    assert Preconditions.version_condition([]) == {"version": {"$in": []}}
+    assert Preconditions.version_condition([2], prefix="classes.") == {"classes.version": {"$in": [2]}}
+    # Version 0 also stands for records written before versions existed
+    assert Preconditions.version_condition([0]) == {"version": {"$in": [0, None]}}
+
+
+def test_precondition_failed_carries_the_current_etag():
+    error = Preconditions.precondition_failed({"version": 5})
+    assert isinstance(error, HTTPException)
+    assert error.status_code == 412
+    assert error.headers == {"ETag": '"5"'}
+
+
+def test_update_with_the_current_etag(client):
+    user_id = client.post("/api/v1/users/", json=USER).json()["id"]
+    etag = client.get(f"/api/v1/users/{user_id}").headers["ETag"]
+    assert etag == '"1"'
+
+    updated = client.put(f"/api/v1/users/{user_id}", json={"role": "teacher"}, headers={"If-Match": etag})
+    assert updated.status_code == 200
+    assert updated.headers["ETag"] == '"2"'
+    assert updated.json()["role"] == "teacher"
+
+
+def test_stale_etag_is_412_and_writes_nothing(client):
+    user_id = client.post("/api/v1/users/", json=USER).json()["id"]
+    client.put(f"/api/v1/users/{user_id}", json={"role": "teacher"})
+
+    stale = client.put(f"/api/v1/users/{user_id}", json={"role": "parent"}, headers={"If-Match": '"1"'})
+    assert stale.status_code == 412
+    assert stale.headers["ETag"] == '"2"'
+    assert client.get(f"/api/v1/users/{user_id}").json()["role"] == "teacher"
+
+
+def test_weak_etag_never_matches(client):
+    user_id = client.post("/api/v1/users/", json=USER).json()["id"]
+    response = client.put(f"/api/v1/users/{user_id}", json={"role": "teacher"}, headers={"If-Match": 'W/"1"'})
+    assert response.status_code == 412
+
+
+def test_records_without_version_match_etag_zero(client):
+    user_id = asyncio.run(users_collection.insert_one(dict(USER))).inserted_id
+    assert client.get(f"/api/v1/users/{user_id}").headers["ETag"] == '"0"'
+
+    updated = client.put(f"/api/v1/users/{user_id}", json={"role": "teacher"}, headers={"If-Match": '"0"'})
+    assert updated.status_code == 200
+    assert updated.headers["ETag"] == '"1"'
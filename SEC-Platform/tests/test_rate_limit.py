@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+
+from Api.Config import settings
+from Api.Middleware.RateLimitMiddleware import RateLimitMiddleware, TokenBucket, route_group
+
+
+@pytest.mark.parametrize("method, path, expected", [
+    ("POST", "/api/v1/auth/login", "auth"),
+    ("POST", "/api/v1/files/upload", "uploads"),
+    ("PUT", "/api/v1/uploads/abc", "uploads"),
+    ("GET", "/api/v1/users/", "lists"),
+    ("GET", "/api/v1/educationalInstitutions/1/classes", "lists"),
+    ("GET", "/api/v1/educationalInstitutions/near", "search"),
+    ("POST", "/api/v1/educationalInstitutions/within-polygon", "search"),
+    ("DELETE", "/api/v1/users/1", "writes"),
+    ("GET", "/api/v1/users/1", "default"),
+])
+def test_route_group(method, path, expected):
+    assert route_group(method, path) == expected
+
+
+def test_token_bucket_spends_its_burst_then_refills():
+    bucket = TokenBucket(burst=2, now=0)
+    assert bucket.take(rate=1, burst=2, now=0) == 0
+    assert bucket.take(rate=1, burst=2, now=0) == 0
+    assert bucket.take(rate=1, burst=2, now=0) == pytest.approx(1)
+    assert bucket.take(rate=1, burst=2, now=0.5) == pytest.approx(0.5)
+    assert bucket.take(rate=1, burst=2, now=1) == 0
+
+
+def test_token_bucket_never_exceeds_its_burst():
+    bucket = TokenBucket(burst=2, now=0)
+    for _ in range(2):
+        assert bucket.take(rate=1, burst=2, now=100) == 0
+    assert bucket.take(rate=1, burst=2, now=100) > 0
+
+
+def limited_app(**kwargs):
+    app = FastAPI()
+
+    @app.get("/api/v1/users/{id}")
+    async def show(id: str):
+        return PlainTextResponse(id)
+
+    app.add_middleware(RateLimitMiddleware, **kwargs)
+    return app
+
+
+def test_rejects_with_retry_after_once_the_burst_is_spent():
+    client = TestClient(limited_app(limits={"default": (0.5, 2)}))
+    assert client.get("/api/v1/users/1").status_code == 200
+    assert client.get("/api/v1/users/1").status_code == 200
+
+    response = client.get("/api/v1/users/1")
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "2"
+
+
+def test_default_limits_let_a_school_behind_one_address_start_its_classes():
+    # Three classes of 40 logging in and opening their class list at once, all from the school's NAT
+    middleware = RateLimitMiddleware(None, limits=settings.RATE_LIMITS)
+    for group in ("auth", "lists"):
+        assert all(middleware.check("school", group) == 0 for _ in range(120))
+
+
+def test_clients_behind_a_trusted_proxy_get_their_own_bucket():
+    client = TestClient(limited_app(limits={"default": (0.5, 1)}, trust_forwarded_for=True))
+    assert client.get("/api/v1/users/1", headers={"X-Forwarded-For": "10.0.0.1"}).status_code == 200
+    assert client.get("/api/v1/users/1", headers={"X-Forwarded-For": "10.0.0.2, 10.0.0.9"}).status_code == 200
+    assert client.get("/api/v1/users/1", headers={"X-Forwarded-For": "10.0.0.1"}).status_code == 429
+
+
+def test_prune_drops_only_full_buckets():
+    middleware = RateLimitMiddleware(None, limits={"default": (1, 1)}, max_buckets=2)
+    middleware.check("a", "default")
+    middleware.check("b", "default")
+    for bucket in middleware._buckets.values():
+        bucket.updated -= 10
+    middleware.check("c", "default")
+    assert set(middleware._buckets) == {("c", "default")}
+
+
+class Held:
+    """
+    An ASGI app whose requests stay inside until `release` is set.
+    """
+
+    def __init__(self):
+        self.inside = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self, scope, receive, send):
+        self.inside += 1
+        await self.release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+
+def request(method, path):
+    return {"type": "http", "method": method, "path": path, "headers": [], "client": (path, 0)}
+
+
+async def call(middleware, scope):
+    statuses = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    await middleware(scope, None, send)
+    return statuses[0]
+
+
+def test_admission_slots_are_per_group():
+    async def scenario():
+        held = Held()
+        middleware = RateLimitMiddleware(
+            held, limits={"default": (1000, 1000)}, max_concurrent=1, queue_seconds=0.05,
+        )
+        upload = asyncio.create_task(call(middleware, request("PUT", "/api/v1/uploads/1")))
+        listing = asyncio.create_task(call(middleware, request("GET", "/api/v1/users/")))
+        await asyncio.sleep(0.01)
+        # Both hold the only slot of their own group
+        assert held.inside == 2
+
+        # A second upload finds no free upload slot within queue_seconds
+        assert await call(middleware, request("PUT", "/api/v1/uploads/2")) == 429
+
+        held.release.set()
+        assert await upload == 200
+        assert await listing == 200
+        assert await call(middleware, request("PUT", "/api/v1/uploads/3")) == 200
+
+    asyncio.run(scenario())
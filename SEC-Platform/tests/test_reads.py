@@ -0,0 +1,63 @@
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+from Api.Services import Reads
+
+
+class OptionsCollection:
+    """
+    Records the collection handles created with another read preference.
+    """
+
+    full_name = "test.reads"
+
+    def __init__(self):
+        self.created = []
+
+    def with_options(self, read_preference):
+        self.created.append(read_preference)
+        return ("handle", read_preference.name)
+
+
+@pytest.fixture(autouse=True)
+def fresh_handles(monkeypatch):
+    monkeypatch.setattr(Reads, "_handles", {})
+
+
+def test_read_preference():
+    assert Reads.read_preference("primary") == Primary()
+    preference = Reads.read_preference("secondaryPreferred", 90)
+    assert preference == SecondaryPreferred(max_staleness=90)
+    with pytest.raises(ValueError):
+        Reads.read_preference("secondaryOnly")
+
+
+def test_only_reporting_routes_read_from_secondaries(monkeypatch):
+    collection = OptionsCollection()
+    monkeypatch.setattr(Reads, "reporting_preference", SecondaryPreferred(max_staleness=90))
+    app = FastAPI()
+
+    @app.get("/report", dependencies=[Depends(Reads.reporting)])
+    async def report():
+        return {"handle": Reads.reader(collection)}
+
+    @app.get("/live")
+    async def live():
+        return {"handle": Reads.reader(collection) is collection}
+
+    client = TestClient(app)
+    assert client.get("/report").json() == {"handle": ["handle", "SecondaryPreferred"]}
+    # The preference of one request does not leak into the next
+    assert client.get("/live").json() == {"handle": True}
+    assert client.get("/report").json() == {"handle": ["handle", "SecondaryPreferred"]}
+    # One handle per collection and preference, created once
+    assert collection.created == [SecondaryPreferred(max_staleness=90)]
+
+
+def test_primary_reads():
+    collection = OptionsCollection()
+    assert Reads.primary(collection) == ("handle", "Primary")
+    assert Reads.primary(collection) == ("handle", "Primary")
+    assert collection.created == [Primary()]
@@ -0,0 +1,25 @@
+import pytest
+
+from Api.Middleware import DeadlineMiddleware, RateLimitMiddleware
+from Api.Services import RouteGroups
+
+
+@pytest.mark.parametrize("method, path, kind", [
+    ("POST", "/api/v1/auth/login", "auth"),
+    ("GET", "/api/v1/educationalInstitutions/abc/events", "feed"),
+    ("GET", "/api/v1/files/abc", "download"),
+    ("PUT", "/api/v1/uploads/abc", "upload"),
+    ("POST", "/api/v1/uploads", "upload-session"),
+    ("GET", "/api/v1/educational-institutions", "list"),
+    ("POST", "/api/v1/educationalInstitutions/within-polygon", "search"),
+    ("GET", "/api/v1/educationalInstitutions/abc/stats", "report"),
+    ("POST", "/api/v1/uploads/abc/finalize", None),
+    ("DELETE", "/api/v1/files/abc", None),
+])
+def test_classify(method, path, kind):
+    assert RouteGroups.classify(method, path) == kind
+
+
+def test_every_kind_has_a_group_in_some_middleware():
+    kinds = {kind for _, _, kind in RouteGroups.ROUTES}
+    assert kinds == set(RateLimitMiddleware.GROUPS) | set(DeadlineMiddleware.GROUPS)
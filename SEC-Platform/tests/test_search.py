@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from Api.Config import settings
+from Api.Config.db import comment_buckets_collection, educational_institutions_collection, migrations_collection, \
+    search_entries_collection
+from Api.Services import Reads, Search
+
+
+class RecordingCursor:
+    """
+    Stands in for a `$text` query, which mongomock cannot run: records how it was built.
+    """
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.calls = []
+
+    def find(self, *args):
+        self.calls.append(("find", args))
+        return self
+
+    def sort(self, *args):
+        self.calls.append(("sort", args))
+        return self
+
+    def skip(self, count):
+        self.calls.append(("skip", count))
+        return self
+
+    def limit(self, count):
+        self.calls.append(("limit", count))
+        return self
+
+    async def to_list(self, length):
+        return self.documents[:length]
+
+
+def entries(count, institution_id, class_id):
+    return [{"_id": ObjectId(), "kind": "resource", "institution_id": institution_id, "class_id": class_id,
+             "resource_id": ObjectId(), "title": f"Notes {n}", "score": 1.0} for n in range(count)]
+
+
+@pytest.fixture
+def text_search(monkeypatch):
+    def answer(documents):
+        cursor = RecordingCursor(documents)
+        monkeypatch.setattr(Reads, "reader", lambda _: cursor)
+        return cursor
+
+    return answer
+
+
+def test_index_entries_are_flat_and_scoped_to_the_institution(monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_WRITES_ENABLED", False)
+    institution_id, class_id = ObjectId(), ObjectId()
+    resource = {"_id": ObjectId(), "title": "Algebra", "description": "Chapter 1"}
+    comment = {"_id": ObjectId(), "content": "Thanks"}
+
+    asyncio.run(Search.index_resource(str(institution_id), str(class_id), resource))
+    asyncio.run(Search.index_comment(institution_id, class_id, resource["_id"], comment))
+    asyncio.run(Search.index_resource(institution_id, class_id, {**resource, "title": "Algebra I"}))
+
+    stored = {entry["kind"]: entry for entry in asyncio.run(search_entries_collection.find().to_list(None))}
+    assert stored["resource"]["title"] == "Algebra I"
+    assert stored["resource"]["institution_id"] == institution_id
+    assert stored["comment"]["resource_id"] == resource["_id"]
+    assert stored["comment"]["content"] == "Thanks"
+
+    asyncio.run(Search.remove_class(institution_id, class_id))
+    assert asyncio.run(search_entries_collection.count_documents({})) == 0
+
+
+def test_rebuild_indexes_migrated_records_and_buckets():
+    institution_id, class_id, resource_id = ObjectId(), ObjectId(), ObjectId()
+    asyncio.run(educational_institutions_collection.insert_one({
+        "_id": institution_id,
+        "classes": [
+            {"_id": class_id, "resources": [
+                {"_id": resource_id, "title": "Algebra", "comments": [{"_id": ObjectId(), "content": "embedded"}]},
+                {"title": "not migrated yet"},
+            ], "comments": [{"_id": ObjectId(), "content": "on the class"}]},
+            {"resources": [{"_id": ObjectId(), "title": "class not migrated yet"}]},
+        ],
+    }))
+    asyncio.run(comment_buckets_collection.insert_one({
+        "resource_id": resource_id, "class_id": class_id, "institution_id": institution_id,
+        "comments": [{"_id": ObjectId(), "content": "bucketed"}],
+    }))
+
+    assert asyncio.run(Search.rebuild_search_index(batch_size=2)) == 2  # A class and a resource not migrated yet
+    stored = asyncio.run(search_entries_collection.find().to_list(None))
+    assert sorted(entry.get("title") or entry.get("content") for entry in stored) == [
+        "Algebra", "bucketed", "embedded", "on the class",
+    ]
+    assert all(entry["institution_id"] == institution_id for entry in stored)
+
+
+def test_search_is_ranked_paged_and_filtered(text_search):
+    institution_id, class_id = ObjectId(), ObjectId()
+    cursor = text_search(entries(3, institution_id, class_id))
+
+    results, has_more = asyncio.run(Search.search(str(institution_id), "algebra", str(class_id), "resource", 2, 2))
+    assert len(results) == 2 and has_more
+    assert cursor.calls == [
+        ("find", ({"institution_id": institution_id, "$text": {"$search": "algebra"},
+                   "class_id": class_id, "kind": "resource"}, {"score": {"$meta": "textScore"}})),
+        ("sort", ([("score", {"$meta": "textScore"})],)),
+        ("skip", 2),
+        ("limit", 3),
+    ]
+
+
+def test_search_route(client, text_search):
+    institution_id, class_id = ObjectId(), ObjectId()
+    text_search(entries(1, institution_id, class_id))
+
+    response = client.get(f"/api/v1/educationalInstitutions/{institution_id}/search", params={"q": "notes"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["has_more"] is False
+    assert body["results"][0]["title"] == "Notes 0"
+    assert body["results"][0]["class_id"] == str(class_id)
+
+    assert client.get(f"/api/v1/educationalInstitutions/{institution_id}/search", params={"q": ""}).status_code == 422
+
+
+def test_backfill_runs_until_it_has_indexed_everything(monkeypatch):
+    runs = []
+
+    async def rebuild(batch_size=500):
+        runs.append(batch_size)
+        return 2 if len(runs) == 1 else 0  # The first run meets classes not migrated yet
+
+    monkeypatch.setattr(Search, "rebuild_search_index", rebuild)
+    asyncio.run(search_entries_collection.insert_one({"_id": ObjectId(), "kind": "resource"}))
+
+    for _ in range(3):
+        asyncio.run(Search.backfill_search_index())
+    assert len(runs) == 2
+    marker = asyncio.run(migrations_collection.find_one({"_id": Search.BACKFILL_MARKER}))
+    assert marker["status"] == "done"
@@ -0,0 +1,39 @@
+import serve
+from Api.Config import settings
+
+
+def test_one_worker_per_cpu_unless_configured(monkeypatch):
+    monkeypatch.setattr(settings, "SERVER_WORKERS", 0)
+    monkeypatch.setattr(serve.os, "cpu_count", lambda: 6)
+    assert serve.worker_count() == 6
+
+    monkeypatch.setattr(serve.os, "cpu_count", lambda: None)
+    assert serve.worker_count() == 1
+
+    monkeypatch.setattr(settings, "SERVER_WORKERS", 3)
+    assert serve.worker_count() == 3
+
+
+def test_falls_back_to_pure_python_loop_and_parser(monkeypatch):
+    monkeypatch.setattr(serve.importlib.util, "find_spec", lambda name: object())
+    assert (serve.event_loop(), serve.http_protocol()) == ("uvloop", "httptools")
+
+    monkeypatch.setattr(serve.importlib.util, "find_spec", lambda name: None)
+    assert (serve.event_loop(), serve.http_protocol()) == ("asyncio", "h11")
+
+
+def test_main_runs_uvicorn_with_the_server_settings(monkeypatch):
+    calls = []
+    monkeypatch.setattr(serve, "check_app", lambda: calls.append("checked"))
+    monkeypatch.setattr(serve.uvicorn, "run", lambda app, **options: calls.append((app, options)))
+    monkeypatch.setattr(settings, "SERVER_WORKERS", 4)
+    monkeypatch.setattr(settings, "SERVER_GRACEFUL_SHUTDOWN_SECONDS", 12)
+
+    serve.main()
+    assert calls[0] == "checked"
+    app, options = calls[1]
+    assert app == "app:app"
+    assert options["workers"] == 4
+    assert options["timeout_graceful_shutdown"] == 12
+    assert options["port"] == settings.SERVER_PORT
+    assert options["backlog"] == settings.SERVER_BACKLOG
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from Api.Services.SingleFlight import SingleFlight, query_key
+
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"name": "Math"}
+
+    async def main():
+        return await asyncio.gather(*[flights.do("key", fetch) for _ in range(10)])
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flights.in_flight() == 0
+
+
+def test_next_call_after_completion_runs_again():
+    flights = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return len(calls)
+
+    async def main():
+        return await flights.do("key", fetch), await flights.do("key", fetch)
+
+    assert asyncio.run(main()) == (1, 2)
+
+
+def test_exception_reaches_every_waiter():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def main():
+        return await asyncio.gather(*[flights.do("key", fail) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    flights = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        first = asyncio.create_task(flights.do("key", fetch))
+        second = asyncio.create_task(flights.do("key", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert asyncio.run(main()) == ("done", True)
+
+
+def test_timeout_only_bounds_the_caller():
+    flights = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await flights.do("key", fetch, timeout=0.01)
+        return await flights.do("key", fetch)
+
+    assert asyncio.run(main()) == "done"
+
+
+def test_query_key_normalizes_object_ids():
+    object_id = ObjectId()
+    assert query_key("resource", object_id, 1) == query_key("resource", str(object_id), 1)
@@ -0,0 +1,112 @@
+import asyncio
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from Api.Config import settings
+from Api.Config.db import educational_institutions_collection, grid_fs_files_collection
+from Api.Services import BatchWriter, Stats
+
+
+def test_inc_updates_institution_and_class_counters():
+    assert Stats.inc("classes.$", resources=1, classes=1) == {
+        "stats.resources": 1, "stats.classes": 1, "classes.$.stats.resources": 1
+    }
+
+
+def test_reconcile_recounts_after_a_concurrent_increment(monkeypatch):
+    institution_id = ObjectId()
+    buckets = Stats.comment_buckets_collection
+    reads = []
+
+    class RacingBuckets:
+        # A counter `$inc` lands between the read of the institution and the write of the counts
+        full_name = buckets.full_name
+
+        async def aggregate(self, pipeline):
+            reads.append(1)
+            if len(reads) == 1:
+                await educational_institutions_collection.update_one({"_id": institution_id}, {"$inc": {"stats.comments": 1}})
+            async for row in buckets.aggregate(pipeline):
+                yield row
+
+    monkeypatch.setattr(Stats, "comment_buckets_collection", RacingBuckets())
+
+    async def main():
+        await educational_institutions_collection.insert_one({"_id": institution_id, "stats": {"classes": 4}, "classes": []})
+        await Stats.reconcile_institution(institution_id)
+        return await educational_institutions_collection.find_one({"_id": institution_id})
+
+    institution = asyncio.run(main())
+    assert len(reads) == 2
+    assert institution["stats"] == dict.fromkeys(Stats.COUNTERS, 0)
+
+
+def test_reconcile_without_stored_counters():
+    institution_id = ObjectId()
+
+    async def main():
+        await educational_institutions_collection.insert_one({"_id": institution_id, "classes": []})
+        await Stats.reconcile_institution(institution_id)
+        return await educational_institutions_collection.find_one({"_id": institution_id})
+
+    assert asyncio.run(main())["stats"]["classes"] == 0
+
+
+def test_reconcile_waits_for_a_queued_increment(monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_WRITES_ENABLED", True)
+    monkeypatch.setattr(settings, "BATCH_WRITE_DELAY_SECONDS", 60)
+    monkeypatch.setattr(BatchWriter, "_writers", {})
+    institution_id = ObjectId()
+    writes = []
+    update_one = Stats.educational_institutions_collection.update_one
+
+    async def recording_update_one(*args, **kwargs):
+        result = await update_one(*args, **kwargs)
+        writes.append(result.matched_count)
+        return result
+
+    monkeypatch.setattr(Stats.educational_institutions_collection, "update_one", recording_update_one)
+
+    async def main():
+        await educational_institutions_collection.insert_one({"_id": institution_id, "classes": []})
+        # The `$inc` of a comment whose bucket is already written, still waiting for its batch
+        queued = asyncio.create_task(BatchWriter.submit(
+            educational_institutions_collection, UpdateOne({"_id": institution_id}, {"$inc": {"stats.comments": 1}})
+        ))
+        await asyncio.sleep(0)
+        await Stats.reconcile_institution(institution_id)
+        await queued
+        return await educational_institutions_collection.find_one({"_id": institution_id})
+
+    institution = asyncio.run(main())
+    # Flushed before the first write, which then missed; the recount includes the increment
+    assert writes == [0, 1]
+    assert institution["stats"] == dict.fromkeys(Stats.COUNTERS, 0)
+
+
+def test_initialize_counts_the_classes_an_institution_comes_with():
+    file_id = ObjectId()
+    asyncio.run(grid_fs_files_collection.insert_one({"_id": file_id, "length": 42}))
+    institution = {"classes": [
+        {"_id": ObjectId(), "comments": [{"_id": ObjectId()}], "resources": [
+            {"_id": ObjectId(), "file_ids": [file_id], "comments": [{"_id": ObjectId()}, {"_id": ObjectId()}]},
+        ]},
+        {"_id": ObjectId(), "resources": []},
+    ]}
+
+    asyncio.run(Stats.initialize(institution))
+    assert institution["stats"] == {"classes": 2, "resources": 1, "comments": 3, "files": 1, "bytes": 42}
+    assert institution["classes"][0]["stats"] == {"resources": 1, "comments": 3, "files": 1, "bytes": 42}
+    assert institution["classes"][1]["stats"] == {"resources": 0, "comments": 0, "files": 0, "bytes": 0}
+
+
+def test_legacy_create_stores_the_counters_with_the_institution(client):
+    response = client.post("/api/v1/educational-institutions/", json={
+        "name": "School", "address": "Main St",
+        "classes": [{"name": "Math", "teacher_id": str(ObjectId()), "comments": [{"content": "hi"}]}],
+    })
+    assert response.status_code == 200
+
+    institution = asyncio.run(educational_institutions_collection.find_one({"_id": ObjectId(response.json()["id"])}))
+    assert institution["stats"] == {"classes": 1, "resources": 0, "comments": 1, "files": 0, "bytes": 0}
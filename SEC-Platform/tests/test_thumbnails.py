@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from Api.Config import settings
+from Api.Config.db import educational_institutions_collection, grid_fs_files_collection
+from Api.Services import Thumbnails
+
+
+class RecordingBucket:
+    def __init__(self):
+        self.deleted = []
+
+    async def delete(self, file_id):
+        self.deleted.append(file_id)
+        await grid_fs_files_collection.delete_one({"_id": file_id})
+
+
+def test_supports(monkeypatch):
+    monkeypatch.setattr(Thumbnails, "Image", object())
+    monkeypatch.setattr(Thumbnails, "pymupdf", None)
+    assert Thumbnails.supports("image/png")
+    assert not Thumbnails.supports("image/svg+xml")
+    assert not Thumbnails.supports("application/pdf")
+    assert not Thumbnails.supports(None)
+
+    monkeypatch.setattr(Thumbnails, "pymupdf", object())
+    assert Thumbnails.supports("application/pdf")
+
+    monkeypatch.setattr(Thumbnails, "Image", None)
+    assert not Thumbnails.supports("image/png")
+
+
+def test_concurrent_requests_share_one_rendering(monkeypatch):
+    file_id = ObjectId()
+    calls = []
+
+    async def render_once(requested):
+        calls.append(requested)
+        await asyncio.sleep(0.01)
+        return {"_id": "thumbnail"}
+
+    monkeypatch.setattr(Thumbnails, "_executor", object())
+    monkeypatch.setattr(Thumbnails, "_generate", render_once)
+
+    async def scenario():
+        return await asyncio.gather(*(Thumbnails.generate(str(file_id)) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == [{"_id": "thumbnail"}] * 5
+    assert calls == [file_id]
+
+
+def test_the_oldest_duplicate_thumbnail_stays(monkeypatch):
+    bucket = RecordingBucket()
+    monkeypatch.setattr(Thumbnails, "grid_fs_bucket", bucket)
+    file_id, older, newer = ObjectId(), ObjectId(), ObjectId()
+    metadata = {"thumbnail_of": file_id, "size": settings.THUMBNAIL_SIZE}
+    asyncio.run(grid_fs_files_collection.insert_many([
+        {"_id": newer, "metadata": metadata},
+        {"_id": older, "metadata": metadata},
+    ]))
+
+    # The process that stored the newer copy removes it and serves the older one
+    assert asyncio.run(Thumbnails._keep_first(file_id, newer))["_id"] == older
+    assert bucket.deleted == [newer]
+
+    # The one that stored the older copy keeps it
+    assert asyncio.run(Thumbnails._keep_first(file_id, older))["_id"] == older
+    assert bucket.deleted == [newer]
+
+
+def test_no_thumbnails_without_the_worker_pool(monkeypatch):
+    monkeypatch.setattr(Thumbnails, "_executor", None)
+    assert asyncio.run(Thumbnails.generate(ObjectId())) is None
+
+
+class GridOut:
+    def __init__(self, content):
+        self.content = content
+        self.closed = False
+
+    async def read(self):
+        return self.content
+
+    async def close(self):
+        self.closed = True
+
+
+class ThumbnailBucket:
+    def __init__(self):
+        self.opened = []
+
+    async def open_download_stream(self, file_id):
+        self.opened.append(GridOut(b"jpeg"))
+        return self.opened[-1]
+
+
+@pytest.fixture
+def thumbnail_url():
+    def stored(**metadata):
+        institution_id, class_id, resource_id, file_id = ObjectId(), ObjectId(), ObjectId(), ObjectId()
+        asyncio.run(educational_institutions_collection.insert_one({"_id": institution_id, "classes": [
+            {"_id": class_id, "name": "Math", "resources": [{"_id": resource_id, "title": "Notes", "file_ids": [file_id]}]},
+        ]}))
+        if metadata:
+            asyncio.run(grid_fs_files_collection.insert_many([
+                {"_id": file_id, "filename": "photo.png", "length": 10, "metadata": metadata},
+                {"_id": ObjectId(), "metadata": {"thumbnail_of": file_id, "size": settings.THUMBNAIL_SIZE}},
+            ]))
+        return (f"/api/v1/educationalInstitutions/{institution_id}/classes/{class_id}"
+                f"/resources/{resource_id}/files/{file_id}/thumbnail")
+
+    return stored
+
+
+def test_the_thumbnail_route_closes_the_stream_it_reads(client, thumbnail_url, monkeypatch):
+    from Api.Routes import ResourceRoutes
+
+    bucket = ThumbnailBucket()
+    monkeypatch.setattr(ResourceRoutes, "grid_fs_bucket", bucket)
+
+    response = client.get(thumbnail_url(contentType="image/png", scan="clean"))
+    assert response.status_code == 200
+    assert response.content == b"jpeg"
+    assert [grid_out.closed for grid_out in bucket.opened] == [True]
+
+
+def test_no_thumbnail_of_a_blocked_or_missing_file(client, thumbnail_url):
+    assert client.get(thumbnail_url(contentType="image/png", scan="infected")).status_code == 403
+    assert client.get(thumbnail_url()).status_code == 404
+
+
+def test_a_blocked_file_is_never_rendered(monkeypatch):
+    file_id = ObjectId()
+    asyncio.run(grid_fs_files_collection.insert_one(
+        {"_id": file_id, "length": 10, "metadata": {"contentType": "image/png", "scan": "infected"}}
+    ))
+    monkeypatch.setattr(Thumbnails, "Image", object())
+    monkeypatch.setattr(Thumbnails, "grid_fs_bucket", None)  # Opening the file would fail
+    assert asyncio.run(Thumbnails._generate(file_id)) is None
@@ -0,0 +1,99 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from Api.Config.db import grid_fs_chunks_collection, grid_fs_files_collection
+from Api.Config import settings
+from Api.Services import Uploads
+
+
+class AttachingInstitutions:
+    # mongomock has no `array_filters`: the resource update always matches here
+    async def update_one(self, *args, **kwargs):
+        return SimpleNamespace(matched_count=1)
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 4)
+
+
+@pytest.fixture
+def attaching(monkeypatch):
+    monkeypatch.setattr(Uploads, "educational_institutions_collection", AttachingInstitutions())
+
+
+async def parts(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def complete_session(length=10):
+    session = await Uploads.create_session(ObjectId(), ObjectId(), ObjectId(), "notes.txt", "text/plain", length)
+    await Uploads.write_chunks(str(session["_id"]), 0, parts(b"x" * (length // 2), b"y" * (length - length // 2)))
+    return session
+
+
+def test_write_chunks_rejects_a_wrong_offset():
+    async def main():
+        session = await Uploads.create_session(ObjectId(), ObjectId(), ObjectId(), "notes.txt", "text/plain", 10)
+        await Uploads.write_chunks(str(session["_id"]), 0, parts(b"x" * 4))
+        with pytest.raises(HTTPException) as conflict:
+            await Uploads.write_chunks(str(session["_id"]), 0, parts(b"x" * 4))
+        return conflict.value
+
+    conflict = asyncio.run(main())
+    assert conflict.status_code == 409
+    assert conflict.headers["Upload-Offset"] == "4"
+
+
+def test_only_the_first_finalize_reports_finished(attaching):
+    async def main():
+        session = await complete_session()
+        first = await Uploads.finalize(str(session["_id"]))
+        second = await Uploads.finalize(str(session["_id"]))
+        files = await grid_fs_files_collection.count_documents({"_id": session["_id"]})
+        chunks = await grid_fs_chunks_collection.count_documents({"files_id": session["_id"]})
+        return session["_id"], first, second, files, chunks
+
+    file_id, first, second, files, chunks = asyncio.run(main())
+    assert first == (file_id, True)
+    assert second == (file_id, False)
+    assert files == 1
+    assert chunks == 3
+
+
+def test_incomplete_session_cannot_be_finalized(attaching):
+    async def main():
+        session = await Uploads.create_session(ObjectId(), ObjectId(), ObjectId(), "notes.txt", "text/plain", 10)
+        await Uploads.write_chunks(str(session["_id"]), 0, parts(b"x" * 4))
+        with pytest.raises(HTTPException) as conflict:
+            await Uploads.finalize(str(session["_id"]))
+        return conflict.value
+
+    assert asyncio.run(main()).status_code == 409
+
+
+def test_finalize_retry_does_not_repeat_jobs_or_events(client, attaching, monkeypatch):
+    from Api.Routes import UploadRoutes
+
+    queued, emitted = [], []
+
+    async def enqueue(files):
+        queued.extend(files)
+
+    async def emit(type, *args, **kwargs):
+        emitted.append(type)
+
+    monkeypatch.setattr(UploadRoutes.PostUpload, "enqueue", enqueue)
+    monkeypatch.setattr(UploadRoutes.Events, "emit", emit)
+    session = asyncio.run(complete_session())
+
+    responses = [client.post(f"/api/v1/uploads/{session['_id']}/finalize") for _ in range(2)]
+    assert [response.status_code for response in responses] == [201, 201]
+    assert {response.json()["file_id"] for response in responses} == {str(session["_id"])}
+    assert queued == [(session["_id"], "text/plain")]
+    assert emitted == ["file.uploaded"]
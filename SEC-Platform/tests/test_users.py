@@ -0,0 +1,26 @@
+from bson import ObjectId
+
+
+USER = {
+    "name": {"first_name": "Jane", "last_name": "Doe"},
+    "email": "jdoe@example.com",
+    "password": "secret",
+    "role": "student",
+}
+
+
+def test_user_lifecycle(client):
+    created = client.post("/api/v1/users/", json=USER)
+    assert created.status_code == 201
+    user_id = created.json()["id"]
+
+    shown = client.get(f"/api/v1/users/{user_id}")
+    assert shown.status_code == 200
+    assert shown.json()["email"] == USER["email"]
+
+    assert client.delete(f"/api/v1/users/{user_id}").status_code == 204
+    assert client.get(f"/api/v1/users/{user_id}").status_code == 404
+
+
+def test_unknown_user_is_404(client):
+    assert client.get(f"/api/v1/users/{ObjectId()}").status_code == 404
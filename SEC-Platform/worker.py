@@ -0,0 +1,41 @@
+"""
+Standalone job worker: runs the MongoDB job queue outside the API processes.
+
+    JOBS_IN_APP=false uvicorn app:app      # API without workers
+    python worker.py                       # JOB_WORKERS concurrent jobs in this process
+"""
+import asyncio
+import logging
+import signal
+
+from Api.Config.db import client
+from Api.Config.indexes import ensure_indexes
+from Api.Services import BatchWriter, Jobs, Thumbnails
+# Imported for their job handlers
+from Api.Services import Cascade, PostUpload  # noqa: F401
+
+logger = logging.getLogger("worker")
+
+
+async def main():
+    await ensure_indexes()
+    Thumbnails.start()
+    Jobs.start_pool()
+    logger.info("Job worker started")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    logger.info("Stopping job worker")
+    await Jobs.stop_pool()
+    await Thumbnails.stop()
+    await BatchWriter.flush_all()
+    client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main())